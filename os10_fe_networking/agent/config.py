@@ -1,3 +1,5 @@
+import os
+
 from neutron._i18n import _
 from oslo_config import cfg
 
@@ -26,9 +28,108 @@ switch_opts = [
                          'ethernet1/1/3': 'port-channel1',
                          'ethernet1/1/4': 'port-channel1'},
                 help=_("Pre-defined port channel and its member ports.")),
+    cfg.FloatOpt('write_memory_quiet_period',
+                 default=0,
+                 help=_("Seconds without switch configuration changes before the running configuration is saved "
+                        "to startup. 0 saves it at the end of every agent loop iteration with changes.")),
+    cfg.FloatOpt('write_memory_max_delay',
+                 default=60,
+                 help=_("Maximum seconds a switch configuration change stays unsaved to startup.")),
+    cfg.StrOpt('binding_host',
+               help=_("Only handle frontend ports bound to this host. All frontend ports are handled if not set.")),
+    cfg.FloatOpt('interface_cache_ttl',
+                 default=300,
+                 help=_("Seconds the interface configuration read from the switch is reused. Changes made by the "
+                        "agent are applied to the cached configuration. 0 reads it for every port operation.")),
+    cfg.BoolOpt('prune_port_channels',
+                default=False,
+                help=_("Delete port channels in pg_allocatable_range that no frontend port needs when the agent "
+                       "resyncs all ports.")),
+    cfg.StrOpt('state_dir',
+               help=_("Directory where the agent keeps its state across restarts, e.g. the port channel allocated "
+                      "to each ethernet interface and the journal of unfinished port and network work. State is kept "
+                      "in memory only if not set.")),
+    cfg.FloatOpt('connect_timeout',
+                 default=10,
+                 help=_("Seconds to wait for a connection to the switch RESTCONF server.")),
+    cfg.FloatOpt('read_timeout',
+                 default=60,
+                 help=_("Seconds to wait for a response from the switch RESTCONF server.")),
+    cfg.IntOpt('request_retries',
+               default=2,
+               min=0,
+               help=_("Retries of GET, PUT and DELETE requests failing with a connection error or a server error.")),
+    cfg.FloatOpt('retry_backoff',
+                 default=0.5,
+                 help=_("Seconds before the first retry, doubled for each further retry and jittered.")),
+    cfg.IntOpt('switch_failure_threshold',
+               default=3,
+               min=1,
+               help=_("Consecutive failed requests after which a switch is considered unavailable. Its work is "
+                      "skipped until a background probe succeeds.")),
+    cfg.FloatOpt('switch_probe_interval',
+                 default=30,
+                 help=_("Seconds between probes of an unavailable switch.")),
+    cfg.IntOpt('connection_pool_size',
+               default=4,
+               min=1,
+               help=_("HTTPS connections kept open to a switch and shared by all its requests.")),
+    cfg.BoolOpt('connection_pool_block',
+                default=False,
+                help=_("Wait for a pooled connection when all are busy instead of opening one that is closed after "
+                       "its request.")),
+    cfg.FloatOpt('event_coalesce_window',
+                 default=0.1,
+                 min=0,
+                 help=_("Seconds the agent loop waits after a port or network event for further events to handle "
+                        "in the same iteration.")),
+    cfg.FloatOpt('event_max_latency',
+                 default=1,
+                 min=0,
+                 help=_("Maximum seconds an event waits for further events before the agent loop handles it, even "
+                        "if events keep arriving within event_coalesce_window.")),
+    cfg.FloatOpt('resync_interval',
+                 default=300,
+                 min=0,
+                 help=_("Seconds the agent loop waits without any port or network event before it fetches the "
+                        "ports changed since its last iteration, to catch up with events that were lost. While the "
+                        "switch is unavailable the loop runs every [AGENT] polling_interval seconds instead.")),
+    cfg.FloatOpt('work_retry_backoff',
+                 default=2,
+                 min=0,
+                 help=_("Seconds before a port or switch operation that failed is retried, doubled for each further "
+                        "failure.")),
+    cfg.FloatOpt('work_retry_max_backoff',
+                 default=300,
+                 min=0,
+                 help=_("Maximum seconds between the retries of a port or switch operation.")),
+    cfg.IntOpt('work_retry_max_attempts',
+               default=8,
+               min=1,
+               help=_("Failed attempts after which a port or switch operation is given up and listed as a dead "
+                      "letter, until a new event for the port arrives.")),
+    cfg.PortOpt('metrics_port',
+                default=0,
+                help=_("Port serving the agent Prometheus metrics, 0 disables the endpoint. Requires "
+                       "prometheus_client.")),
+    cfg.StrOpt('metrics_bind_address',
+               default="127.0.0.1",
+               help=_("Address the metrics endpoint listens on.")),
+    cfg.StrOpt('metrics_textfile',
+               help=_("File the agent Prometheus metrics are written to after every loop iteration, for the node "
+                      "exporter textfile collector. Requires prometheus_client.")),
 ]
 
 cfg.CONF.register_group(grp)
 
 cfg.CONF.register_opts(switch_opts, group=grp)
 
+
+def state_file(conf, filename):
+    """
+    :return: path of the state file in state_dir, None if the state is kept in memory only
+    """
+    if not conf.FRONTEND_SWITCH_FABRIC.state_dir:
+        return None
+
+    return os.path.join(conf.FRONTEND_SWITCH_FABRIC.state_dir, filename)
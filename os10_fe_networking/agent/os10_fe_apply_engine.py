@@ -0,0 +1,57 @@
+import collections
+import time
+
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+
+class SwitchApplyEngine:
+    """
+    Queue of the operations on the managed switch, run in submission order.
+
+    The agent manages a single switch whose client and interface inventory all operations share, so they never run
+    concurrently. A failed operation does not stop the ones queued after it.
+    """
+
+    def __init__(self, switch_ip):
+        self.switch_ip = switch_ip
+        # seconds the last run took, None before the first run
+        self.drain_time = None
+        self.stats = collections.Counter()
+
+        self._operations = []
+
+    def __len__(self):
+        return len(self._operations)
+
+    def submit(self, func, *args, **kwargs):
+        self._operations.append((func, args, kwargs))
+
+    def run(self):
+        """
+        Run every queued operation.
+
+        :return: number of failed operations
+        """
+        operations = self._operations
+        self._operations = []
+
+        start = time.monotonic()
+        failures = 0
+        for func, args, kwargs in operations:
+            try:
+                func(*args, **kwargs)
+            except Exception:
+                failures += 1
+                LOG.exception("Switch operation %(op)s on %(switch)s failed",
+                              {"op": getattr(func, "__name__", func), "switch": self.switch_ip})
+
+        self.drain_time = time.monotonic() - start
+        LOG.debug("Drained %(count)s operations of %(switch)s in %(elapsed).2fs",
+                  {"count": len(operations), "switch": self.switch_ip, "elapsed": self.drain_time})
+
+        self.stats["operations"] += len(operations)
+        self.stats["failures"] += failures
+
+        return failures
@@ -0,0 +1,93 @@
+import collections
+import time
+
+import eventlet
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+
+class SwitchUnavailable(RuntimeError):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Fail fast while a switch is down.
+
+    The breaker opens after failure_threshold consecutive failures. While open, requests are rejected and the switch
+    is probed in the background every probe_interval seconds, the first successful probe closes the breaker.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+
+    def __init__(self, name, failure_threshold=3, probe_interval=30, probe=None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.probe = probe
+        self.stats = collections.Counter()
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+
+        self._prober = None
+
+    def allow(self):
+        return self.state == self.CLOSED
+
+    def check(self):
+        if not self.allow():
+            self.stats["rejected"] += 1
+            raise SwitchUnavailable("switch {name} is unavailable since {elapsed:.0f}s".format(
+                name=self.name, elapsed=time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        self.failures = 0
+        if self.state == self.OPEN:
+            LOG.info("Switch %s is available again", self.name)
+            self.state = self.CLOSED
+            self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        self.stats["failures"] += 1
+        if self.state == self.CLOSED and self.failures >= self.failure_threshold:
+            LOG.warning("Switch %(name)s failed %(failures)s times in a row, failing fast until it answers again",
+                        {"name": self.name, "failures": self.failures})
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self.stats["opened"] += 1
+            self._start_prober()
+
+    def probe_once(self):
+        """
+        :return: True if the switch answered
+        """
+        self.stats["probes"] += 1
+        try:
+            ok = self.probe()
+        except Exception as e:
+            LOG.debug("Probe of switch %(name)s failed: %(error)s", {"name": self.name, "error": e})
+            ok = False
+
+        if ok:
+            self.record_success()
+        else:
+            self.stats["probe_failures"] += 1
+
+        return ok
+
+    def _probe_loop(self):
+        while self.state == self.OPEN:
+            eventlet.sleep(self.probe_interval)
+            self.probe_once()
+        self._prober = None
+
+    def _start_prober(self):
+        if self.probe is None or self._prober is not None:
+            return
+
+        self._prober = eventlet.spawn(self._probe_loop)
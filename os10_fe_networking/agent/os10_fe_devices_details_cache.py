@@ -0,0 +1,125 @@
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+
+def get_local_link_info(local_link_information):
+    switch_port = local_link_information['port_id']
+    switch_ip = local_link_information['switch_info']['switch_ip']
+    cluster = local_link_information['switch_info']['cluster']
+    preemption = local_link_information['switch_info']['preemption']
+    access_mode = local_link_information['switch_info']['access_mode']
+    return cluster, switch_ip, switch_port, preemption, access_mode
+
+
+def get_provisioning_info(device_detail):
+    cluster = None
+    switch_ip = device_detail["host"]
+    switch_port = None
+    preemption = None
+    access_mode = None
+    return cluster, switch_ip, switch_port, preemption, access_mode
+
+
+def get_switch_links(device_detail):
+    """
+    Yield every switch link a device detail is bound to.
+
+    :return: generator of (cluster, switch_ip, switch_port, preemption, access_mode, enable_port_channel)
+    """
+    profile = device_detail.get("profile")
+    if not profile:
+        return
+
+    if profile.get("provisioning-fsf"):
+        yield get_provisioning_info(device_detail) + (None,)
+    elif profile.get("local_link_information"):
+        enable_port_channel = len(profile['local_link_information']) > 1
+        for local_link_information in profile['local_link_information']:
+            yield get_local_link_info(local_link_information) + (enable_port_channel,)
+
+
+class DevicesDetailsCache:
+    """
+    Frontend device details indexed by port_id, network_id and (switch_ip, segmentation_id).
+    """
+
+    def __init__(self, devices_details_list=None):
+        self._by_port = {}
+        self._by_network = {}
+        self._by_switch_segment = {}
+
+        if devices_details_list:
+            self.rebuild(devices_details_list)
+
+    def __len__(self):
+        return len(self._by_port)
+
+    def __iter__(self):
+        return iter(list(self._by_port.values()))
+
+    def __contains__(self, port_id):
+        return port_id in self._by_port
+
+    @staticmethod
+    def _switch_segment_keys(device_detail):
+        segment = device_detail.get('segmentation_id')
+        return {(switch_ip, segment) for _, switch_ip, _, _, _, _ in get_switch_links(device_detail)}
+
+    @staticmethod
+    def _add_to_index(index, key, port_id):
+        index.setdefault(key, set()).add(port_id)
+
+    @staticmethod
+    def _remove_from_index(index, key, port_id):
+        port_ids = index.get(key)
+        if port_ids is None:
+            return
+
+        port_ids.discard(port_id)
+        if not port_ids:
+            del index[key]
+
+    def rebuild(self, devices_details_list):
+        self._by_port = {}
+        self._by_network = {}
+        self._by_switch_segment = {}
+
+        for device_detail in devices_details_list:
+            self.update(device_detail)
+
+    def update(self, device_detail):
+        port_id = device_detail.get("port_id")
+        if port_id is None:
+            LOG.debug("Skip caching unbound device %s", device_detail.get("device"))
+            return
+
+        self.remove(port_id)
+
+        self._by_port[port_id] = device_detail
+        self._add_to_index(self._by_network, device_detail.get("network_id"), port_id)
+        for key in self._switch_segment_keys(device_detail):
+            self._add_to_index(self._by_switch_segment, key, port_id)
+
+    def remove(self, port_id):
+        device_detail = self._by_port.pop(port_id, None)
+        if device_detail is None:
+            return None
+
+        self._remove_from_index(self._by_network, device_detail.get("network_id"), port_id)
+        for key in self._switch_segment_keys(device_detail):
+            self._remove_from_index(self._by_switch_segment, key, port_id)
+
+        return device_detail
+
+    def revisions(self):
+        return {port_id: device_detail.get("revision_number") for port_id, device_detail in self._by_port.items()}
+
+    def get_by_port(self, port_id):
+        return self._by_port.get(port_id)
+
+    def get_by_network(self, network_id):
+        return [self._by_port[port_id] for port_id in self._by_network.get(network_id, ())]
+
+    def get_by_switch_segment(self, switch_ip, segmentation_id):
+        return [self._by_port[port_id] for port_id in self._by_switch_segment.get((switch_ip, segmentation_id), ())]
@@ -1,28 +1,19 @@
 import base64
+import collections
 from enum import Enum
 
+from oslo_log import log as logging
+
+from os10_fe_networking.agent import os10_fe_reconciler
+from os10_fe_networking.agent.config import state_file
 from os10_fe_networking.agent.os10_fe_fabric_manager_callback import WriteMemoryCallback
+from os10_fe_networking.agent.os10_fe_port_channel_allocator import PortChannelAllocator
+from os10_fe_networking.agent.os10_fe_reconciler import DesiredState, Operation
 from os10_fe_networking.agent.os10_fe_restconf_client import OS10FERestConfClient
 from os10_fe_networking.agent.rest_conf.interface import Interface, VLanInterface, PortChannelInterface, \
     EthernetInterface
 
-
-class RangeAllocator:
-
-    def __init__(self, begin=125, end=128):
-        self.begin = int(begin)
-        self.end = int(end)
-
-    def alloc(self, shift):
-        if isinstance(shift, str):
-            shift = int(shift)
-
-        ret = self.begin + shift
-        if ret > self.end:
-            raise RuntimeError("unable to allocate in range {begin} - {end} for shift {shift}".format(begin=self.begin,
-                                                                                                      end=self.end,
-                                                                                                      shift=shift))
-        return ret
+LOG = logging.getLogger(__name__)
 
 
 class OS10FEFabricManager:
@@ -41,46 +32,38 @@ class OS10FEFabricManager:
         self.address = conf.FRONTEND_SWITCH_FABRIC.switch_ip
         self.client = OS10FERestConfClient(self.address,
                                            conf.FRONTEND_SWITCH_FABRIC.username,
-                                           self._decode_password(conf.FRONTEND_SWITCH_FABRIC.password))
+                                           self._decode_password(conf.FRONTEND_SWITCH_FABRIC.password),
+                                           inventory_ttl=conf.FRONTEND_SWITCH_FABRIC.interface_cache_ttl,
+                                           timeout=(conf.FRONTEND_SWITCH_FABRIC.connect_timeout,
+                                                    conf.FRONTEND_SWITCH_FABRIC.read_timeout),
+                                           retries=conf.FRONTEND_SWITCH_FABRIC.request_retries,
+                                           retry_backoff=conf.FRONTEND_SWITCH_FABRIC.retry_backoff,
+                                           failure_threshold=conf.FRONTEND_SWITCH_FABRIC.switch_failure_threshold,
+                                           probe_interval=conf.FRONTEND_SWITCH_FABRIC.switch_probe_interval,
+                                           pool_maxsize=conf.FRONTEND_SWITCH_FABRIC.connection_pool_size,
+                                           pool_block=conf.FRONTEND_SWITCH_FABRIC.connection_pool_block)
         self.port_channel_ethernet_mapping = conf.FRONTEND_SWITCH_FABRIC.port_channel_ethernet_mapping
         self.link_port_channel_mapping = conf.FRONTEND_SWITCH_FABRIC.link_port_channel_mapping
 
-        self.pg_alloc = RangeAllocator(conf.FRONTEND_SWITCH_FABRIC.pg_allocatable_range[0],
-                                       conf.FRONTEND_SWITCH_FABRIC.pg_allocatable_range[1])
-
-        self.callbacks = [WriteMemoryCallback(self.client)]
+        self.pg_alloc = PortChannelAllocator(conf.FRONTEND_SWITCH_FABRIC.pg_allocatable_range[0],
+                                             conf.FRONTEND_SWITCH_FABRIC.pg_allocatable_range[1],
+                                             state_file(conf, "port_channels_%s.json" % self.address))
+
+        self.callbacks = [WriteMemoryCallback(self.client,
+                                              conf.FRONTEND_SWITCH_FABRIC.write_memory_quiet_period,
+                                              conf.FRONTEND_SWITCH_FABRIC.write_memory_max_delay)]
+        self.prune_port_channels = conf.FRONTEND_SWITCH_FABRIC.prune_port_channels
+        # fingerprint of the configuration reconciled last, see os10_fe_reconciler.fingerprint
+        self.fingerprint = None
+        # {intent: error}, the intents the last reconcile could not configure
+        self.failed_intents = {}
+        # writes_issued: interface writes sent, writes_skipped: desired interfaces the switch already held
+        self.stats = collections.Counter()
 
     @staticmethod
     def _decode_password(password):
         return base64.b64decode(password).decode()
 
-    @staticmethod
-    def find_hole(sorted_set):
-        prev = None
-        hole = None
-        for v in sorted_set:
-            if prev is None:
-                prev = v
-                continue
-            else:
-                if prev + 1 == v:
-                    prev = v
-                    continue
-                else:
-                    # find hole in set
-                    hole = prev + 1
-                    break
-
-        if hole is None:
-            # empty set
-            if prev is None:
-                hole = 1
-            # continues set
-            else:
-                hole = prev + 1
-
-        return hole
-
     @staticmethod
     def _get_interface_from_cache(if_id, interfaces, if_type):
         for _, interface in interfaces[if_type].items():
@@ -104,7 +87,7 @@ class OS10FEFabricManager:
     def _match_switch(self, address):
         return address == self.address
 
-    def _get_all_interfaces_by_type(self):
+    def _get_all_interfaces_by_type(self, force_refresh=False):
         """
         :return:
             {
@@ -125,34 +108,70 @@ class OS10FEFabricManager:
                 }
             }
         """
-        vlan_dict, port_channel_dict, ethernet_dict = self.client.get_all_interfaces_by_type()
-        return {
-            Interface.Type.VLan: vlan_dict,
-            Interface.Type.PortChannel: port_channel_dict,
-            Interface.Type.Ethernet: ethernet_dict
-        }
+        return self.client.inventory.get(force_refresh)
+
+    def invalidate_inventory(self):
+        """
+        Read the switch interfaces again on the next operation.
+        """
+        self.client.inventory.invalidate()
+
+    def available(self):
+        """
+        False while the switch is down, its requests fail fast until a background probe succeeds.
+        """
+        return self.client.breaker.allow()
 
     def _run_callback(self, method_name):
         for callback in self.callbacks:
             getattr(callback, method_name)()
 
-    def _calc_available_port_channel(self, all_interfaces):
-        port_channel_set = set()
-        for _, interface_dict in all_interfaces.items():
-            for _, interface in interface_dict[Interface.Type.PortChannel].items():
-                if_id = PortChannelInterface.extract_numeric_id(interface["name"])
-                port_channel_set.add(if_id)
+    def flush(self, force=False):
+        """
+        Flush the work deferred by callbacks, e.g. write memory.
+
+        :return: number of operations covered
+        """
+        with self.client.budget.operation("flush"):
+            return sum(callback.flush(force) for callback in self.callbacks)
+
+    def _seed_port_channel_allocator(self):
+        if self.pg_alloc.seeded:
+            return
 
-        # find a hole (available) port channel id
-        return self.find_hole(sorted(port_channel_set))
+        all_interfaces = self._get_all_interfaces_by_type()
+        if self.client.inventory.loaded:
+            self.pg_alloc.seed(all_interfaces[Interface.Type.PortChannel])
 
-    def _calc_port_channel_id(self, ethernet_interface):
+    def _ethernet_name(self, ethernet_interface):
+        return "ethernet" + self._check_ethernet_interface_id(ethernet_interface)
+
+    def _port_channel_key(self, links):
         """
-        ethernet1/2/3:4 ==> 4
+        The server of the links, alike on VLT peers since both see every link of it.
+
+        :param links: ((switch_ip, switch_port), ...) of every link of the server
         """
-        slot = ethernet_interface.split("/")[-1].split(":")[1]
-        slot = int(slot) - 1
-        return str(self.pg_alloc.alloc(slot))
+        return ",".join(sorted("{switch_ip}/{port}".format(switch_ip=switch_ip, port=self._ethernet_name(switch_port))
+                               for switch_ip, switch_port in links))
+
+    def _calc_port_channel_id(self, links):
+        """
+        The port channel id of the server, allocated from pg_allocatable_range for its links on this switch.
+        """
+        self._seed_port_channel_allocator()
+        members = [self._ethernet_name(switch_port) for switch_ip, switch_port in links
+                   if self._match_switch(switch_ip)]
+        return str(self.pg_alloc.allocate(self._port_channel_key(links), members))
+
+    def _find_port_channel_id(self, ethernet_interface):
+        self._seed_port_channel_allocator()
+        port_channel_id = self.pg_alloc.lookup_member(self._ethernet_name(ethernet_interface))
+        return str(port_channel_id) if port_channel_id is not None else None
+
+    @staticmethod
+    def _intent_links(intent):
+        return intent.links or ((intent.switch_ip, intent.switch_port),)
 
     @staticmethod
     def _parse_port_channel_ethernet_mapping(port_channel_ethernet_mapping):
@@ -203,22 +222,13 @@ class OS10FEFabricManager:
             # port channel doesn't exist
             if port_channel_if is None:
                 # create port channel
-                self.client.configure_port_channel(PortChannelInterface(channel_id=str(port_channel_id),
-                                                                        enabled=True,
-                                                                        mode="trunk",
-                                                                        mtu=9216,
-                                                                        vlt_port_channel_id=port_channel_id))
+                self.client.configure_port_channel(self._preconfig_port_channel_interface(port_channel_id))
 
                 # attach ethernet interfaces to port channel
                 for eif in eif_list:
                     eif_id = self._check_ethernet_interface_id(eif)
-                    self.client.configure_ethernet_interface(EthernetInterface(eif_id=eif_id,
-                                                                               enabled=True,
-                                                                               mtu=9216,
-                                                                               flow_control_receive=True,
-                                                                               flow_control_transmit=False,
-                                                                               channel_group=port_channel_id,
-                                                                               disable_switch_port=True))
+                    self.client.configure_ethernet_interface(self._preconfig_ethernet_interface(eif_id,
+                                                                                                port_channel_id))
             # port channel exists
             else:
                 # determine ethernet interfaces to be attached
@@ -230,13 +240,8 @@ class OS10FEFabricManager:
                 # attach ethernet interfaces to port channel
                 for eif in eif_list:
                     eif_id = self._check_ethernet_interface_id(eif)
-                    self.client.configure_ethernet_interface(EthernetInterface(eif_id=eif_id,
-                                                                               enabled=True,
-                                                                               mtu=9216,
-                                                                               flow_control_receive=True,
-                                                                               flow_control_transmit=False,
-                                                                               channel_group=port_channel_id,
-                                                                               disable_switch_port=True))
+                    self.client.configure_ethernet_interface(self._preconfig_ethernet_interface(eif_id,
+                                                                                                port_channel_id))
 
             if self._should_attach(switch_ip, link_port_channel_config, port_channel_name):
                 # attach port channel to vlan in trunk mode
@@ -248,37 +253,214 @@ class OS10FEFabricManager:
                                       port=port_channel_name,
                                       port_mode=VLanInterface.PortMode.TRUNK))
 
+    @staticmethod
+    def _preconfig_port_channel_interface(port_channel_id):
+        return PortChannelInterface(channel_id=str(port_channel_id),
+                                    enabled=True,
+                                    mode="trunk",
+                                    mtu=9216,
+                                    vlt_port_channel_id=int(port_channel_id))
+
+    @staticmethod
+    def _preconfig_ethernet_interface(eif_id, port_channel_id):
+        return EthernetInterface(eif_id=eif_id,
+                                 enabled=True,
+                                 mtu=9216,
+                                 flow_control_receive=True,
+                                 flow_control_transmit=False,
+                                 channel_group=str(port_channel_id),
+                                 disable_switch_port=True)
+
+    @staticmethod
+    def _vlan_interface(cluster, vlan):
+        return VLanInterface(vlan_id=str(vlan),
+                             desc=cluster,
+                             enabled=True)
+
     def _ensure_vlan(self, cluster, all_interfaces, vlan):
         vlan_if = self._get_interface_from_cache("vlan%s" % vlan, all_interfaces, Interface.Type.VLan)
         if vlan_if is None:
-            self.client.configure_vlan(VLanInterface(vlan_id=str(vlan),
-                                                     desc=cluster,
-                                                     enabled=True))
+            self.client.configure_vlan(self._vlan_interface(cluster, vlan))
         return vlan_if
 
-    def ensure_configuration(self, switch_ip, ethernet_interface, vlan, cluster, preemption, access_mode,
-                             enable_port_channel):
+    def _is_configured(self, all_interfaces, add_to_desired, interface):
+        """
+        Check the cached switch configuration already holds everything the interface object would write.
+        """
+        desired = DesiredState()
+        add_to_desired(desired, interface)
+        return not os10_fe_reconciler.diff(desired, all_interfaces)
+
+    def _add_desired_vlan(self, desired, cluster, vlan):
+        # an existing vlan may be shared by several clusters, only create it
+        desired.add(self._vlan_interface(cluster, vlan), create_only=True)
+
+    def _add_desired_preconfig_link(self, desired, switch_ip, vlan):
+        port_channel_ethernet_config = self._parse_port_channel_ethernet_mapping(self.port_channel_ethernet_mapping)
+        link_port_channel_config = self._parse_link_port_channel_mapping(self.link_port_channel_mapping)
+
+        for port_channel_name, eif_list in port_channel_ethernet_config.items():
+            port_channel_id = str(PortChannelInterface.extract_numeric_id(port_channel_name))
+            desired.add_port_channel(self._preconfig_port_channel_interface(port_channel_id))
+            for eif in eif_list:
+                eif_id = self._check_ethernet_interface_id(eif)
+                desired.add_ethernet(self._preconfig_ethernet_interface(eif_id, port_channel_id))
+
+            if self._should_attach(switch_ip, link_port_channel_config, port_channel_name):
+                desired.add(VLanInterface(vlan_id=str(vlan),
+                                          port=port_channel_name,
+                                          port_mode=VLanInterface.PortMode.TRUNK))
+
+    def _add_desired(self, desired, intent):
+        pass
+
+    def _allocate_port_channels(self, intents):
+        pass
+
+    def _prunable(self, name):
+        return False
+
+    def desired_state(self, intents):
+        """
+        Build the interface configuration the switch should hold for the given port intents.
+
+        An intent failing, e.g. when no port channel id is left for it, is recorded in DesiredState.failed and the
+        others are still configured.
+
+        :param intents: iterable of PortIntent
+        :return: DesiredState
+        """
+        intents = list(intents)
+        self._allocate_port_channels(intents)
+
+        desired = DesiredState()
+        for intent in intents:
+            intent_desired = DesiredState()
+            try:
+                self._add_desired(intent_desired, intent)
+            except Exception as e:
+                LOG.warning("Unable to configure %(port)s on %(switch)s: %(error)s",
+                            {"port": intent.switch_port, "switch": self.address, "error": e})
+                desired.failed[intent] = e
+                continue
+
+            desired.update(intent_desired)
+            for name in intent_desired.interfaces:
+                desired.owners.setdefault(name, []).append(intent)
+        return desired
+
+    def _apply_operation(self, operation):
+        if operation.verb == Operation.DELETE:
+            ok = self.client.delete_interface(operation.name)
+            self.stats["reconcile_deletes"] += 1
+            if ok and operation.name.startswith("port-channel"):
+                self.pg_alloc.release_id(PortChannelInterface.extract_numeric_id(operation.name))
+        else:
+            ok = self.client.configure_interfaces(operation.body).ok
+            self.stats["writes_issued"] += 1
+
+        if not ok:
+            LOG.warning("Unable to %(verb)s %(name)s on %(switch)s",
+                        {"verb": operation.verb, "name": operation.name, "switch": self.address})
+        return ok
+
+    def reconcile(self, intents, prune=False):
+        """
+        Bring the switch to the desired state of the given port intents with the minimal set of writes.
+
+        The intents left unconfigured, because their configuration could not be built or the switch rejected one of
+        their writes, are in failed_intents afterwards.
+
+        :param intents: iterable of PortIntent, all the ports handled by the agent
+        :param prune: delete agent managed interfaces no longer desired
+        :return: number of operations issued
+        """
+        with self.client.budget.operation("reconcile"):
+            return self._reconcile(intents, prune)
+
+    def _reconcile(self, intents, prune):
         self._run_callback("pre_ensure_configuration")
-        if self._ensure_configuration(switch_ip, ethernet_interface, vlan, cluster, preemption, access_mode,
-                                      enable_port_channel):
+
+        desired = self.desired_state(intents)
+        self.failed_intents = desired.failed
+        all_interfaces = self._get_all_interfaces_by_type()
+        if not self.client.inventory.loaded:
+            raise RuntimeError("unable to read interfaces of {switch}".format(switch=self.address))
+
+        prunable = self._prunable if prune and self.prune_port_channels else None
+        if prunable is not None and desired.failed:
+            # what a failed intent holds on the switch is unknown, keep it
+            LOG.warning("Not pruning %(switch)s, %(failed)s port intents failed",
+                        {"switch": self.address, "failed": len(desired.failed)})
+            prunable = None
+        fingerprint = os10_fe_reconciler.fingerprint(desired, all_interfaces)
+        if prunable is None and fingerprint == self.fingerprint:
+            LOG.debug("Reconcile %s: desired and observed configuration unchanged", self.address)
+            self.stats["reconcile_unchanged"] += 1
+            self.stats["writes_skipped"] += len(desired)
+            return 0
+
+        self.fingerprint = None
+        operations = os10_fe_reconciler.diff(desired, all_interfaces, prunable)
+        written = {operation.name for operation in operations if operation.verb == Operation.WRITE}
+        self.stats["writes_skipped"] += len(set(desired.interfaces) - written)
+        LOG.debug("Reconcile %(switch)s: %(interfaces)s desired interfaces, %(operations)s operations",
+                  {"switch": self.address, "interfaces": len(desired), "operations": operations})
+
+        with self.client.batch() as batch:
+            applied = [self._apply_operation(operation) for operation in operations]
+
+        if not batch.ok:
+            LOG.warning("Some interface writes were rejected by %s", self.address)
+
+        for operation, ok in zip(operations, applied):
+            if ok and (operation.body is None or not batch.rejects(operation.body)):
+                continue
+
+            for intent in desired.owners_of(operation):
+                desired.failed.setdefault(intent, RuntimeError("{switch} rejected the {verb} of {name}".format(
+                    switch=self.address, verb=operation.verb, name=operation.name)))
+
+        if batch.ok and all(applied) and not desired.failed and self.client.inventory.loaded:
+            # the writes were applied to the inventory in place, failed intents are tried again next time
+            self.fingerprint = os10_fe_reconciler.fingerprint(desired, all_interfaces)
+
+        if operations:
             self._run_callback("post_ensure_configuration")
 
+        return len(operations)
+
+    def ensure_configuration(self, switch_ip, ethernet_interface, vlan, cluster, preemption, access_mode,
+                             enable_port_channel):
+        with self.client.budget.operation("ensure_configuration", ethernet_interface):
+            self._run_callback("pre_ensure_configuration")
+            with self.client.batch():
+                changed = self._ensure_configuration(switch_ip, ethernet_interface, vlan, cluster, preemption,
+                                                     access_mode, enable_port_channel)
+            if changed:
+                self._run_callback("post_ensure_configuration")
+
     def _ensure_configuration(self, switch_ip, ethernet_interface, vlan, cluster, preemption, access_mode,
                               enable_port_channel):
         pass
 
     def detach_port_from_vlan(self, switch_ip, ethernet_interface, vlan, access_mode, enable_port_channel):
-        self._run_callback("pre_detach_port_from_vlan")
-        if self._detach_port_from_vlan(switch_ip, ethernet_interface, vlan, access_mode, enable_port_channel):
-            self._run_callback("post_detach_port_from_vlan")
+        with self.client.budget.operation("detach_port_from_vlan", ethernet_interface):
+            self._run_callback("pre_detach_port_from_vlan")
+            with self.client.batch():
+                changed = self._detach_port_from_vlan(switch_ip, ethernet_interface, vlan, access_mode,
+                                                      enable_port_channel)
+            if changed:
+                self._run_callback("post_detach_port_from_vlan")
 
     def _detach_port_from_vlan(self, switch_ip, ethernet_interface, vlan, access_mode, enable_port_channel):
         pass
 
     def delete_vlan(self, switch_ip, ethernet_interface, vlan, enable_port_channel):
-        self._run_callback("pre_delete_vlan")
-        if self._delete_vlan(switch_ip, ethernet_interface, vlan, enable_port_channel):
-            self._run_callback("post_delete_vlan")
+        with self.client.budget.operation("delete_vlan", ethernet_interface):
+            self._run_callback("pre_delete_vlan")
+            if self._delete_vlan(switch_ip, ethernet_interface, vlan, enable_port_channel):
+                self._run_callback("post_delete_vlan")
 
     def _delete_vlan(self, switch_ip, ethernet_interface, vlan, enable_port_channel):
         pass
@@ -302,6 +484,10 @@ class SpineManager(OS10FEFabricManager):
         self._ensure_configuration_for_spine(switch_ip, ethernet_interface, vlan, cluster, preemption, access_mode)
         return True
 
+    def _add_desired(self, desired, intent):
+        self._add_desired_vlan(desired, intent.cluster, intent.vlan)
+        self._add_desired_preconfig_link(desired, intent.switch_ip, intent.vlan)
+
     def _detach_port_from_vlan(self, switch_ip, ethernet_interface, vlan, access_mode, enable_port_channel):
         return False
 
@@ -335,48 +521,52 @@ class LeafManager(OS10FEFabricManager):
             port = self._ensure_port_channel(all_interfaces, cluster, vlan, vlan_if,
                                              ethernet_interface, access_mode, preemption)
 
-        self._ensure_ethernet(cluster, ethernet_interface, port, access_mode, enable_port_channel)
+        self._ensure_ethernet(all_interfaces, cluster, ethernet_interface, port, access_mode, enable_port_channel)
 
         # ensure the configuration on the link to spine switch
         self._ensure_preconfig_link(switch_ip, all_interfaces, self.port_channel_ethernet_mapping,
                                     self.link_port_channel_mapping, vlan, vlan_if)
 
-    def _ensure_ethernet(self, cluster, eif_id, port_id, access_mode, enable_port_channel):
-        eif_id = self._check_ethernet_interface_id(eif_id)
-
+    @staticmethod
+    def _ethernet_interface(cluster, eif_id, port_id, access_mode, enable_port_channel):
         # configure ethernet interface with port-channel
         if enable_port_channel:
-            self.client.configure_ethernet_interface(EthernetInterface(eif_id=eif_id,
-                                                                       desc=cluster,
-                                                                       enabled=True,
-                                                                       mtu=1554,
-                                                                       flow_control_receive=True,
-                                                                       flow_control_transmit=False,
-                                                                       channel_group=str(port_id),
-                                                                       disable_switch_port=True))
+            return EthernetInterface(eif_id=eif_id,
+                                     desc=cluster,
+                                     enabled=True,
+                                     mtu=1554,
+                                     flow_control_receive=True,
+                                     flow_control_transmit=False,
+                                     channel_group=str(port_id),
+                                     disable_switch_port=True)
+
         # configure ethernet interface with vlan directly
-        else:
-            ethernet_interface = EthernetInterface(eif_id=eif_id,
-                                                   desc=cluster,
-                                                   enabled=True,
-                                                   mtu=1554,
-                                                   flow_control_receive=True,
-                                                   flow_control_transmit=False)
-            if access_mode == "access":
-                ethernet_interface.access_vlan_id = str(port_id)
-            elif access_mode == "trunk":
-                ethernet_interface.mode = "trunk"
-                ethernet_interface.trunk_allowed_vlan_ids = str(port_id)
-            self.client.configure_ethernet_interface(ethernet_interface)
+        ethernet_interface = EthernetInterface(eif_id=eif_id,
+                                               desc=cluster,
+                                               enabled=True,
+                                               mtu=1554,
+                                               flow_control_receive=True,
+                                               flow_control_transmit=False)
+        if access_mode == "access":
+            ethernet_interface.access_vlan_id = str(port_id)
+        elif access_mode == "trunk":
+            ethernet_interface.mode = "trunk"
+            ethernet_interface.trunk_allowed_vlan_ids = str(port_id)
+        return ethernet_interface
 
-    def _ensure_port_channel(self, all_interfaces, cluster, vlan, vlan_if, ethernet_interface, access_mode, preemption):
-        # ensure port-channel
-        port_channel_id = self._calc_port_channel_id(ethernet_interface)
-        # port_channel_if = self._get_interface_from_cache("port-channel" + port_channel_id, all_interfaces,
-        #                                                  Interface.Type.PortChannel)
+    def _ensure_ethernet(self, all_interfaces, cluster, eif_id, port_id, access_mode, enable_port_channel):
+        eif_id = self._check_ethernet_interface_id(eif_id)
+        ethernet_interface = self._ethernet_interface(cluster, eif_id, port_id, access_mode, enable_port_channel)
 
-        # configure port channel
-        lacp_preempt = None if preemption else False
+        if self._is_configured(all_interfaces, DesiredState.add_ethernet, ethernet_interface):
+            self.stats["writes_skipped"] += 1
+            return
+
+        self.stats["writes_issued"] += 1
+        self.client.configure_ethernet_interface(ethernet_interface)
+
+    @staticmethod
+    def _port_channel_interface(cluster, vlan, port_channel_id, access_mode):
         port_channel = PortChannelInterface(channel_id=port_channel_id,
                                             desc=cluster,
                                             enabled=True,
@@ -391,17 +581,81 @@ class LeafManager(OS10FEFabricManager):
             port_channel.mode = "trunk"
             port_channel.trunk_allowed_vlan_ids = str(vlan)
 
-        self.client.configure_port_channel(port_channel)
+        return port_channel
+
+    def _ensure_port_channel(self, all_interfaces, cluster, vlan, vlan_if, ethernet_interface, access_mode, preemption):
+        # ensure port-channel
+        port_channel_id = self._calc_port_channel_id(((self.address, ethernet_interface),))
+        # port_channel_if = self._get_interface_from_cache("port-channel" + port_channel_id, all_interfaces,
+        #                                                  Interface.Type.PortChannel)
+
+        # configure port channel
+        lacp_preempt = None if preemption else False
+        port_channel = self._port_channel_interface(cluster, vlan, port_channel_id, access_mode)
+
+        if self._is_configured(all_interfaces, DesiredState.add_port_channel, port_channel):
+            self.stats["writes_skipped"] += 1
+        else:
+            self.stats["writes_issued"] += 1
+            self.client.configure_port_channel(port_channel)
 
         return port_channel_id
 
+    def _add_desired(self, desired, intent):
+        if not self._match_switch(intent.switch_ip):
+            return
+
+        self._add_desired_vlan(desired, intent.cluster, intent.vlan)
+
+        port = intent.vlan
+        if intent.enable_port_channel:
+            port = self._calc_port_channel_id(self._intent_links(intent))
+            desired.add_port_channel(self._port_channel_interface(intent.cluster, intent.vlan, port,
+                                                                  intent.access_mode))
+
+        eif_id = self._check_ethernet_interface_id(intent.switch_port)
+        desired.add_ethernet(self._ethernet_interface(intent.cluster, eif_id, port, intent.access_mode,
+                                                      intent.enable_port_channel))
+
+        self._add_desired_preconfig_link(desired, intent.switch_ip, intent.vlan)
+
+    def _allocate_port_channels(self, intents):
+        """
+        Allocate the port channels of new servers in the order of their keys. VLT peers holding the same servers
+        allocate them alike, so both give a server the same id without talking to each other.
+        """
+        servers = {}
+        for intent in intents:
+            if intent.enable_port_channel and self._match_switch(intent.switch_ip):
+                links = self._intent_links(intent)
+                servers[self._port_channel_key(links)] = links
+
+        for key in sorted(servers):
+            try:
+                self._calc_port_channel_id(servers[key])
+            except RuntimeError:
+                # reported for each intent of the server by desired_state
+                pass
+
+    def _prunable(self, name):
+        # only port channels allocated by the agent
+        if not name.startswith("port-channel"):
+            return False
+
+        return PortChannelInterface.extract_numeric_id(name) in self.pg_alloc
+
     def _detach_port_from_vlan(self, switch_ip, ethernet_interface, vlan, access_mode, enable_port_channel):
         if not self._match_switch(switch_ip):
             return False
 
         if enable_port_channel:
-            port_channel_id = self._calc_port_channel_id(ethernet_interface)
-            self.client.delete_interface("port-channel" + port_channel_id)
+            port_channel_id = self._find_port_channel_id(ethernet_interface)
+            if port_channel_id is None:
+                LOG.warning("No port channel allocated to %s, nothing to detach", ethernet_interface)
+                return False
+
+            if self.client.delete_interface("port-channel" + port_channel_id):
+                self.pg_alloc.release_id(port_channel_id)
         else:
             self.client.detach_port_from_vlan(ethernet_interface, str(vlan), access_mode)
 
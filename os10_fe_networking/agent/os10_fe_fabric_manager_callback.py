@@ -1,4 +1,10 @@
 import abc
+import collections
+import time
+
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
 
 
 class OS10FEFabricManagerCallback(object, metaclass=abc.ABCMeta):
@@ -45,38 +51,93 @@ class OS10FEFabricManagerCallback(object, metaclass=abc.ABCMeta):
         :return:
         """
 
+    def flush(self, force=False):
+        """
+        Complete the work deferred by post callbacks.
+
+        :param force: flush regardless of the deferring policy
+        :return: number of operations covered by the flush
+        """
+        return 0
+
 
 class WriteMemoryCallback(OS10FEFabricManagerCallback):
+    """
+    Save the running configuration to startup once for a batch of operations.
+
+    The save is deferred until flush() is called and either the operations have been quiet for quiet_period
+    seconds, or the oldest pending operation is max_delay seconds old.
+    """
 
-    def __init__(self, client):
+    def __init__(self, client, quiet_period=0, max_delay=None):
         self.client = client
+        self.quiet_period = quiet_period
+        self.max_delay = max_delay
+
+        self.pending_operations = 0
+        self.first_pending = None
+        self.last_pending = None
+        # writes, failures, seconds
+        self.stats = collections.Counter()
+
+    def _defer(self):
+        now = time.monotonic()
+        if not self.pending_operations:
+            self.first_pending = now
+        self.last_pending = now
+        self.pending_operations += 1
+
+        if self.max_delay is not None and now - self.first_pending >= self.max_delay:
+            self.flush(force=True)
+
+    def _should_flush(self):
+        now = time.monotonic()
+        if now - self.last_pending >= self.quiet_period:
+            return True
+
+        return self.max_delay is not None and now - self.first_pending >= self.max_delay
+
+    def flush(self, force=False):
+        if not self.pending_operations:
+            return 0
+
+        if not force and not self._should_flush():
+            return 0
+
+        start = time.monotonic()
+        resp = self.client.write_memory()
+        self.stats["writes"] += 1
+        self.stats["seconds"] += time.monotonic() - start
+        if not resp.ok:
+            self.stats["failures"] += 1
+            LOG.warning("Write memory on %(switch)s failed with status %(status)s, %(count)s operations stay pending",
+                        {'switch': self.client.mgmt_ip, 'status': resp.status_code,
+                         'count': self.pending_operations})
+            return 0
+
+        operations = self.pending_operations
+        self.pending_operations = 0
+        self.first_pending = None
+        self.last_pending = None
+
+        LOG.info("Write memory on %(switch)s covered %(count)s operations in %(elapsed).2fs",
+                 {'switch': self.client.mgmt_ip, 'count': operations, 'elapsed': time.monotonic() - start})
+        return operations
 
     def pre_ensure_configuration(self):
         pass
 
     def post_ensure_configuration(self):
-        """
-
-        :return:
-        """
-        self.client.write_memory()
+        self._defer()
 
     def pre_detach_port_from_vlan(self):
         pass
 
     def post_detach_port_from_vlan(self):
-        """
-
-        :return:
-        """
-        self.client.write_memory()
+        self._defer()
 
     def pre_delete_vlan(self):
         pass
 
     def post_delete_vlan(self):
-        """
-
-        :return:
-        """
-        self.client.write_memory()
\ No newline at end of file
+        self._defer()
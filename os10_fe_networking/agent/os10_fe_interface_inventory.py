@@ -0,0 +1,196 @@
+import collections
+import copy
+import time
+
+from oslo_log import log as logging
+
+from os10_fe_networking.agent.rest_conf.interface import Interface
+
+LOG = logging.getLogger(__name__)
+
+
+class InterfaceInventory:
+    """
+    Interface configuration of one switch, cached for ttl seconds.
+
+    Writes issued through OS10FERestConfClient are applied to the inventory in place, so a batch of
+    operations needs a single fetch of the switch interfaces.
+    """
+
+    _port_list_keys = ("dell-interface:untagged-ports", "dell-interface:tagged-ports")
+    _member_ports_key = "dell-interface:member-ports"
+
+    def __init__(self, loader, ttl=None, on_invalidate=None):
+        """
+        :param loader: callable returning (vlan_dict, port_channel_dict, ethernet_dict), or None on failure
+        :param ttl: seconds the inventory is valid, None for no expiry, 0 disables caching
+        :param on_invalidate: callable run when the inventory is invalidated, to drop what was derived from it
+        """
+        self.loader = loader
+        self.ttl = ttl
+        self.on_invalidate = on_invalidate
+        self.stats = collections.Counter()
+
+        self._interfaces = None
+        self._loaded_at = None
+
+    def _expired(self):
+        if self._interfaces is None:
+            return True
+
+        return self.ttl is not None and time.monotonic() - self._loaded_at >= self.ttl
+
+    def get(self, force_refresh=False):
+        """
+        :return:
+            {
+                "iana-if-type:l2vlan": {"vlan1": {...}, ...},
+                "iana-if-type:ieee8023adLag": {"port-channel1": {...}, ...},
+                "iana-if-type:ethernetCsmacd": {"ethernet1/1/1:1": {...}, ...}
+            }
+        """
+        if not force_refresh and not self._expired():
+            self.stats["hits"] += 1
+            return self._interfaces
+
+        self.stats["misses"] += 1
+        loaded = self.loader()
+        if loaded is None:
+            # never cache a failed read
+            self.invalidate()
+            return {
+                Interface.Type.VLan: {},
+                Interface.Type.PortChannel: {},
+                Interface.Type.Ethernet: {}
+            }
+
+        vlan_dict, port_channel_dict, ethernet_dict = loaded
+        self._interfaces = {
+            Interface.Type.VLan: vlan_dict,
+            Interface.Type.PortChannel: port_channel_dict,
+            Interface.Type.Ethernet: ethernet_dict
+        }
+        self._loaded_at = time.monotonic()
+
+        return self._interfaces
+
+    def invalidate(self):
+        self._interfaces = None
+        self._loaded_at = None
+        if self.on_invalidate is not None:
+            self.on_invalidate()
+
+    @property
+    def loaded(self):
+        return self._interfaces is not None
+
+    def find(self, name):
+        if self._interfaces is None:
+            return None
+
+        for interfaces in self._interfaces.values():
+            if name in interfaces:
+                return interfaces[name]
+
+        return None
+
+    @staticmethod
+    def expand_vlan_range(vlan_range):
+        """
+        "3002,3004,3008-3010" ==> ["vlan3002", "vlan3004", "vlan3008", "vlan3009", "vlan3010"]
+        """
+        names = []
+        for item in str(vlan_range).split(","):
+            if "-" in item:
+                begin, end = item.split("-")
+                names.extend("vlan%d" % vlan_id for vlan_id in range(int(begin), int(end) + 1))
+            else:
+                names.append("vlan%d" % int(item))
+        return names
+
+    def _release_ports(self, key, ports, keep):
+        # an untagged port belongs to one vlan, an ethernet interface to one port-channel
+        if_type = Interface.Type.VLan if key != self._member_ports_key else Interface.Type.PortChannel
+        for name, interface in self._interfaces[if_type].items():
+            if name == keep or key not in interface:
+                continue
+
+            if key == self._member_ports_key:
+                interface[key] = [member for member in interface[key] if member["name"] not in ports]
+            else:
+                interface[key] = [port for port in interface[key] if port not in ports]
+
+    def _merge(self, current, update):
+        for key, value in update.items():
+            if key in self._port_list_keys:
+                ports = current.setdefault(key, [])
+                ports.extend(port for port in value if port not in ports)
+            elif key == self._member_ports_key:
+                members = current.setdefault(key, [])
+                names = {member["name"] for member in members}
+                members.extend(copy.deepcopy(member) for member in value if member["name"] not in names)
+            elif isinstance(value, dict) and isinstance(current.get(key), dict):
+                self._merge(current[key], value)
+            else:
+                current[key] = copy.deepcopy(value)
+
+    def _apply_interface(self, interface):
+        interfaces = self._interfaces.get(interface.get("type"))
+        if interfaces is None:
+            return
+
+        name = interface["name"]
+        if "dell-interface:untagged-ports" in interface:
+            self._release_ports("dell-interface:untagged-ports", interface["dell-interface:untagged-ports"], name)
+        if self._member_ports_key in interface:
+            self._release_ports(self._member_ports_key,
+                                {member["name"] for member in interface[self._member_ports_key]}, name)
+
+        if name in interfaces:
+            self._merge(interfaces[name], interface)
+        else:
+            interfaces[name] = copy.deepcopy(interface)
+
+    def _apply_interface_range(self, interface_range):
+        template = interface_range.get("config-template", {})
+        ports = template.get("dell-interface:tagged-ports", [])
+        detach = "tagged-ports" in template.get("delete-object", [])
+
+        for name in self.expand_vlan_range(interface_range["name"]):
+            vlan = self._interfaces[Interface.Type.VLan].get(name)
+            if vlan is None:
+                continue
+
+            tagged_ports = vlan.setdefault("dell-interface:tagged-ports", [])
+            if detach:
+                vlan["dell-interface:tagged-ports"] = [port for port in tagged_ports if port not in ports]
+            else:
+                tagged_ports.extend(port for port in ports if port not in tagged_ports)
+
+    def apply_content(self, body):
+        """
+        Apply the body of a successful interface PATCH or POST.
+        """
+        if self._interfaces is None:
+            return
+
+        interfaces = body.get("ietf-interfaces:interfaces", {})
+        for interface in interfaces.get("interface", []):
+            self._apply_interface(interface)
+        for interface_range in interfaces.get("dell-interface-range:interface-range", []):
+            self._apply_interface_range(interface_range)
+
+    def remove(self, name):
+        """
+        Apply a successful interface DELETE.
+        """
+        if self._interfaces is None:
+            return
+
+        for interfaces in self._interfaces.values():
+            interfaces.pop(name, None)
+
+        for vlan in self._interfaces[Interface.Type.VLan].values():
+            for key in self._port_list_keys:
+                if name in vlan.get(key, []):
+                    vlan[key] = [port for port in vlan[key] if port != name]
@@ -0,0 +1,182 @@
+from oslo_log import log as logging
+
+from os10_fe_networking.agent.os10_fe_request_budget import LATENCY_BUCKETS
+
+try:
+    import prometheus_client
+    from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily
+    from prometheus_client.utils import floatToGoString
+except ImportError:
+    prometheus_client = None
+
+LOG = logging.getLogger(__name__)
+
+LOOP_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+class AgentCollector:
+    """
+    Read the agent queues and the counters of its fabric manager at scrape time.
+    """
+
+    def __init__(self, agent):
+        self.agent = agent
+
+    def collect(self):
+        agent = self.agent
+
+        queues = GaugeMetricFamily("os10fe_queue_depth", "Work waiting for the next agent loop iteration.",
+                                   labels=["queue"])
+        queues.add_metric(["updated_ports"], len(agent.updated_ports))
+        queues.add_metric(["deleted_ports"], len(agent.deleted_ports))
+        queues.add_metric(["deleted_networks"], len(agent.deleted_networks))
+        queues.add_metric(["retry"], len(agent.retry_queue))
+        queues.add_metric(["dead_letters"], len(agent.retry_queue.dead_letters))
+        queues.add_metric(["switch_operations"], len(agent.apply_engine))
+        yield queues
+
+        fabric_manager = agent.fabric_manager
+        client = fabric_manager.client
+        switch = fabric_manager.address
+
+        requests = CounterMetricFamily("os10fe_restconf_requests", "RESTCONF requests sent to a switch.",
+                                       labels=["switch", "operation"])
+        errors = CounterMetricFamily("os10fe_restconf_errors", "RESTCONF requests failed or answered with an error.",
+                                     labels=["switch", "operation"])
+        seconds = CounterMetricFamily("os10fe_restconf_seconds", "Time spent in RESTCONF requests.",
+                                      labels=["switch", "operation"])
+        for operation, totals in list(client.budget.totals.items()):
+            requests.add_metric([switch, operation], totals["requests"])
+            errors.add_metric([switch, operation], totals["errors"])
+            seconds.add_metric([switch, operation], totals["seconds"])
+        yield requests
+        yield errors
+        yield seconds
+
+        duration = HistogramMetricFamily("os10fe_restconf_request_duration_seconds",
+                                         "Duration of the RESTCONF requests sent to a switch.",
+                                         labels=["switch", "method", "path"])
+        bounds = [floatToGoString(bound) for bound in LATENCY_BUCKETS + (float("inf"),)]
+        for (method, path), counts in list(client.budget.latency.items()):
+            buckets = []
+            total = 0
+            for bound, count in zip(bounds, counts):
+                total += count
+                buckets.append((bound, total))
+            duration.add_metric([switch, method, path], buckets, client.budget.latency_seconds[method, path])
+        yield duration
+
+        connections = client.connection_stats()
+        yield self._counter("os10fe_restconf_connections", "Connections opened to a switch.", switch,
+                            connections["new_connections"])
+        yield self._counter("os10fe_restconf_connection_reuses", "RESTCONF requests sent on an already open "
+                            "connection.", switch, connections["reused_connections"])
+
+        yield self._gauge("os10fe_switch_available", "1 unless the circuit breaker of the switch is open.", switch,
+                          1 if fabric_manager.available() else 0)
+
+        write_memory = {"writes": 0, "failures": 0, "seconds": 0}
+        for callback in fabric_manager.callbacks:
+            for key in write_memory:
+                write_memory[key] += getattr(callback, "stats", {}).get(key, 0)
+        yield self._counter("os10fe_write_memory", "Running configuration saves to startup.", switch,
+                            write_memory["writes"])
+        yield self._counter("os10fe_write_memory_failures", "Failed running configuration saves.", switch,
+                            write_memory["failures"])
+        yield self._counter("os10fe_write_memory_seconds", "Time spent saving the running configuration.", switch,
+                            write_memory["seconds"])
+
+        writes = CounterMetricFamily("os10fe_interface_writes", "Interface writes sent to a switch, or skipped since "
+                                     "the switch already held the configuration.", labels=["switch", "result"])
+        writes.add_metric([switch, "issued"], fabric_manager.stats["writes_issued"])
+        writes.add_metric([switch, "skipped"], fabric_manager.stats["writes_skipped"])
+        yield writes
+
+        pg_alloc = fabric_manager.pg_alloc
+        yield self._gauge("os10fe_port_channels_used", "Port channel ids of the allocatable range in use.", switch,
+                          pg_alloc.used)
+        yield self._gauge("os10fe_port_channels_capacity", "Port channel ids of the allocatable range.", switch,
+                          pg_alloc.capacity)
+        yield self._counter("os10fe_port_channel_exhausted", "Port channel allocations failed for lack of a free id.",
+                            switch, pg_alloc.stats["exhausted"])
+
+        hits = client.inventory.stats["hits"]
+        misses = client.inventory.stats["misses"]
+        yield self._counter("os10fe_interface_cache_hits", "Interface reads served from the cache.", switch, hits)
+        yield self._counter("os10fe_interface_cache_misses", "Interface reads sent to the switch.", switch, misses)
+        yield self._gauge("os10fe_interface_cache_hit_ratio", "Share of the interface reads served from the cache.",
+                          switch, hits / (hits + misses) if hits + misses else 0)
+
+    @staticmethod
+    def _counter(name, documentation, switch, value):
+        metric = CounterMetricFamily(name, documentation, labels=["switch"])
+        metric.add_metric([switch], value)
+        return metric
+
+    @staticmethod
+    def _gauge(name, documentation, switch, value):
+        metric = GaugeMetricFamily(name, documentation, labels=["switch"])
+        metric.add_metric([switch], value)
+        return metric
+
+
+class AgentMetrics:
+    """
+    Prometheus metrics of the agent, served over HTTP on port and/or written to textfile for the node exporter.
+
+    Everything is a no-op if neither is configured or prometheus_client is not installed.
+    """
+
+    def __init__(self, agent, port=0, bind_address="127.0.0.1", textfile=None):
+        self.port = port
+        self.bind_address = bind_address
+        self.textfile = textfile
+        self.enabled = bool(port or textfile)
+
+        if self.enabled and prometheus_client is None:
+            LOG.warning("prometheus_client is not installed, agent metrics are disabled")
+            self.enabled = False
+
+        if not self.enabled:
+            return
+
+        self.registry = prometheus_client.CollectorRegistry()
+        self.loop_duration = prometheus_client.Histogram("os10fe_loop_duration_seconds",
+                                                         "Duration of the agent loop iterations.",
+                                                         buckets=LOOP_BUCKETS, registry=self.registry)
+        self.rpc_duration = prometheus_client.Histogram("os10fe_rpc_duration_seconds",
+                                                        "Duration of the RPC calls to the neutron server.",
+                                                        ["method"], registry=self.registry)
+        self.registry.register(AgentCollector(agent))
+
+    def start(self):
+        if self.enabled and self.port:
+            prometheus_client.start_http_server(self.port, addr=self.bind_address, registry=self.registry)
+            LOG.info("Serving agent metrics on %(address)s:%(port)s", {"address": self.bind_address,
+                                                                       "port": self.port})
+
+    def observe_loop(self, seconds):
+        if self.enabled:
+            self.loop_duration.observe(seconds)
+
+    def observe_rpc(self, method, seconds):
+        if self.enabled:
+            self.rpc_duration.labels(method).observe(seconds)
+
+    def export(self):
+        """
+        Write the metrics to the textfile, if configured.
+        """
+        if not self.enabled or not self.textfile:
+            return
+
+        try:
+            prometheus_client.write_to_textfile(self.textfile, self.registry)
+        except OSError:
+            LOG.exception("Unable to write agent metrics to %s", self.textfile)
+
+    def render(self):
+        if not self.enabled:
+            return b""
+        return prometheus_client.generate_latest(self.registry)
+
@@ -1,6 +1,8 @@
+import collections
 import json
 import socket
 import sys
+import threading
 import time
 
 import eventlet
@@ -8,8 +10,16 @@ import eventlet
 eventlet.monkey_patch()
 
 # oslo_messaging/notify/listener.py documents that monkeypatching is required
-from os10_fe_networking.agent.config import switch_opts
+from os10_fe_networking.agent.config import state_file, switch_opts
+from os10_fe_networking.agent.os10_fe_apply_engine import SwitchApplyEngine
+from os10_fe_networking.agent.os10_fe_devices_details_cache import DevicesDetailsCache, get_switch_links
 from os10_fe_networking.agent.os10_fe_fabric_manager import OS10FEFabricManager
+from os10_fe_networking.agent.os10_fe_metrics import AgentMetrics
+from os10_fe_networking.agent.os10_fe_reconciler import PortIntent
+from os10_fe_networking.agent.os10_fe_retry_queue import RetryQueue
+from os10_fe_networking.agent.os10_fe_snapshot import WarmStartSnapshot
+from os10_fe_networking.agent.os10_fe_work_journal import WorkJournal
+from os10_fe_networking.agent.os10_fe_work_plan import WorkPlan
 
 from neutron.agent import rpc as agent_rpc
 from neutron.common import config as common_config
@@ -44,10 +54,17 @@ def list_opts():
 
 
 class PluginApi(agent_rpc.PluginApi):
-    def get_frontend_devices_details_list(self, context, agent_id, host=None):
+    def get_frontend_devices_details_list(self, context, agent_id, host=None, binding_host=None):
         cctxt = self.client.prepare(version='1.3')
         return cctxt.call(context, 'get_frontend_devices_details_list',
-                          agent_id=agent_id, host=host)
+                          agent_id=agent_id, host=host, binding_host=binding_host)
+
+    def get_frontend_devices_details_list_delta(self, context, agent_id, port_revisions, host=None,
+                                                binding_host=None):
+        cctxt = self.client.prepare(version='1.3')
+        return cctxt.call(context, 'get_frontend_devices_details_list_delta',
+                          agent_id=agent_id, port_revisions=port_revisions, host=host,
+                          binding_host=binding_host)
 
 
 class OS10FENeutronAgent(service.ServiceBase):
@@ -58,17 +75,53 @@ class OS10FENeutronAgent(service.ServiceBase):
         self.agent_host = socket.gethostname()
         self.reported_nodes = {}
         self.polling_interval = CONF.AGENT.polling_interval
+        self.coalesce_window = CONF.FRONTEND_SWITCH_FABRIC.event_coalesce_window
+        self.max_latency = CONF.FRONTEND_SWITCH_FABRIC.event_max_latency
+        self.resync_interval = CONF.FRONTEND_SWITCH_FABRIC.resync_interval
         self.agent_type = constants.OS10FE_AGENT_TYPE
 
         # cache objects
-        self.cached_devices_details_list = None
+        self.devices_details_cache = DevicesDetailsCache()
+        self.delta_rpc_supported = True
         self.updated_ports = set()
         self.deleted_ports = set()
         self.deleted_networks = set()
+        # set by the RPC callbacks to wake the agent loop
+        self.work_event = threading.Event()
+        # full sync on the first iteration
+        self.start_up = True
+        # no event arrived for resync_interval seconds, the next iteration fetches the changed ports
+        self.resync = False
+        # device details and switch fingerprints of the previous run, the first iteration only syncs the difference
+        self.snapshot = WarmStartSnapshot(state_file(CONF, "snapshot.json"))
+        snapshot = self.snapshot.load()
+        self.resume = snapshot is not None
+        if self.resume:
+            self.devices_details_cache.rebuild(snapshot[0])
+            self.start_up = False
+        # ports and switch operations that failed, retried with backoff
+        self.retry_queue = RetryQueue(CONF.FRONTEND_SWITCH_FABRIC.work_retry_backoff,
+                                      CONF.FRONTEND_SWITCH_FABRIC.work_retry_max_backoff,
+                                      CONF.FRONTEND_SWITCH_FABRIC.work_retry_max_attempts)
+        # received and completed work, replayed on restart
+        self.journal = WorkJournal(state_file(CONF, "work_journal.jsonl"))
+        # switch operations of the journal, planned in the first iteration
+        self.replayed_operations = []
+        # the previous run left a journal, the switch is only brought up to date with it
+        self.warm_start = self.journal.recovered
+        self._replay_journal()
 
         # TODO This is a hard code ip
         self.ironic_client = ironic_client.get_client()
         self.fabric_manager = OS10FEFabricManager.create(CONF)
+        self.apply_engine = SwitchApplyEngine(self.fabric_manager.address)
+        if self.resume:
+            self.fabric_manager.fingerprint = snapshot[1].get(self.fabric_manager.address)
+            LOG.info("Resuming from snapshot of %s ports", len(self.devices_details_cache))
+        self.saved_fingerprint = self.fabric_manager.fingerprint
+        self.metrics = AgentMetrics(self, CONF.FRONTEND_SWITCH_FABRIC.metrics_port,
+                                    CONF.FRONTEND_SWITCH_FABRIC.metrics_bind_address,
+                                    CONF.FRONTEND_SWITCH_FABRIC.metrics_textfile)
         LOG.info('Agent OS10-FE-Networking initialized.')
 
     def start(self):
@@ -79,6 +132,7 @@ class OS10FENeutronAgent(service.ServiceBase):
         #        self.heartbeat.start(interval=CONF.AGENT.report_interval,
         #                             initial_delay=CONF.AGENT.report_interval)
         self.connection.consume_in_threads()
+        self.metrics.start()
         self.daemon_loop()
 
     def setup_rpc(self):
@@ -124,6 +178,8 @@ class OS10FENeutronAgent(service.ServiceBase):
 
     def stop(self):
         LOG.info('Stopping agent OS10-FE-Networking.')
+        self.flush_fabric_manager(force=True)
+        self.journal.close()
         # self.heartbeat.stop()
 
     def reset(self):
@@ -193,6 +249,49 @@ class OS10FENeutronAgent(service.ServiceBase):
             self.reported_nodes.update(
                 {state['host']: state['configurations']})
 
+    def _replay_journal(self):
+        """
+        Queue the work the previous run received but did not complete.
+        """
+        for key, item in self.journal.pending.items():
+            if key[0] == "port":
+                self.updated_ports.add(key[1])
+            elif key[0] == "deleted_port":
+                # the device details are gone from neutron, the journal kept them
+                if item is not None:
+                    self.devices_details_cache.update(item)
+                self.deleted_ports.add(key[1])
+            elif key[0] == "deleted_network":
+                for device_detail in item or ():
+                    self.devices_details_cache.update(device_detail)
+                self.deleted_networks.add(key[1])
+            else:
+                self.replayed_operations.append((key, item))
+
+        if self.journal.pending:
+            LOG.info("Replaying %s unfinished items of the work journal", len(self.journal.pending))
+
+    def port_updated(self, port_id):
+        self.journal.add(("port", port_id))
+        self.updated_ports.add(port_id)
+        self.notify_work()
+
+    def port_deleted(self, port_id):
+        self.journal.add(("deleted_port", port_id), self.devices_details_cache.get_by_port(port_id))
+        self.deleted_ports.add(port_id)
+        self.notify_work()
+
+    def network_deleted(self, network_id):
+        self.journal.add(("deleted_network", network_id), self.devices_details_cache.get_by_network(network_id))
+        self.deleted_networks.add(network_id)
+        self.notify_work()
+
+    def flush_fabric_manager(self, force=False):
+        try:
+            self.fabric_manager.flush(force)
+        except Exception:
+            LOG.exception("Unable to flush deferred switch operations")
+
     def _get_and_clear_member_set(self, member):
         if member not in self.__dict__:
             raise RuntimeError("Can not find member {member} in object".format(member=member))
@@ -201,15 +300,8 @@ class OS10FENeutronAgent(service.ServiceBase):
         self.__dict__[member] = set()
         return return_set
 
-    def refresh_devices_details_list(self):
-        try:
-            devices_details_list = self.plugin_rpc.get_frontend_devices_details_list(
-                self.context, self.agent_id, host=cfg.CONF.host)
-        except Exception:
-            LOG.exception("Unable to get port details")
-            # resync is needed
-            return True
-
+    @staticmethod
+    def _parse_switch_info(devices_details_list):
         for device_detail in devices_details_list:
             if "profile" not in device_detail:
                 continue
@@ -217,141 +309,327 @@ class OS10FENeutronAgent(service.ServiceBase):
             if device_detail["profile"].get("local_link_information"):
                 for local_link_information in device_detail['profile']['local_link_information']:
                     switch_info = local_link_information['switch_info']
-                    local_link_information['switch_info'] = json.loads(switch_info.replace("'", "\""))
+                    if isinstance(switch_info, str):
+                        local_link_information['switch_info'] = json.loads(switch_info.replace("'", "\""))
+
+    def _call_rpc(self, method, *args, **kwargs):
+        start = time.monotonic()
+        try:
+            return getattr(self.plugin_rpc, method)(*args, **kwargs)
+        finally:
+            self.metrics.observe_rpc(method, time.monotonic() - start)
+
+    def refresh_devices_details_list(self, full=True):
+        """
+        Fetch the frontend devices details, either the full list or only the ports changed since the revisions
+        in the cache.
+
+        :return: True if resync is needed
+        """
+        if not full and self.delta_rpc_supported:
+            return self._refresh_devices_details_delta()
+
+        try:
+            devices_details_list = self._call_rpc(
+                "get_frontend_devices_details_list", self.context, self.agent_id, host=cfg.CONF.host,
+                binding_host=CONF.FRONTEND_SWITCH_FABRIC.binding_host)
+        except Exception:
+            LOG.exception("Unable to get port details")
+            # resync is needed
+            return True
 
-        self.cached_devices_details_list = devices_details_list
+        self._parse_switch_info(devices_details_list)
+        self.devices_details_cache.rebuild(devices_details_list)
+
+        return False
+
+    def _refresh_devices_details_delta(self):
+        try:
+            delta = self._call_rpc(
+                "get_frontend_devices_details_list_delta", self.context, self.agent_id,
+                self.devices_details_cache.revisions(), host=cfg.CONF.host,
+                binding_host=CONF.FRONTEND_SWITCH_FABRIC.binding_host)
+        except oslo_messaging.RemoteError as e:
+            if e.exc_type not in ("NoSuchMethod", "UnsupportedVersion"):
+                LOG.exception("Unable to get port details delta")
+                return True
+
+            LOG.warning("Neutron server does not support frontend devices details delta, "
+                        "falling back to full list")
+            self.delta_rpc_supported = False
+            return self.refresh_devices_details_list()
+        except Exception:
+            LOG.exception("Unable to get port details delta")
+            # resync is needed
+            return True
+
+        LOG.debug("Frontend devices details delta: %(changed)s changed, %(removed)s removed",
+                  {'changed': len(delta["devices"]), 'removed': len(delta["removed_ports"])})
+
+        for port_id in delta["removed_ports"]:
+            self.devices_details_cache.remove(port_id)
+
+        self._parse_switch_info(delta["devices"])
+        for device_detail in delta["devices"]:
+            self.devices_details_cache.update(device_detail)
 
         return False
 
     @staticmethod
-    def get_local_link_info(local_link_information):
-        switch_port = local_link_information['port_id']
-        switch_ip = local_link_information['switch_info']['switch_ip']
-        cluster = local_link_information['switch_info']['cluster']
-        preemption = local_link_information['switch_info']['preemption']
-        access_mode = local_link_information['switch_info']['access_mode']
-        return cluster, switch_ip, switch_port, preemption, access_mode
+    def _detach_device(plan, device_detail):
+        segment = device_detail['segmentation_id']
+        for cluster, switch_ip, switch_port, preemption, access_mode, enable_port_channel in \
+                get_switch_links(device_detail):
+            plan.detach_port_from_vlan(switch_ip, switch_port, segment, access_mode, enable_port_channel)
 
     @staticmethod
-    def get_provisioning_info(device_detail):
-        cluster = None
-        switch_ip = device_detail["host"]
-        switch_port = None
-        preemption = None
-        access_mode = None
-        return cluster, switch_ip, switch_port, preemption, access_mode
+    def _delete_device_vlan(plan, device_detail):
+        segment = device_detail['segmentation_id']
+        for cluster, switch_ip, switch_port, preemption, access_mode, enable_port_channel in \
+                get_switch_links(device_detail):
+            plan.delete_vlan(switch_ip, switch_port, segment, enable_port_channel)
+
+    def _delete_network(self, plan, network_id):
+        """
+        Delete the VLAN of the network, unless ports of another network share its segment on a link of the network,
+        then only the ports of the network are detached.
+        """
+        device_details = [self.devices_details_cache.remove(device_detail["port_id"])
+                          for device_detail in self.devices_details_cache.get_by_network(network_id)]
+        in_use = any(self.devices_details_cache.get_by_switch_segment(switch_ip, device_detail['segmentation_id'])
+                     for device_detail in device_details
+                     for _, switch_ip, _, _, _, _ in get_switch_links(device_detail))
+        if in_use:
+            LOG.info("VLAN of network %s is used by other networks, detaching its ports only", network_id)
+
+        for device_detail in device_details:
+            if in_use:
+                self._detach_device(plan, device_detail)
+            else:
+                self._delete_device_vlan(plan, device_detail)
+
+    def _port_intents(self):
+        """
+        :return: {PortIntent: [port_id]}, the intents of the cached ports and the ports asking for them
+        """
+        intents = collections.OrderedDict()
+        for device_detail in self.devices_details_cache:
+            segment = device_detail['segmentation_id']
+            switch_links = list(get_switch_links(device_detail))
+            links = tuple((switch_ip, switch_port) for _, switch_ip, switch_port, _, _, _ in switch_links)
+            for cluster, switch_ip, switch_port, preemption, access_mode, enable_port_channel in switch_links:
+                intent = PortIntent(switch_ip=switch_ip,
+                                    switch_port=switch_port,
+                                    vlan=segment,
+                                    cluster=cluster,
+                                    preemption=preemption,
+                                    access_mode=access_mode,
+                                    enable_port_channel=enable_port_channel,
+                                    links=links)
+                intents.setdefault(intent, []).append(device_detail["port_id"])
+        return intents
+
+    def _retry(self, key, item=None, error=None):
+        self.retry_queue.fail(key, item, error)
+        if key in self.retry_queue.dead_letters:
+            # given up, a new event starts over
+            self.journal.done(key)
+
+    def _submit(self, keys, func, *args, **kwargs):
+        """
+        Queue a switch operation on the apply engine. The keys are retried with backoff if it fails, or only those
+        the operation returns as failed.
+
+        Every operation is queued for the managed switch, whatever link it concerns, the operations sharing its
+        client and inventory run one after the other.
+
+        :param keys: list of (key, item) for the retry queue
+        :param func: switch operation, returning None or {key: error} of the keys it failed for
+        """
+        def attempt():
+            try:
+                failed = func(*args, **kwargs) or {}
+            except Exception as e:
+                for key, item in keys:
+                    self._retry(key, item, e)
+                raise
+
+            items = collections.OrderedDict(keys)
+            for key, error in failed.items():
+                self._retry(key, items.pop(key, None), error)
+
+            for key in items:
+                self.retry_queue.succeed(key)
+                self.journal.done(key)
+
+        attempt.__name__ = getattr(func, "__name__", "attempt")
+        self.apply_engine.submit(attempt)
+
+    def _submit_plan(self, plan):
+        for key, method, args in plan.operations():
+            self.journal.add(key, args)
+            self._submit([(key, args)], getattr(self.fabric_manager, method), *args)
+
+    def _reconcile_devices(self, prune=False, ports=()):
+        # the desired state covers every cached port, the switch only gets what drifted
+        self._submit([(("port", port_id), None) for port_id in ports], self._reconcile, self._port_intents(), prune)
+
+    def _reconcile(self, intents, prune):
+        """
+        :param intents: {PortIntent: [port_id]}
+        :return: {("port", port_id): error} of the ports left unconfigured, retried whether updated or not
+        """
+        self.fabric_manager.reconcile(list(intents), prune=prune)
+
+        failed = collections.OrderedDict()
+        for intent, error in self.fabric_manager.failed_intents.items():
+            for port_id in intents.get(intent, ()):
+                failed.setdefault(("port", port_id), error)
+        return failed
+
+    def notify_work(self):
+        """
+        Wake the agent loop, called by the RPC callbacks after queueing a port or network event.
+        """
+        self.work_event.set()
+
+    def _wait_for_work(self, start):
+        """
+        Wait till an event is queued, a retry is due or the resync interval ends, the polling interval while the
+        switch is unavailable. The events of a burst are then given coalesce_window seconds to arrive, up to
+        max_latency seconds after the first one, and handled in one iteration.
+        """
+        elapsed = (time.time() - start)
+        if elapsed >= self.polling_interval:
+            LOG.debug("Loop iteration exceeded interval "
+                      "(%(polling_interval)s vs. %(elapsed)s)!",
+                      {'polling_interval': self.polling_interval,
+                       'elapsed': elapsed})
+
+        available = self.fabric_manager.available()
+        timeout = max((self.resync_interval if available else self.polling_interval) - elapsed, 0)
+        retry = self.retry_queue.next_due()
+        if retry is not None and retry < timeout:
+            if not self.work_event.wait(retry):
+                return
+        elif not self.work_event.wait(timeout):
+            self.resync = available
+            return
+
+        deadline = time.monotonic() + self.max_latency
+        while True:
+            self.work_event.clear()
+            timeout = min(self.coalesce_window, deadline - time.monotonic())
+            if timeout <= 0 or not self.work_event.wait(timeout):
+                return
+
+    def run_iteration(self):
+        """
+        Apply the port and network changes received since the previous iteration.
+        """
+        if not self.fabric_manager.available():
+            # keep the pending work, the switch is probed in the background
+            LOG.warning("Switch %s is unavailable, skipping its work for this iteration",
+                        self.fabric_manager.address)
+            return
+
+        updated_ports = self._get_and_clear_member_set("updated_ports")
+        deleted_ports = self._get_and_clear_member_set("deleted_ports")
+        deleted_networks = self._get_and_clear_member_set("deleted_networks")
+
+        # a new event gets a fresh attempt count
+        for port_id in updated_ports:
+            self.retry_queue.discard(("port", port_id))
+
+        # group the deletions by switch and VLAN, each VLAN is deleted once
+        plan = WorkPlan(self.fabric_manager.address)
+        replayed_operations, self.replayed_operations = self.replayed_operations, []
+        for key, item in replayed_operations + self.retry_queue.due():
+            if key[0] == "port":
+                updated_ports.add(key[1])
+            else:
+                getattr(plan, key[0])(*item)
+
+        if len(updated_ports) or len(deleted_ports) or len(deleted_networks):
+            LOG.info("daemon_loop: updated_ports: {updated_ports}".format(updated_ports=updated_ports))
+            LOG.info("daemon_loop: deleted_ports: {deleted_ports}".format(deleted_ports=deleted_ports))
+            LOG.info("daemon_loop: deleted_networks: {deleted_networks}".format(deleted_networks=deleted_networks))
+
+        for port_id in deleted_ports:
+            device_detail = self.devices_details_cache.remove(port_id)
+            if device_detail is not None:
+                self._detach_device(plan, device_detail)
+
+        for network_id in deleted_networks:
+            self._delete_network(plan, network_id)
+        # the events are journaled as the switch operations they planned
+        self._submit_plan(plan)
+        for port_id in deleted_ports:
+            self.journal.done(("deleted_port", port_id))
+        for network_id in deleted_networks:
+            self.journal.done(("deleted_network", network_id))
+        cache_changed = bool(deleted_ports or deleted_networks)
+
+        if self.start_up or self.resume or self.resync or updated_ports:
+            full_sync = self.start_up
+            self.resync = False
+            snapshot_ports = {device_detail["port_id"]: device_detail for device_detail in self.devices_details_cache} \
+                if self.resume else {}
+            resync = self.refresh_devices_details_list(full=full_sync)
+            self.start_up = False
+
+            # Agent is out of sync with neutron
+            # retry the updated ports with backoff
+            if resync:
+                for port_id in updated_ports:
+                    self._retry(("port", port_id), error="unable to get port details")
+            else:
+                cache_changed = True
+                if self.resume:
+                    # ports unbound while the agent was down
+                    removed = WorkPlan(self.fabric_manager.address)
+                    for port_id, device_detail in snapshot_ports.items():
+                        if port_id not in self.devices_details_cache:
+                            self._detach_device(removed, device_detail)
+                    self._submit_plan(removed)
+                    self.resume = False
+
+                if full_sync:
+                    # do not trust the switch configuration read before
+                    self.fabric_manager.invalidate_inventory()
+
+                if full_sync and self.warm_start and not updated_ports:
+                    LOG.info("Work journal holds no unfinished port, skipping the full reconcile")
+                else:
+                    self._reconcile_devices(prune=full_sync, ports=updated_ports)
+                self.warm_start = False
+
+        # apply the queued operations, in order
+        if len(self.apply_engine):
+            self.apply_engine.run()
+
+            if not self.fabric_manager.available():
+                # operations were lost, resync everything once the switch is back
+                self.start_up = True
+
+        # save the configuration changes of this iteration
+        self.flush_fabric_manager()
+
+        # resume from here after a restart
+        if cache_changed or self.fabric_manager.fingerprint != self.saved_fingerprint:
+            self.snapshot.save(self.devices_details_cache,
+                               {self.fabric_manager.address: self.fabric_manager.fingerprint})
+            self.saved_fingerprint = self.fabric_manager.fingerprint
 
     def daemon_loop(self):
         LOG.info("%s Agent RPC Daemon Started!", self.agent_type)
 
-        start_up = True
-        previous_ports = set()
-
         while True:
             start = time.time()
-
-            updated_ports = self._get_and_clear_member_set("updated_ports") | previous_ports
-            previous_ports = set()
-            deleted_ports = self._get_and_clear_member_set("deleted_ports")
-            deleted_networks = self._get_and_clear_member_set("deleted_networks")
-
-            if len(updated_ports) or len(deleted_ports) or len(deleted_networks):
-                LOG.info("daemon_loop: updated_ports: {updated_ports}".format(updated_ports=updated_ports))
-                LOG.info("daemon_loop: deleted_ports: {deleted_ports}".format(deleted_ports=deleted_ports))
-                LOG.info("daemon_loop: deleted_networks: {deleted_networks}".format(deleted_networks=deleted_networks))
-
-            for port_id in deleted_ports:
-                for device_detail in self.cached_devices_details_list:
-                    if port_id == device_detail["port_id"]:
-                        segment = device_detail['segmentation_id']
-
-                        if device_detail["profile"].get("provisioning-fsf"):
-                            enable_port_channel = None
-                            cluster, switch_ip, switch_port, preemption, access_mode = self.get_provisioning_info(
-                                device_detail)
-                            self.fabric_manager.detach_port_from_vlan(switch_ip, switch_port, segment,
-                                                                      access_mode, enable_port_channel)
-                        elif device_detail["profile"].get("local_link_information"):
-                            enable_port_channel = len(device_detail['profile']['local_link_information']) > 1
-                            for local_link_information in device_detail['profile']['local_link_information']:
-                                cluster, switch_ip, switch_port, preemption, access_mode = self.get_local_link_info(
-                                    local_link_information)
-
-                                self.fabric_manager.detach_port_from_vlan(switch_ip, switch_port, segment,
-                                                                          access_mode, enable_port_channel)
-
-            for network_id in deleted_networks:
-                for device_detail in self.cached_devices_details_list:
-                    if network_id == device_detail["network_id"]:
-                        segment = device_detail['segmentation_id']
-
-                        if device_detail["profile"].get("provisioning-fsf"):
-                            enable_port_channel = None
-                            cluster, switch_ip, switch_port, preemption, access_mode = self.get_provisioning_info(
-                                device_detail)
-                            self.fabric_manager.delete_vlan(switch_ip, switch_port,
-                                                            segment, enable_port_channel)
-                        elif device_detail["profile"].get("local_link_information"):
-                            enable_port_channel = len(device_detail['profile']['local_link_information']) > 1
-                            for local_link_information in device_detail['profile']['local_link_information']:
-                                cluster, switch_ip, switch_port, preemption, access_mode = self.get_local_link_info(
-                                    local_link_information)
-
-                                self.fabric_manager.delete_vlan(switch_ip, switch_port,
-                                                                segment, enable_port_channel)
-
-            if start_up or updated_ports:
-                start_up = False
-                resync = self.refresh_devices_details_list()
-
-                # Agent is out of sync with neutron
-                # save the updated ports and wait for next sync
-                if resync:
-                    previous_ports = previous_ports | updated_ports
-                    continue
-
-                for device_detail in self.cached_devices_details_list:
-                    if updated_ports and device_detail["port_id"] not in updated_ports:
-                        continue
-
-                    segment = device_detail['segmentation_id']
-                    if device_detail["profile"].get("provisioning-fsf"):
-                        enable_port_channel = None
-                        cluster, switch_ip, switch_port, preemption, access_mode = self.get_provisioning_info(
-                            device_detail)
-
-                        # ensure above configuration
-                        self.fabric_manager.ensure_configuration(switch_ip=switch_ip,
-                                                                 ethernet_interface=switch_port,
-                                                                 vlan=segment,
-                                                                 cluster=cluster,
-                                                                 preemption=preemption,
-                                                                 access_mode=access_mode,
-                                                                 enable_port_channel=enable_port_channel)
-                    elif device_detail["profile"].get("local_link_information"):
-                        enable_port_channel = len(device_detail['profile']['local_link_information']) > 1
-                        for local_link_information in device_detail['profile']['local_link_information']:
-                            cluster, switch_ip, switch_port, preemption, access_mode = self.get_local_link_info(
-                                local_link_information)
-
-                            # ensure above configuration
-                            self.fabric_manager.ensure_configuration(switch_ip=switch_ip,
-                                                                     ethernet_interface=switch_port,
-                                                                     vlan=segment,
-                                                                     cluster=cluster,
-                                                                     preemption=preemption,
-                                                                     access_mode=access_mode,
-                                                                     enable_port_channel=enable_port_channel)
-
-            # sleep till end of polling interval
-            elapsed = (time.time() - start)
-            if elapsed < self.polling_interval:
-                time.sleep(self.polling_interval - elapsed)
-            else:
-                LOG.debug("Loop iteration exceeded interval "
-                          "(%(polling_interval)s vs. %(elapsed)s)!",
-                          {'polling_interval': self.polling_interval,
-                           'elapsed': elapsed})
+            self.run_iteration()
+            self.metrics.observe_loop(time.time() - start)
+            self.metrics.export()
+            self._wait_for_work(start)
 
 
 class OS10FERpcCallbacks(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
@@ -361,7 +639,7 @@ class OS10FERpcCallbacks(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
 
     def network_delete(self, context, **kwargs):
         LOG.info("network_delete received")
-        self.agent.deleted_networks.add(kwargs["network_id"])
+        self.agent.network_deleted(kwargs["network_id"])
 
     def network_update(self, context, **kwargs):
         LOG.info("network_update received")
@@ -374,11 +652,11 @@ class OS10FERpcCallbacks(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
         LOG.info("port_update received: {port}".format(port=port))
         LOG.info("segmentation_id: {segmentation_id}".format(segmentation_id=segmentation_id))
 
-        self.agent.updated_ports.add(port["id"])
+        self.agent.port_updated(port["id"])
 
     def port_delete(self, context, **kwargs):
         LOG.info("port_delete received")
-        self.agent.deleted_ports.add(kwargs["port_id"])
+        self.agent.port_deleted(kwargs["port_id"])
 
     def binding_deactivate(self, context, **kwargs):
         LOG.info("binding_deactivate received")
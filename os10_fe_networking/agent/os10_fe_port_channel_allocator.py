@@ -0,0 +1,205 @@
+import collections
+import json
+import os
+
+from oslo_log import log as logging
+
+from os10_fe_networking.agent.rest_conf.interface import PortChannelInterface
+
+LOG = logging.getLogger(__name__)
+
+
+class PortChannelAllocator:
+    """
+    Port channel ids of one switch in [begin, end], each allocated to a single server.
+
+    A server is keyed by the caller, the links of a server share its id. Used ids are bits of an int, a new server
+    gets the lowest free id found with bit operations, unless its member ports are already in a port channel of the
+    range nobody owns, which it takes over. Allocations are saved to journal_path, if set, so a server keeps its id
+    across agent restarts.
+    """
+
+    def __init__(self, begin=125, end=128, journal_path=None):
+        self.begin = int(begin)
+        self.end = int(end)
+        self.journal_path = journal_path
+        self.stats = collections.Counter()
+
+        self._mask = (1 << (self.end - self.begin + 1)) - 1
+        self._used = 0
+        # {key: channel_id}
+        self._assignments = {}
+        # {channel_id: key}
+        self._owners = {}
+        # {key: member ports}
+        self._key_members = {}
+        # {member port: channel_id}, of the allocations and of the switch inventory
+        self._members = {}
+        self._seeded = False
+
+        self._load_journal()
+
+    @property
+    def capacity(self):
+        return self.end - self.begin + 1
+
+    @property
+    def used(self):
+        return bin(self._used).count("1")
+
+    @property
+    def seeded(self):
+        return self._seeded
+
+    def __contains__(self, channel_id):
+        return self.begin <= int(channel_id) <= self.end
+
+    def _bit(self, channel_id):
+        return 1 << (int(channel_id) - self.begin)
+
+    def _claim(self, key, channel_id, members):
+        self._assignments[key] = channel_id
+        self._owners[channel_id] = key
+        self._key_members[key] = sorted(members)
+        for member in members:
+            self._members[member] = channel_id
+        self._used |= self._bit(channel_id)
+
+    def _load_journal(self):
+        if not self.journal_path or not os.path.exists(self.journal_path):
+            return
+
+        try:
+            with open(self.journal_path, encoding="utf8") as journal:
+                assignments = json.load(journal)
+        except (OSError, ValueError):
+            LOG.exception("Unable to read port channel journal %s, starting empty", self.journal_path)
+            return
+
+        for key, assignment in sorted(assignments.items()):
+            channel_id = assignment.get("id") if isinstance(assignment, dict) else None
+            if channel_id is None or channel_id not in self or channel_id in self._owners:
+                LOG.warning("Skipping port channel journal entry %(key)s: %(assignment)s",
+                            {"key": key, "assignment": assignment})
+                continue
+
+            self._claim(key, channel_id, assignment.get("members", []))
+
+    def _save_journal(self):
+        if not self.journal_path:
+            return
+
+        tmp_path = self.journal_path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.journal_path) or os.curdir, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf8") as journal:
+                json.dump({key: {"id": channel_id, "members": self._key_members[key]}
+                           for key, channel_id in self._assignments.items()}, journal, sort_keys=True)
+            os.replace(tmp_path, self.journal_path)
+        except OSError:
+            # the switch inventory wins over a stale journal when seeded
+            LOG.exception("Unable to save port channel journal %s", self.journal_path)
+            self.stats["journal_errors"] += 1
+
+    def seed(self, port_channel_dict):
+        """
+        Mark the port channels of the switch inventory as used. The switch wins over the journal, an allocation whose
+        member ports are found in another port channel is dropped and taken over from the switch on the next
+        allocation.
+
+        :param port_channel_dict: {"port-channel1": {...}, ...}
+        """
+        members = {}
+        for name, port_channel in port_channel_dict.items():
+            channel_id = PortChannelInterface.extract_numeric_id(name)
+            if channel_id not in self:
+                continue
+
+            self._used |= self._bit(channel_id)
+            for member in port_channel.get("dell-interface:member-ports", []):
+                members[member["name"]] = channel_id
+
+        for key, channel_id in list(self._assignments.items()):
+            if any(members.get(member, channel_id) != channel_id for member in self._key_members[key]):
+                self.release(key)
+
+        self._members.update(members)
+        self._seeded = True
+        self._save_journal()
+
+    def lookup(self, key):
+        return self._assignments.get(key)
+
+    def lookup_member(self, member):
+        """
+        :return: id of the port channel in the range holding the member port, None if there is none
+        """
+        return self._members.get(member)
+
+    def allocate(self, key, members=()):
+        """
+        The id of the server, allocated if it has none yet.
+
+        :param key: identity of the server
+        :param members: member ports of the port channel on this switch
+        :raises RuntimeError: if every id of the range is used
+        """
+        channel_id = self._assignments.get(key)
+        if channel_id is not None:
+            if not set(members).issubset(self._key_members[key]):
+                self._claim(key, channel_id, set(members).union(self._key_members[key]))
+                self._save_journal()
+            return channel_id
+
+        held = [self._members[member] for member in members
+                if member in self._members and self._members[member] not in self._owners]
+        if held:
+            channel_id = min(held)
+            self.stats["adoptions"] += 1
+        else:
+            free = ~self._used & self._mask
+            if not free:
+                self.stats["exhausted"] += 1
+                raise RuntimeError("unable to allocate in range {begin} - {end} for {key}".format(begin=self.begin,
+                                                                                                 end=self.end,
+                                                                                                 key=key))
+
+            # lowest set bit of the free ids
+            channel_id = self.begin + (free & -free).bit_length() - 1
+
+        self._claim(key, channel_id, members)
+        self.stats["allocations"] += 1
+        self._save_journal()
+
+        return channel_id
+
+    def release(self, key):
+        channel_id = self._assignments.pop(key, None)
+        if channel_id is None:
+            return None
+
+        del self._owners[channel_id]
+        for member in self._key_members.pop(key):
+            if self._members.get(member) == channel_id:
+                del self._members[member]
+        self._used &= ~self._bit(channel_id)
+        self.stats["releases"] += 1
+        self._save_journal()
+
+        return channel_id
+
+    def release_id(self, channel_id):
+        """
+        Forget the port channel, deleted from the switch, and the server it was allocated to.
+        """
+        if channel_id not in self:
+            return
+
+        channel_id = int(channel_id)
+        if channel_id in self._owners:
+            self.release(self._owners[channel_id])
+
+        for member, member_channel_id in list(self._members.items()):
+            if member_channel_id == channel_id:
+                del self._members[member]
+        self._used &= ~self._bit(channel_id)
@@ -0,0 +1,303 @@
+import collections
+import copy
+import hashlib
+import json
+
+from oslo_log import log as logging
+
+from os10_fe_networking.agent.os10_fe_interface_inventory import InterfaceInventory
+from os10_fe_networking.agent.rest_conf.interface import Interface, VLanInterface, PortChannelInterface
+
+LOG = logging.getLogger(__name__)
+
+PortIntent = collections.namedtuple("PortIntent", ["switch_ip", "switch_port", "vlan", "cluster", "preemption",
+                                                   "access_mode", "enable_port_channel", "links"])
+# links: ((switch_ip, switch_port), ...) of every link of the server, on all switches. Empty for the link alone.
+PortIntent.__new__.__defaults__ = ((),)
+
+# fields holding memberships, only missing members are written. lag-mode is written along with member-ports.
+UNTAGGED_PORTS = "dell-interface:untagged-ports"
+TAGGED_PORTS = "dell-interface:tagged-ports"
+MEMBER_PORTS = "dell-interface:member-ports"
+LAG_MODE = "dell-interface:lag-mode"
+MEMBERSHIP_KEYS = (UNTAGGED_PORTS, TAGGED_PORTS, MEMBER_PORTS)
+
+# fields omitted by content=config when they hold the default value
+DEFAULT_VALUES = {
+    "enabled": True
+}
+
+_type_order = {
+    Interface.Type.VLan: 0,
+    Interface.Type.PortChannel: 1,
+    Interface.Type.Ethernet: 2
+}
+
+
+def matches(desired, observed):
+    """
+    Check that the observed value holds everything in the desired value. Dicts and lists may hold more.
+    """
+    if isinstance(desired, dict):
+        return isinstance(observed, dict) and all(matches(value, observed.get(key)) for key, value in desired.items())
+    if isinstance(desired, list):
+        return isinstance(observed, list) and all(any(matches(item, o) for o in observed) for item in desired)
+    return desired == observed
+
+
+def missing_items(desired, observed):
+    observed = observed or []
+    return [item for item in desired if not any(matches(item, o) for o in observed)]
+
+
+def field_matches(key, desired, interface):
+    if key not in interface and key in DEFAULT_VALUES:
+        return desired == DEFAULT_VALUES[key]
+    return matches(desired, interface.get(key))
+
+
+class Operation:
+    WRITE = "write"
+    DELETE = "delete"
+
+    def __init__(self, verb, name, body=None):
+        self.verb = verb
+        self.name = name
+        self.body = body
+
+    def __eq__(self, other):
+        if isinstance(other, self.__class__):
+            return self.__dict__ == other.__dict__
+        else:
+            return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        return "Operation(%s, %s)" % (self.verb, self.name)
+
+    @staticmethod
+    def write_interface(entry):
+        return Operation(Operation.WRITE, entry["name"], {
+            "ietf-interfaces:interfaces": {
+                "interface": [entry]
+            }
+        })
+
+    @staticmethod
+    def write_interface_range(vlan_id, tagged_ports):
+        return Operation(Operation.WRITE, "vlan%s" % vlan_id, {
+            "ietf-interfaces:interfaces": {
+                "dell-interface-range:interface-range": [
+                    {
+                        "name": str(vlan_id),
+                        "config-template": {
+                            TAGGED_PORTS: tagged_ports
+                        }
+                    }
+                ]
+            }
+        })
+
+    @staticmethod
+    def delete_interface(name):
+        return Operation(Operation.DELETE, name)
+
+
+class DesiredState:
+    """
+    Interface configuration a switch should hold, in the shape of the RESTCONF interface entries.
+
+    Fields added as create_only are only written when the interface does not exist yet.
+    """
+
+    def __init__(self):
+        self.interfaces = collections.OrderedDict()
+        self.create_only = {}
+        # {intent: error}, the intents whose configuration could not be built
+        self.failed = collections.OrderedDict()
+        # {name: [intent]}, the intents each interface is desired for
+        self.owners = {}
+
+    def __len__(self):
+        return len(self.interfaces)
+
+    def _merge(self, current, update):
+        for key, value in update.items():
+            if isinstance(value, list) and isinstance(current.get(key), list):
+                current[key].extend(item for item in value if item not in current[key])
+            elif isinstance(value, dict) and isinstance(current.get(key), dict):
+                self._merge(current[key], value)
+            else:
+                current[key] = copy.deepcopy(value)
+
+    def add_entry(self, entry, create_only=False):
+        name = entry["name"]
+        create_only_keys = self.create_only.setdefault(name, set())
+        for key in entry:
+            if key in ("name", "type"):
+                continue
+            if create_only and (name not in self.interfaces or key not in self.interfaces[name]):
+                create_only_keys.add(key)
+            elif not create_only:
+                create_only_keys.discard(key)
+
+        if name in self.interfaces:
+            self._merge(self.interfaces[name], entry)
+        else:
+            self.interfaces[name] = copy.deepcopy(entry)
+
+    def update(self, other):
+        """
+        Add the interfaces of another desired state.
+        """
+        for name, entry in other.interfaces.items():
+            create_only_keys = other.create_only.get(name, set())
+            self.add_entry({key: value for key, value in entry.items() if key not in create_only_keys})
+            if create_only_keys:
+                self.add_entry(dict({key: entry[key] for key in create_only_keys}, name=name, type=entry["type"]),
+                               create_only=True)
+
+    def owners_of(self, operation):
+        """
+        The intents an operation is needed for. A vlan membership write is needed for the ports it adds.
+
+        :return: list of intents
+        """
+        ports = []
+        if operation.body is not None:
+            body = operation.body["ietf-interfaces:interfaces"]
+            for entry in body.get("interface", []):
+                ports.extend(entry.get(UNTAGGED_PORTS, []) + entry.get(TAGGED_PORTS, []))
+            for interface_range in body.get("dell-interface-range:interface-range", []):
+                ports.extend(interface_range["config-template"][TAGGED_PORTS])
+
+        owners = collections.OrderedDict()
+        for name in ports or [operation.name]:
+            owners.update((intent, None) for intent in self.owners.get(name, ()))
+        return list(owners)
+
+    def add(self, interface, create_only=False):
+        """
+        Add the body an Interface object would write.
+        """
+        body = interface.content()["ietf-interfaces:interfaces"]
+        for entry in body.get("interface", []):
+            self.add_entry(entry, create_only)
+
+        for interface_range in body.get("dell-interface-range:interface-range", []):
+            tagged_ports = interface_range["config-template"][TAGGED_PORTS]
+            for name in InterfaceInventory.expand_vlan_range(interface_range["name"]):
+                self.add_entry({"name": name, "type": Interface.Type.VLan, TAGGED_PORTS: list(tagged_ports)},
+                               create_only)
+
+    def add_port_channel(self, port_channel, create_only=False):
+        """
+        Add everything OS10FERestConfClient.configure_port_channel writes.
+        """
+        port = "port-channel" + port_channel.channel_id
+        self.add(port_channel, create_only)
+        if port_channel.access_vlan_id is not None:
+            self.add(VLanInterface(vlan_id=port_channel.access_vlan_id, port_mode=VLanInterface.PortMode.ACCESS,
+                                   port=port))
+        if port_channel.trunk_allowed_vlan_ids is not None:
+            self.add(VLanInterface(vlan_id=port_channel.trunk_allowed_vlan_ids, port_mode=VLanInterface.PortMode.TRUNK,
+                                   port=port))
+
+    def add_ethernet(self, ethernet_interface, create_only=False):
+        """
+        Add everything OS10FERestConfClient.configure_ethernet_interface writes.
+        """
+        port = "ethernet" + ethernet_interface.eif_id
+        self.add(ethernet_interface, create_only)
+        if ethernet_interface.access_vlan_id is not None:
+            self.add(VLanInterface(vlan_id=ethernet_interface.access_vlan_id, port_mode=VLanInterface.PortMode.ACCESS,
+                                   port=port))
+        if ethernet_interface.trunk_allowed_vlan_ids is not None:
+            self.add(VLanInterface(vlan_id=ethernet_interface.trunk_allowed_vlan_ids,
+                                   port_mode=VLanInterface.PortMode.TRUNK, port=port))
+        if ethernet_interface.channel_group is not None:
+            self.add(PortChannelInterface(channel_id=ethernet_interface.channel_group,
+                                          ethernet_if=ethernet_interface.eif_id))
+
+
+def diff(desired, all_interfaces, prunable=None):
+    """
+    Compute the operations bringing the observed interfaces to the desired state.
+
+    :param desired: DesiredState
+    :param all_interfaces: interfaces by type, as returned by InterfaceInventory.get
+    :param prunable: callable telling if an observed interface missing from the desired state is to be deleted
+    :return: list of Operation, deletes first, then interfaces, then memberships
+    """
+    observed = {}
+    for interfaces in all_interfaces.values():
+        observed.update(interfaces)
+
+    deletes = []
+    if prunable is not None:
+        deletes = [Operation.delete_interface(name) for name in observed
+                   if name not in desired.interfaces and prunable(name)]
+
+    writes = []
+    member_writes = []
+    untagged_writes = []
+    tagged_writes = []
+    for name, entry in sorted(desired.interfaces.items(), key=lambda item: _type_order.get(item[1]["type"], 3)):
+        interface = observed.get(name)
+        skip_keys = desired.create_only.get(name, set()) if interface is not None else set()
+        interface = interface or {}
+
+        changes = {key: value for key, value in entry.items()
+                   if key not in ("name", "type", LAG_MODE) + MEMBERSHIP_KEYS and key not in skip_keys and
+                   not field_matches(key, value, interface)}
+        if name not in observed or changes:
+            writes.append(Operation.write_interface(dict(name=name, type=entry["type"], **changes)))
+
+        if MEMBER_PORTS in entry:
+            members = missing_items(entry[MEMBER_PORTS], interface.get(MEMBER_PORTS))
+            if members:
+                member_writes.append(Operation.write_interface({"name": name,
+                                                                "type": entry["type"],
+                                                                LAG_MODE: entry.get(LAG_MODE, "DYNAMIC"),
+                                                                MEMBER_PORTS: members}))
+
+        if UNTAGGED_PORTS in entry:
+            ports = missing_items(entry[UNTAGGED_PORTS], interface.get(UNTAGGED_PORTS))
+            if ports:
+                untagged_writes.append(Operation.write_interface({"name": name,
+                                                                  "type": entry["type"],
+                                                                  UNTAGGED_PORTS: ports}))
+
+        if TAGGED_PORTS in entry:
+            ports = missing_items(entry[TAGGED_PORTS], interface.get(TAGGED_PORTS))
+            if ports:
+                tagged_writes.append(Operation.write_interface_range(VLanInterface.extract_numeric_id(name), ports))
+
+    return deletes + writes + member_writes + untagged_writes + tagged_writes
+
+
+def _digest(entries):
+    # entry by entry, the state of a large switch is never serialized at once
+    digest = hashlib.sha256()
+    for name in sorted(entries):
+        digest.update(json.dumps([name, entries[name]], sort_keys=True, separators=(",", ":")).encode())
+    return digest.hexdigest()
+
+
+def fingerprint(desired, all_interfaces):
+    """
+    Digest the desired state and the observed configuration of the interfaces it covers. Equal fingerprints mean
+    the diff of the two has not changed.
+
+    :return: (desired digest, observed digest)
+    """
+    observed = {}
+    for interfaces in all_interfaces.values():
+        for name in desired.interfaces:
+            if name in interfaces:
+                observed[name] = interfaces[name]
+
+    return _digest({name: [entry, sorted(desired.create_only.get(name, ()))]
+                    for name, entry in desired.interfaces.items()}), _digest(observed)
@@ -0,0 +1,105 @@
+import bisect
+import collections
+import contextlib
+import re
+import threading
+import urllib.parse
+
+from os10_fe_networking.agent.rest_conf.interface import Interface, PortChannelInterface, EthernetInterface
+from os10_fe_networking.agent.rest_conf.virtual_route_forwarding import IPVirtualRouteForwarding
+
+Request = collections.namedtuple("Request", ["operation", "port", "method", "path", "status", "bytes_sent",
+                                             "bytes_received", "seconds"])
+
+# paths holding names, reported as their template
+_PATH_TEMPLATES = [Interface.path_by_name, PortChannelInterface.path_get, PortChannelInterface.path_get_untagged_vlan,
+                   PortChannelInterface.path_delete_untagged_vlan, EthernetInterface.path_detach_port] + \
+                  list(IPVirtualRouteForwarding.path_by_name.values())
+
+
+def _template_pattern(template):
+    parts = re.split(r"(\{[a-z_]+\})", template)
+    return re.compile("^" + "".join("[^/]+" if part.startswith("{") else re.escape(part) for part in parts) + "$")
+
+
+_PATH_PATTERNS = [(_template_pattern(template), template) for template in _PATH_TEMPLATES]
+
+# upper bounds in seconds of the request duration buckets
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def path_template(url):
+    """
+    https://100.127.0.125/restconf/data/ietf-interfaces:interfaces/interface/vlan2222
+        ==> /restconf/data/ietf-interfaces:interfaces/interface/{name}
+    """
+    path = urllib.parse.unquote(urllib.parse.urlsplit(url).path)
+    for pattern, template in _PATH_PATTERNS:
+        if pattern.match(path):
+            return template
+    return path
+
+
+class RequestBudget:
+    """
+    RESTCONF requests of a client, attributed to the fabric manager operation and port that caused them.
+
+    The operation is kept per thread, green threads of one client each account for their own operation.
+    """
+
+    OTHER = "other"
+
+    def __init__(self, history=1000):
+        # {operation: Counter(requests, errors, bytes_sent, bytes_received, seconds)}
+        self.totals = collections.defaultdict(collections.Counter)
+        self.history = collections.deque(maxlen=history)
+        # {(method, path template): requests per bucket of LATENCY_BUCKETS, the last one above them all}
+        self.latency = collections.defaultdict(lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+        # {(method, path template): seconds}
+        self.latency_seconds = collections.Counter()
+
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def operation(self, name, port=None):
+        """
+        Attribute the requests sent in the block to an operation. A nested operation is accounted to the outer one.
+        """
+        if getattr(self._local, "operation", None) is not None:
+            yield
+            return
+
+        self._local.operation = (name, port)
+        try:
+            yield
+        finally:
+            self._local.operation = None
+
+    def record(self, method, url, status, bytes_sent, bytes_received, seconds):
+        """
+        :param status: response status, None if no response was received
+        """
+        operation, port = getattr(self._local, "operation", None) or (self.OTHER, None)
+        path = path_template(url)
+        self.history.append(Request(operation, port, method, path, status, bytes_sent, bytes_received, seconds))
+
+        self.latency[method, path][bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.latency_seconds[method, path] += seconds
+
+        totals = self.totals[operation]
+        totals["requests"] += 1
+        totals[method] += 1
+        totals["bytes_sent"] += bytes_sent
+        totals["bytes_received"] += bytes_received
+        totals["seconds"] += seconds
+        if status is None or status >= 400:
+            totals["errors"] += 1
+
+    def requests(self, operation):
+        return self.totals[operation]["requests"] if operation in self.totals else 0
+
+    def reset(self):
+        self.totals.clear()
+        self.history.clear()
+        self.latency.clear()
+        self.latency_seconds.clear()
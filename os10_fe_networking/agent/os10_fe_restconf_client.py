@@ -1,8 +1,17 @@
+import collections
+import contextlib
+import random
+import time
+
 import requests
 from oslo_log import log as logging
 from requests import status_codes
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 
+from os10_fe_networking.agent.os10_fe_circuit_breaker import CircuitBreaker
+from os10_fe_networking.agent.os10_fe_interface_inventory import InterfaceInventory
+from os10_fe_networking.agent.os10_fe_request_budget import RequestBudget
 from os10_fe_networking.agent.rest_conf.border_gateway_protocol import BorderGatewayProtocol
 from os10_fe_networking.agent.rest_conf.common import Copy
 from os10_fe_networking.agent.rest_conf.interface import VLanInterface, PortChannelInterface, EthernetInterface, \
@@ -13,61 +22,226 @@ from os10_fe_networking.agent.rest_conf.virtual_route_forwarding import IPVirtua
 LOG = logging.getLogger(__name__)
 
 
+class InterfaceBatch:
+    """
+    Interface writes collected by OS10FERestConfClient.batch, sent as few combined PATCH requests.
+
+    Entries keep their order. An interface written twice starts a new request, so the second write is applied
+    after the first.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.ok = True
+        # (key, name) of the entries rejected by the switch
+        self.rejected = set()
+
+        self._names = None
+
+    def __len__(self):
+        return sum(len(chunk) for chunk in self.chunks)
+
+    def add(self, body, patch_only=False):
+        interfaces = body["ietf-interfaces:interfaces"]
+        for key, entries in interfaces.items():
+            for entry in entries:
+                name = (key, entry["name"])
+                if not self.chunks or name in self._names:
+                    self.chunks.append([])
+                    self._names = set()
+
+                self.chunks[-1].append((key, entry, patch_only))
+                self._names.add(name)
+
+    def rejects(self, body):
+        """
+        :return: True if the switch rejected an entry of the interfaces body
+        """
+        return any((key, entry["name"]) in self.rejected
+                   for key, entries in body["ietf-interfaces:interfaces"].items() for entry in entries)
+
+    @staticmethod
+    def content(chunk):
+        interfaces = {}
+        for key, entry, _ in chunk:
+            interfaces.setdefault(key, []).append(entry)
+
+        return {
+            "ietf-interfaces:interfaces": interfaces
+        }
+
+
+# sessions by (mgmt_ip, username, password, pool_maxsize, pool_block)
+_sessions = {}
+
+
+def get_session(mgmt_ip, username, password, pool_maxsize=4, pool_block=False):
+    """
+    Session of a switch, shared by all clients of the address with the same pool settings so they reuse its open
+    connections instead of paying a TLS handshake each.
+
+    :param pool_maxsize: connections kept open to the switch
+    :param pool_block: wait for a free connection instead of opening one that is not kept
+    """
+    key = (mgmt_ip, username, password, pool_maxsize, pool_block)
+    session = _sessions.get(key)
+    if session is None:
+        session = requests.Session()
+        session.auth = HTTPBasicAuth(username, password)
+        # retries are handled by OS10FERestConfClient._request
+        session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, pool_block=pool_block,
+                                              max_retries=0))
+        _sessions[key] = session
+
+    return session
+
+
 class OS10FERestConfClient:
 
-    def __init__(self, mgmt_ip, username="admin", password="D@ngerous1"):
+    # retried on connection and server errors
+    IDEMPOTENT_METHODS = ("GET", "PUT", "DELETE")
+
+    def __init__(self, mgmt_ip, username="admin", password="D@ngerous1", inventory_ttl=None, timeout=None, retries=0,
+                 retry_backoff=0.5, failure_threshold=3, probe_interval=30, pool_maxsize=4, pool_block=False):
         self.username = username
         self.password = password
         self.verify = False
         self.headers = {'Content-type': 'application/json', 'Accept': 'application/json'}
         self.mgmt_ip = mgmt_ip
         self.base_url = "https://" + mgmt_ip
-        self.session = requests.Session()
-        self.session.auth = requests.auth.HTTPBasicAuth(self.username, self.password)
+        self.session = get_session(mgmt_ip, self.username, self.password, pool_maxsize, pool_block)
+        # (connect, read) seconds
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.breaker = CircuitBreaker(mgmt_ip, failure_threshold, probe_interval, self._probe)
+        # requests by fabric manager operation
+        self.budget = RequestBudget()
+        self.inventory = InterfaceInventory(self._load_interfaces_by_type, inventory_ttl,
+                                            on_invalidate=self._forget_existing_interfaces)
+        self.stats = collections.Counter()
+        # PATCH/POST guessed wrong, by object type
+        self.fallbacks = collections.Counter()
+
+        self._batch = None
+        # names of the interfaces on the switch, None until the inventory is read
+        self._existing_interfaces = None
+        # fields query parameter accepted by the switch, None until tried
+        self._fields_supported = None
+
+    def _backoff(self, attempt):
+        delay = self.retry_backoff * (2 ** (attempt - 1))
+        return random.uniform(delay / 2, delay)
+
+    def _request(self, method, url, parameters, body=None, stream=False):
+        """
+        Send a request, retrying idempotent methods on connection and server errors.
+
+        Raises SwitchUnavailable without sending anything while the switch is down.
+        :return: the last response
+        """
+        self.breaker.check()
+
+        attempts = 1 + (self.retries if method in self.IDEMPOTENT_METHODS else 0)
+        resp = None
+        error = None
+        for attempt in range(attempts):
+            if attempt:
+                self.stats["retries"] += 1
+                time.sleep(self._backoff(attempt))
+
+            start = time.monotonic()
+            try:
+                resp = self.session.request(method, url,
+                                            params=parameters,
+                                            json=body,
+                                            verify=self.verify,
+                                            headers=self.headers,
+                                            timeout=self.timeout,
+                                            stream=stream)
+                error = None
+            except (requests.ConnectionError, requests.Timeout) as e:
+                LOG.debug("{method} {url} failed: {error}".format(method=method, url=url, error=e))
+                self.budget.record(method, url, None, 0, 0, time.monotonic() - start)
+                resp = None
+                error = e
+                continue
+
+            self._record(method, url, resp, stream, time.monotonic() - start)
+
+            if resp.status_code < 500:
+                break
+
+        if error is not None or resp.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+        if error is not None:
+            raise error
+        return resp
 
-    def _get(self, url, parameters):
-        resp = self.session.get(url,
-                                params=parameters,
+    def _record(self, method, url, resp, stream, seconds):
+        request_body = resp.request.body if resp.request is not None else None
+        if stream:
+            bytes_received = int(resp.headers.get("Content-Length", 0))
+        else:
+            bytes_received = len(resp.content)
+        self.budget.record(method, url, resp.status_code, len(request_body or b""), bytes_received, seconds)
+
+    def connection_stats(self):
+        """
+        :return: Counter of the connections opened to the switch and of the requests sent on an already open one
+        """
+        stats = collections.Counter()
+        poolmanager = getattr(self.session.get_adapter(self.base_url), "poolmanager", None)
+        if poolmanager is None:
+            return stats
+
+        pools = poolmanager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            stats["new_connections"] += pool.num_connections
+            stats["reused_connections"] += max(pool.num_requests - pool.num_connections, 0)
+
+        return stats
+
+    def _probe(self):
+        """
+        Any answer but a server error means the switch is back.
+        """
+        resp = self.session.get(self.base_url + Interface.path_by_name.format(name="vlan1"),
+                                params={"depth": 1},
                                 verify=self.verify,
-                                headers=self.headers)
+                                headers=self.headers,
+                                timeout=self.timeout)
+        return resp.status_code < 500
+
+    def _get(self, url, parameters, stream=False):
+        resp = self._request("GET", url, parameters, stream=stream)
         # LOG.debug(resp.json())
         return resp
 
     def _post(self, url, parameters, body):
         LOG.debug(body)
-        resp = self.session.post(url,
-                                 params=parameters,
-                                 json=body,
-                                 verify=self.verify,
-                                 headers=self.headers)
+        resp = self._request("POST", url, parameters, body)
         LOG.debug(resp)
         return resp
 
     def _put(self, url, parameters, body):
-        resp = self.session.put(url,
-                                params=parameters,
-                                json=body,
-                                verify=self.verify,
-                                headers=self.headers)
+        resp = self._request("PUT", url, parameters, body)
         LOG.debug(resp)
         return resp
 
     def _delete(self, url, parameters):
         LOG.debug("DELETE {url}".format(url=url))
-        resp = self.session.delete(url,
-                                   params=parameters,
-                                   verify=self.verify,
-                                   headers=self.headers)
+        resp = self._request("DELETE", url, parameters)
         LOG.debug(resp)
         return resp
 
     def _patch(self, url, parameters, body):
         LOG.debug(body)
-        resp = self.session.patch(url,
-                                  params=parameters,
-                                  json=body,
-                                  verify=self.verify,
-                                  headers=self.headers)
+        resp = self._request("PATCH", url, parameters, body)
         LOG.debug(resp)
         return resp
 
@@ -78,16 +252,158 @@ class OS10FERestConfClient:
         else:
             return None
 
-    def _patch_and_post(self, url, parameters, body):
+    def _patch_and_post(self, url, parameters, body, object_type=None):
         resp = self._patch(url, parameters, body)
         if resp.status_code == status_codes.codes['not_found']:
             error_msg = self._get_error_message(resp.json())
             if error_msg == "require-instance test failed":
                 # fallback to post, since object doesn't exist
+                self.fallbacks[object_type or "other"] += 1
                 resp = self._post(url, parameters, body)
 
         return resp
 
+    def _post_and_patch(self, url, parameters, body, object_type=None):
+        resp = self._post(url, parameters, body)
+        if resp.status_code == status_codes.codes['conflict']:
+            # fallback to patch, since object already exists
+            self.fallbacks[object_type or "other"] += 1
+            resp = self._patch(url, parameters, body)
+
+        return resp
+
+    def _forget_existing_interfaces(self):
+        # unknown until the inventory is read again
+        self._existing_interfaces = None
+
+    def interface_exists(self, name):
+        """
+        :return: True or False, None if unknown
+        """
+        if self._existing_interfaces is None:
+            return None
+
+        return name in self._existing_interfaces
+
+    def _is_new_interface(self, key, entry, patch_only):
+        return key == "interface" and not patch_only and self.interface_exists(entry["name"]) is False
+
+    def _interfaces_written(self, body):
+        self.inventory.apply_content(body)
+        if self._existing_interfaces is not None:
+            self._existing_interfaces.update(entry["name"] for entry in body["ietf-interfaces:interfaces"].get(
+                "interface", []))
+
+    def _write_interfaces(self, url, body, patch_only=False):
+        """
+        PATCH (and POST when the object is missing) an interfaces body, keeping the inventory in sync.
+
+        :return: the response, or the batch collecting the body
+        """
+        if self._batch is not None:
+            self._batch.add(body, patch_only)
+            return self._batch
+
+        entries = [(key, entry) for key, key_entries in body["ietf-interfaces:interfaces"].items()
+                   for entry in key_entries]
+        object_type = entries[0][1].get("type", entries[0][0]) if entries else None
+        try:
+            if patch_only:
+                resp = self._patch(url, None, body)
+            elif entries and all(self._is_new_interface(key, entry, patch_only) for key, entry in entries):
+                # the object doesn't exist, create it right away
+                self.stats["posts"] += 1
+                resp = self._post_and_patch(url, None, body, object_type)
+            else:
+                resp = self._patch_and_post(url, None, body, object_type)
+        except Exception:
+            self.inventory.invalidate()
+            raise
+
+        if resp.ok:
+            self._interfaces_written(body)
+        else:
+            # the switch state is unknown now, read it again next time
+            self.inventory.invalidate()
+
+        return resp
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Collect the interface writes issued in the block and send them as combined PATCH requests on exit.
+        Nested blocks join the outermost one. Nothing is sent if the block raises.
+
+            with client.batch() as batch:
+                client.configure_vlan(...)
+                client.configure_port_channel(...)
+            if not batch.ok:
+                ...
+        """
+        if self._batch is not None:
+            yield self._batch
+            return
+
+        self._batch = InterfaceBatch()
+        try:
+            yield self._batch
+        finally:
+            batch = self._batch
+            self._batch = None
+
+        self._commit_batch(batch)
+
+    def _flush_batch(self):
+        if self._batch is None:
+            return
+
+        batch = self._batch
+        self._batch = None
+        try:
+            self._commit_batch(batch)
+        finally:
+            batch.chunks = []
+            self._batch = batch
+
+    def _commit_batch(self, batch):
+        url = self.base_url + Interface.path
+        for chunk in batch.chunks:
+            # a PATCH is rejected if it holds new objects, create them one by one first
+            new_entries = [item for item in chunk if self._is_new_interface(*item)]
+            for key, entry, patch_only in new_entries:
+                self._commit_entry(batch, url, key, entry, patch_only)
+            chunk = [item for item in chunk if item not in new_entries]
+
+            if len(chunk) == 1:
+                self._commit_entry(batch, url, *chunk[0])
+            if len(chunk) <= 1:
+                continue
+
+            body = InterfaceBatch.content(chunk)
+            self.stats["batch_requests"] += 1
+            self.stats["batch_entries"] += len(chunk)
+            try:
+                resp = self._patch(url, None, body)
+            except Exception:
+                self.inventory.invalidate()
+                raise
+
+            if resp.ok:
+                self._interfaces_written(body)
+                continue
+
+            # e.g. an object of the batch doesn't exist yet, write object by object
+            LOG.debug("Batch of %(count)s interfaces rejected by %(switch)s: %(status)s",
+                      {"count": len(chunk), "switch": self.mgmt_ip, "status": resp.status_code})
+            self.stats["batch_fallbacks"] += 1
+            for key, entry, patch_only in chunk:
+                self._commit_entry(batch, url, key, entry, patch_only)
+
+    def _commit_entry(self, batch, url, key, entry, patch_only):
+        if not self._write_interfaces(url, InterfaceBatch.content([(key, entry, patch_only)]), patch_only).ok:
+            batch.ok = False
+            batch.rejected.add((key, entry["name"]))
+
     def create_port_group(self, pg_id, profile=None):
         pg = PortGroup(pg_id, profile)
         url = self.base_url + PortGroup.path
@@ -135,12 +451,42 @@ class OS10FERestConfClient:
 
         return Interface.handle_get_all(resp, if_type)
 
+    def _get_interfaces_config(self, stream=False):
+        """
+        Read the interface leaves listed in Interface.fields, or everything if the switch does not support the
+        fields query parameter.
+        """
+        if self._fields_supported is not False:
+            resp = self._get(self.base_url + Interface.path_all_fields, None, stream)
+            if resp.status_code not in (status_codes.codes["bad_request"], status_codes.codes["not_implemented"]):
+                self._fields_supported = True
+                return resp
+
+            LOG.info("Switch %(switch)s does not support field filtered reads (%(status)s), reading all fields",
+                     {"switch": self.mgmt_ip, "status": resp.status_code})
+            resp.close()
+            self._fields_supported = False
+            self.stats["fields_fallbacks"] += 1
+
+        return self._get(self.base_url + Interface.path_all, None, stream)
+
     def get_all_interfaces_by_type(self):
-        url = self.base_url + Interface.path_all
-        resp = self._get(url, None)
+        resp = self._get_interfaces_config()
 
         return Interface.handle_get_all_by_type(resp)
 
+    def _load_interfaces_by_type(self):
+        # decoded while it is received, the whole document is never held in memory
+        with self._get_interfaces_config(stream=True) as resp:
+            if resp.status_code != status_codes.codes["ok"]:
+                LOG.warning("Failed to read interfaces of %(switch)s: %(status)s",
+                            {"switch": self.mgmt_ip, "status": resp.status_code})
+                return None
+
+            interfaces = Interface.handle_get_all_by_type_streamed(resp, Interface.fields)
+        self._existing_interfaces = {name for interface_dict in interfaces for name in interface_dict}
+        return interfaces
+
     def get_interface(self, name):
         url = self.base_url + Interface.path_by_name.format(name=name)
         resp = self._get(url, None)
@@ -148,14 +494,34 @@ class OS10FERestConfClient:
         return Interface.handle_get(resp)
 
     def delete_interface(self, name):
+        # keep the order of the writes collected before
+        self._flush_batch()
+
         url = self.base_url + Interface.path_by_name.format(name=name)
-        resp = self._delete(url, None)
+        try:
+            resp = self._delete(url, None)
+        except Exception:
+            self.inventory.invalidate()
+            raise
+
+        if resp.ok:
+            self.inventory.remove(name)
+            if self._existing_interfaces is not None:
+                self._existing_interfaces.discard(name)
+        else:
+            self.inventory.invalidate()
 
         return resp.ok
 
+    def configure_interfaces(self, body):
+        url = self.base_url + Interface.path
+        resp = self._write_interfaces(url, body)
+
+        return resp
+
     def configure_vlan(self, vlan_interface):
         url = self.base_url + VLanInterface.path
-        resp = self._patch_and_post(url, None, vlan_interface.content())
+        resp = self._write_interfaces(url, vlan_interface.content())
 
         return resp
 
@@ -172,59 +538,62 @@ class OS10FERestConfClient:
 
     def configure_port_channel(self, port_channel):
         url = self.base_url + PortChannelInterface.path
-        resp = self._patch_and_post(url, None, port_channel.content())
-
-        if port_channel.access_vlan_id is not None:
-            resp = self._patch_and_post(url, None, VLanInterface(vlan_id=port_channel.access_vlan_id,
-                                                                 port_mode=VLanInterface.PortMode.ACCESS,
-                                                                 port="port-channel" + port_channel.channel_id).content())
-        # else:
-        #     # switch port access vlan is auto-created, if there is no access_vlan_id in port_channel, delete it.
-        #     untagged_vlan = self._get_untagged_vlan_from_port_channel(port_channel)
-        #     if untagged_vlan is not None:
-        #         # Delete this untagged vlan
-        #         self._delete_untagged_vlan_in_port_channel(untagged_vlan, port_channel)
-
-        if port_channel.trunk_allowed_vlan_ids is not None:
-            resp = self._patch_and_post(url, None, VLanInterface(vlan_id=port_channel.trunk_allowed_vlan_ids,
-                                                                 port_mode=VLanInterface.PortMode.TRUNK,
-                                                                 port="port-channel" + port_channel.channel_id).content())
-
-        return resp
+        with self.batch() as batch:
+            self._write_interfaces(url, port_channel.content())
+
+            if port_channel.access_vlan_id is not None:
+                self._write_interfaces(url, VLanInterface(vlan_id=port_channel.access_vlan_id,
+                                                          port_mode=VLanInterface.PortMode.ACCESS,
+                                                          port="port-channel" + port_channel.channel_id).content())
+            # else:
+            #     # switch port access vlan is auto-created, if there is no access_vlan_id in port_channel, delete it.
+            #     untagged_vlan = self._get_untagged_vlan_from_port_channel(port_channel)
+            #     if untagged_vlan is not None:
+            #         # Delete this untagged vlan
+            #         self._delete_untagged_vlan_in_port_channel(untagged_vlan, port_channel)
+
+            if port_channel.trunk_allowed_vlan_ids is not None:
+                self._write_interfaces(url, VLanInterface(vlan_id=port_channel.trunk_allowed_vlan_ids,
+                                                          port_mode=VLanInterface.PortMode.TRUNK,
+                                                          port="port-channel" + port_channel.channel_id).content())
+
+        return batch
 
     def configure_ethernet_interface(self, ethernet_interface):
         url = self.base_url + EthernetInterface.path
-        resp = self._patch_and_post(url, None, ethernet_interface.content())
+        with self.batch() as batch:
+            self._write_interfaces(url, ethernet_interface.content())
 
-        if ethernet_interface.access_vlan_id is not None:
-            resp = self._patch_and_post(url, None, VLanInterface(vlan_id=ethernet_interface.access_vlan_id,
-                                                                 port_mode=VLanInterface.PortMode.ACCESS,
-                                                                 port="ethernet" + ethernet_interface.eif_id).content())
+            if ethernet_interface.access_vlan_id is not None:
+                self._write_interfaces(url, VLanInterface(vlan_id=ethernet_interface.access_vlan_id,
+                                                          port_mode=VLanInterface.PortMode.ACCESS,
+                                                          port="ethernet" + ethernet_interface.eif_id).content())
 
-        if ethernet_interface.trunk_allowed_vlan_ids is not None:
-            resp = self._patch_and_post(url, None, VLanInterface(vlan_id=ethernet_interface.trunk_allowed_vlan_ids,
-                                                                 port_mode=VLanInterface.PortMode.TRUNK,
-                                                                 port="ethernet" + ethernet_interface.eif_id).content())
+            if ethernet_interface.trunk_allowed_vlan_ids is not None:
+                self._write_interfaces(url, VLanInterface(vlan_id=ethernet_interface.trunk_allowed_vlan_ids,
+                                                          port_mode=VLanInterface.PortMode.TRUNK,
+                                                          port="ethernet" + ethernet_interface.eif_id).content())
 
-        if ethernet_interface.channel_group is not None:
-            resp = self._patch_and_post(url, None, PortChannelInterface(channel_id=ethernet_interface.channel_group,
-                                                                        ethernet_if=ethernet_interface.eif_id
-                                                                        ).content())
+            if ethernet_interface.channel_group is not None:
+                self._write_interfaces(url, PortChannelInterface(channel_id=ethernet_interface.channel_group,
+                                                                 ethernet_if=ethernet_interface.eif_id
+                                                                 ).content())
 
-        return resp
+        return batch
 
     def detach_port_from_vlan(self, port_id, vlan, access_mode):
         if access_mode == "access":
             url = self.base_url + VLanInterface.path
-            resp = self._patch_and_post(url, None, VLanInterface(vlan_id="1",
-                                                                 port_mode=VLanInterface.PortMode.ACCESS,
-                                                                 port=port_id).content())
+            resp = self._write_interfaces(url, VLanInterface(vlan_id="1",
+                                                             port_mode=VLanInterface.PortMode.ACCESS,
+                                                             port=port_id).content())
         elif access_mode == "trunk":
             url = self.base_url + VLanInterface.path
-            resp = self._patch(url, None, VLanInterface(vlan_id=vlan,
-                                                        port=port_id,
-                                                        port_detach=True,
-                                                        port_mode=VLanInterface.PortMode.TRUNK).content())
+            resp = self._write_interfaces(url, VLanInterface(vlan_id=vlan,
+                                                             port=port_id,
+                                                             port_detach=True,
+                                                             port_mode=VLanInterface.PortMode.TRUNK).content(),
+                                          patch_only=True)
 
     def configure_bgp(self, bgp):
         url = self.base_url + BorderGatewayProtocol.path
@@ -0,0 +1,116 @@
+import collections
+import time
+
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+DeadLetter = collections.namedtuple("DeadLetter", ["item", "attempts", "error"])
+
+
+class _Entry:
+
+    def __init__(self, item):
+        self.item = item
+        self.attempts = 0
+        self.next_attempt = 0
+        self.error = None
+
+
+class RetryQueue:
+    """
+    Failed work items, each retried after its own exponential backoff.
+
+    An item failing max_attempts times in a row is moved to the dead letters, where it stays until it is
+    discarded, e.g. by a new event for the same port.
+
+        for key, item in queue.due():
+            try:
+                apply(item)
+            except Exception as e:
+                queue.fail(key, item, e)
+            else:
+                queue.succeed(key)
+    """
+
+    def __init__(self, backoff=2, max_backoff=300, max_attempts=8):
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+
+        # {key: _Entry}
+        self._entries = collections.OrderedDict()
+        # entries returned by due(), neither succeeded nor failed yet
+        self._in_flight = {}
+        # {key: DeadLetter}
+        self.dead_letters = collections.OrderedDict()
+        # failures, retries, dead_letters
+        self.stats = collections.Counter()
+
+    def __len__(self):
+        return len(self._entries) + len(self._in_flight)
+
+    def __contains__(self, key):
+        return key in self._entries or key in self._in_flight
+
+    def _delay(self, attempts):
+        return min(self.max_backoff, self.backoff * 2 ** (attempts - 1))
+
+    def fail(self, key, item=None, error=None):
+        """
+        Schedule another attempt of the item, or move it to the dead letters.
+        """
+        entry = self._entries.pop(key, None) or self._in_flight.pop(key, None) or _Entry(item)
+        entry.item = item
+        entry.attempts += 1
+        entry.error = error
+        self.stats["failures"] += 1
+
+        if entry.attempts >= self.max_attempts:
+            self.dead_letters[key] = DeadLetter(item, entry.attempts, error)
+            self.stats["dead_letters"] += 1
+            LOG.error("Giving up %(key)s after %(attempts)s attempts: %(error)s",
+                      {"key": key, "attempts": entry.attempts, "error": error})
+            return
+
+        delay = self._delay(entry.attempts)
+        entry.next_attempt = time.monotonic() + delay
+        self._entries[key] = entry
+        LOG.warning("Retrying %(key)s in %(delay)ss, attempt %(attempts)s failed: %(error)s",
+                    {"key": key, "delay": delay, "attempts": entry.attempts, "error": error})
+
+    def succeed(self, key):
+        self._entries.pop(key, None)
+        self._in_flight.pop(key, None)
+
+    def discard(self, key):
+        """
+        Forget the item, including its dead letter.
+        """
+        self.succeed(key)
+        self.dead_letters.pop(key, None)
+
+    def due(self):
+        """
+        Take the items whose backoff elapsed. They are kept with their attempt count until the next call, a failure
+        reported meanwhile schedules them again.
+
+        :return: list of (key, item)
+        """
+        self._in_flight.clear()
+
+        now = time.monotonic()
+        due = [key for key, entry in self._entries.items() if entry.next_attempt <= now]
+        for key in due:
+            self._in_flight[key] = self._entries.pop(key)
+        self.stats["retries"] += len(due)
+
+        return [(key, self._in_flight[key].item) for key in due]
+
+    def next_due(self):
+        """
+        :return: seconds until an item is due, None if none is waiting
+        """
+        if not self._entries:
+            return None
+        return max(min(entry.next_attempt for entry in self._entries.values()) - time.monotonic(), 0)
@@ -0,0 +1,64 @@
+import json
+import os
+
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+# device detail fields the agent reads
+DEVICE_DETAIL_FIELDS = ("port_id", "network_id", "segmentation_id", "revision_number", "host", "profile")
+
+
+class WarmStartSnapshot:
+    """
+    Device details and switch configuration fingerprints of the last agent loop iteration, saved to path so a
+    restarted agent resumes from them instead of a full resync. Without path nothing is saved.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path=None):
+        self.path = path
+
+    def load(self):
+        """
+        :return: (devices_details_list, {switch_ip: fingerprint}), None if there is no usable snapshot
+        """
+        if not self.path or not os.path.exists(self.path):
+            return None
+
+        try:
+            with open(self.path, encoding="utf8") as snapshot_file:
+                snapshot = json.load(snapshot_file)
+        except (OSError, ValueError):
+            LOG.exception("Unable to read snapshot %s, resyncing all ports", self.path)
+            return None
+
+        if snapshot.get("version") != self.VERSION:
+            LOG.warning("Ignoring snapshot %(path)s of version %(version)s",
+                        {"path": self.path, "version": snapshot.get("version")})
+            return None
+
+        fingerprints = {switch_ip: tuple(fingerprint) if fingerprint else None
+                        for switch_ip, fingerprint in snapshot["fingerprints"].items()}
+        return snapshot["devices"], fingerprints
+
+    def save(self, devices_details, fingerprints):
+        if not self.path:
+            return
+
+        snapshot = {
+            "version": self.VERSION,
+            "devices": [{key: device_detail[key] for key in DEVICE_DETAIL_FIELDS if key in device_detail}
+                        for device_detail in devices_details],
+            "fingerprints": fingerprints
+        }
+
+        tmp_path = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or os.curdir, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf8") as snapshot_file:
+                json.dump(snapshot, snapshot_file, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+        except OSError:
+            LOG.exception("Unable to save snapshot %s", self.path)
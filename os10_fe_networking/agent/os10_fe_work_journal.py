@@ -0,0 +1,158 @@
+import collections
+import json
+import os
+
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+
+def _key(key):
+    # json turns tuples into lists
+    return tuple(key)
+
+
+class WorkJournal:
+    """
+    Append-only journal of the agent work received and completed, so the unfinished work survives a restart.
+
+    Each line is a JSON record, {"add": key, "item": item} when work is received and {"done": key} when it is
+    completed. The file is rewritten with the pending work only once it holds compact_records records, most of
+    them completed. Without path, or once the file can not be written, the journal is kept in memory only.
+    """
+
+    def __init__(self, path=None, compact_records=1000):
+        self.path = path
+        self.compact_records = compact_records
+        # {key: item}
+        self.pending = collections.OrderedDict()
+        # the journal of a previous run was found
+        self.recovered = False
+        self.stats = collections.Counter()
+
+        self._records = 0
+        self._file = None
+
+        self._load()
+        if self.path:
+            self._open()
+
+    def __len__(self):
+        return len(self.pending)
+
+    def __contains__(self, key):
+        return key in self.pending
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, encoding="utf8") as journal:
+                for line in journal:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # the last record is cut if the agent died while writing it
+                        LOG.warning("Skipping unreadable record of work journal %s", self.path)
+                        continue
+
+                    self._records += 1
+                    if "add" in record:
+                        self.pending[_key(record["add"])] = record.get("item")
+                    else:
+                        self.pending.pop(_key(record["done"]), None)
+        except OSError:
+            LOG.exception("Unable to read work journal %s, resyncing all ports", self.path)
+            self.pending.clear()
+            self._records = 0
+            return
+
+        self.recovered = True
+
+        self.stats["replayed"] = len(self.pending)
+        LOG.info("Work journal %(path)s holds %(pending)s unfinished items",
+                 {"path": self.path, "pending": len(self.pending)})
+
+    def _open(self):
+        try:
+            os.makedirs(os.path.dirname(self.path) or os.curdir, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf8")
+        except OSError:
+            LOG.exception("Unable to open work journal %s, keeping the work in memory only", self.path)
+            self._degrade()
+
+    def _degrade(self):
+        """
+        Keep the work in memory only. The journal left on disk misses work, it is removed so that a restart resyncs
+        all ports instead of trusting it.
+        """
+        self.stats["errors"] += 1
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def _append(self, record):
+        if self._file is None:
+            return
+
+        try:
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+        except OSError:
+            LOG.exception("Unable to write work journal %s, keeping the work in memory only", self.path)
+            self._degrade()
+            return
+        self._records += 1
+
+        if self._records >= self.compact_records and self._records > 2 * len(self.pending):
+            self.compact()
+
+    def add(self, key, item=None):
+        self.pending[key] = item
+        self._append({"add": key, "item": item})
+        self.stats["added"] += 1
+
+    def done(self, key):
+        if key not in self.pending:
+            return
+
+        del self.pending[key]
+        self._append({"done": key})
+        self.stats["done"] += 1
+
+    def compact(self):
+        """
+        Rewrite the journal with the pending work only.
+        """
+        if self._file is None:
+            return
+
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf8") as journal:
+                for key, item in self.pending.items():
+                    journal.write(json.dumps({"add": key, "item": item}) + "\n")
+            self._file.close()
+            os.replace(tmp_path, self.path)
+            self._file = open(self.path, "a", encoding="utf8")
+        except OSError:
+            LOG.exception("Unable to compact work journal %s, keeping the work in memory only", self.path)
+            self._degrade()
+            return
+
+        self._records = len(self.pending)
+        self.stats["compactions"] += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,81 @@
+import collections
+
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+
+class _VlanGroup:
+
+    def __init__(self):
+        # {(switch_ip, switch_port): (access_mode, enable_port_channel)}
+        self.detaches = collections.OrderedDict()
+        # (switch_ip, switch_port, enable_port_channel) of the first port asking for the delete
+        self.delete = None
+
+
+class WorkPlan:
+    """
+    Port and network deletions of an agent loop iteration, grouped by VLAN of the managed switch.
+
+    The ports of a group are detached first, then the VLAN is deleted once, however many ports or links of the
+    deleted network lead to the switch. A spine is reached by the links of every leaf, so the grouping is by the
+    address of the managed switch, not the switch_ip of the link. Duplicate requests are dropped.
+    """
+
+    def __init__(self, address):
+        self.address = address
+        # {(address, vlan): _VlanGroup}
+        self.groups = collections.OrderedDict()
+        # detaches, deletes, duplicates
+        self.stats = collections.Counter()
+
+    def __len__(self):
+        return len(self.groups)
+
+    def _group(self, vlan):
+        key = (self.address, vlan)
+        if key not in self.groups:
+            self.groups[key] = _VlanGroup()
+        return self.groups[key]
+
+    def detach_port_from_vlan(self, switch_ip, switch_port, vlan, access_mode, enable_port_channel):
+        group = self._group(vlan)
+        if (switch_ip, switch_port) in group.detaches:
+            self.stats["duplicates"] += 1
+            return
+
+        group.detaches[(switch_ip, switch_port)] = (access_mode, enable_port_channel)
+        self.stats["detaches"] += 1
+
+    def delete_vlan(self, switch_ip, switch_port, vlan, enable_port_channel):
+        group = self._group(vlan)
+        if group.delete is not None:
+            self.stats["duplicates"] += 1
+            return
+
+        group.delete = (switch_ip, switch_port, enable_port_channel)
+        self.stats["deletes"] += 1
+
+    def operations(self):
+        """
+        The planned operations, group by group. The method is named alike on the plan and the fabric manager, the
+        key identifies the operation across iterations.
+
+        :return: list of (key, method, args)
+        """
+        if self.stats["duplicates"]:
+            LOG.debug("Dropped %(duplicates)s duplicate switch operations of %(groups)s VLAN groups",
+                      {"duplicates": self.stats["duplicates"], "groups": len(self.groups)})
+
+        operations = []
+        for (address, vlan), group in self.groups.items():
+            for (switch_ip, switch_port), (access_mode, enable_port_channel) in group.detaches.items():
+                operations.append((("detach_port_from_vlan", switch_ip, switch_port, vlan), "detach_port_from_vlan",
+                                   (switch_ip, switch_port, vlan, access_mode, enable_port_channel)))
+
+            if group.delete is not None:
+                switch_ip, switch_port, enable_port_channel = group.delete
+                operations.append((("delete_vlan", address, vlan), "delete_vlan",
+                                   (switch_ip, switch_port, vlan, enable_port_channel)))
+        return operations
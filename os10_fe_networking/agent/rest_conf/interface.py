@@ -2,11 +2,20 @@ from enum import Enum
 
 from requests import status_codes
 
+from os10_fe_networking.agent.rest_conf import json_stream
+
 
 class Interface:
     path = "/restconf/data/ietf-interfaces:interfaces"
     path_all = "/restconf/data/ietf-interfaces:interfaces/interface?content=config"
     path_by_name = "/restconf/data/ietf-interfaces:interfaces/interface/{name}"
+    # RFC 8040 fields of path_all, the leaves the agent writes and compares
+    fields = ("name", "type", "description", "enabled", "dell-interface:mode", "dell-interface:mtu",
+              "dell-interface:lag-mode", "dell-interface:member-ports", "dell-interface:tagged-ports",
+              "dell-interface:untagged-ports", "dell-qos:qos-cfg", "dell-vlt:vlt", "dell-xstp:xstp-cfg",
+              "dell-lacp:lacp-fallback", "dell-vrf:vrf")
+    path_all_fields = path_all + "&fields=" + ";".join(fields)
+    stream_chunk_size = 64 * 1024
 
     class Type:
         VLan = "iana-if-type:l2vlan"
@@ -74,6 +83,35 @@ class Interface:
 
         return vlan_dict, port_channel_dict, ethernet_dict
 
+    @staticmethod
+    def handle_get_all_by_type_streamed(resp, fields=None):
+        """
+        Same as handle_get_all_by_type, decoding a streamed response one interface at a time.
+
+        :param fields: keep only these fields of each interface
+        """
+        interface_dicts = {
+            Interface.Type.VLan: {},
+            Interface.Type.PortChannel: {},
+            Interface.Type.Ethernet: {}
+        }
+
+        if fields is not None:
+            fields = frozenset(fields)
+
+        if resp.status_code == status_codes.codes["ok"]:
+            for interface in json_stream.iter_array(resp.iter_content(Interface.stream_chunk_size),
+                                                    "ietf-interfaces:interface"):
+                interface_dict = interface_dicts.get(interface["type"])
+                if interface_dict is None:
+                    continue
+                if fields is not None and not fields.issuperset(interface):
+                    interface = {key: value for key, value in interface.items() if key in fields}
+                interface_dict[interface["name"]] = interface
+
+        return (interface_dicts[Interface.Type.VLan], interface_dicts[Interface.Type.PortChannel],
+                interface_dicts[Interface.Type.Ethernet])
+
     @staticmethod
     def handle_get(resp):
         if resp.status_code == status_codes.codes["ok"]:
@@ -0,0 +1,136 @@
+import codecs
+import json
+import re
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# what follows an item of an array, with the whitespace around it
+_SEPARATOR = re.compile(r"[ \t\n\r]*([,\]])[ \t\n\r]*")
+
+
+class _Reader:
+    """
+    Text buffer over chunks of a JSON document, keeping only what is not decoded yet.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def read(self):
+        """
+        Append the next chunk to the buffer.
+
+        :return: False at the end of the document
+        """
+        if self.eof:
+            return False
+
+        # drop what was decoded already
+        self.buffer = self.buffer[self.pos:]
+        self.pos = 0
+
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.eof = True
+            self.buffer += self.decoder.decode(b"", final=True)
+        elif isinstance(chunk, bytes):
+            self.buffer += self.decoder.decode(chunk)
+        else:
+            self.buffer += chunk
+
+        return True
+
+    def peek(self):
+        """
+        :return: next character that is not whitespace, None at the end of the document
+        """
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.read():
+                return None
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError("expected {char!r} at {pos} of the JSON document".format(char=char, pos=self.pos))
+        self.pos += 1
+
+    def find(self, text):
+        while True:
+            index = self.buffer.find(text, self.pos)
+            if index >= 0:
+                self.pos = index + len(text)
+                return
+            # keep the start of a text split across chunks
+            self.pos = max(self.pos, len(self.buffer) - len(text))
+            if not self.read():
+                raise ValueError("{text} not found in the JSON document".format(text=text))
+
+    def decode(self, decoder):
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self.read():
+                    raise
+                continue
+
+            # a value ending with the buffer may go on in the next chunk, e.g. a number
+            if end == len(self.buffer) and self.read():
+                continue
+
+            self.pos = end
+            return value
+
+
+def iter_array(chunks, key):
+    """
+    Yield the items of the array held by key, decoding one item at a time from the chunks of the document.
+
+    Only the current item and the undecoded part of the current chunk are kept in memory.
+
+    :param chunks: iterable of bytes or str, e.g. resp.iter_content(65536)
+    :param key: name of the member holding the array, e.g. "ietf-interfaces:interface"
+    """
+    reader = _Reader(chunks)
+    decoder = json.JSONDecoder()
+    raw_decode = decoder.raw_decode
+
+    reader.find(json.dumps(key))
+    reader.expect(":")
+    reader.expect("[")
+    if reader.peek() == "]":
+        return
+
+    while True:
+        # the items followed by their separator in the buffer are complete, they are decoded without the reader
+        buffer = reader.buffer
+        pos = reader.pos
+        while True:
+            try:
+                value, end = raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break
+            separator = _SEPARATOR.match(buffer, end)
+            if separator is None:
+                break
+
+            yield value
+            if separator.group(1) == "]":
+                return
+            pos = separator.end()
+        reader.pos = pos
+
+        # the item goes on in the next chunk
+        yield reader.decode(decoder)
+
+        if reader.peek() == "]":
+            return
+        reader.expect(",")
+        # raw_decode does not skip whitespace
+        reader.peek()
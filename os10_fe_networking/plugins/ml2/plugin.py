@@ -1,3 +1,5 @@
+import collections
+
 from neutron.api.rpc.handlers import dhcp_rpc
 from neutron.api.rpc.handlers import dvr_rpc
 from neutron.api.rpc.handlers import metadata_rpc
@@ -6,17 +8,22 @@ from neutron.api.rpc.handlers import securitygroups_rpc
 from neutron.common import utils
 from neutron.db import agents_db
 from neutron.db import models_v2
-from neutron.plugins.ml2 import db
 from neutron.plugins.ml2 import driver_context
+from neutron.plugins.ml2 import models as ml2_models
 from neutron.plugins.ml2 import rpc
 from neutron.plugins.ml2.plugin import Ml2Plugin
 from neutron_lib import constants as const
 from neutron_lib.api.definitions import portbindings
+from neutron_lib.callbacks import events
+from neutron_lib.callbacks import registry
+from neutron_lib.callbacks import resources
 from neutron_lib.db import api as db_api
+from neutron_lib.db import standard_attr
 from neutron_lib.plugins import directory
 from neutron_lib.plugins import utils as p_utils
 from oslo_log import log
-from sqlalchemy.orm import exc as sa_exc
+from oslo_serialization import jsonutils
+import sqlalchemy as sa
 
 LOG = log.getLogger(__name__)
 
@@ -34,115 +41,318 @@ class OS10Ml2Plugin(Ml2Plugin):
             resources_rpc.ResourcesPullRpcCallback()
         ]
 
+    @staticmethod
+    def _is_frontend_port(profile):
+        if not profile:
+            return False
+
+        if profile.get("local_link_information"):
+            for local_link_information in profile["local_link_information"]:
+                if not local_link_information.get("switch_info") or \
+                        "frontend" not in local_link_information["switch_info"]:
+                    return False
+            return True
+
+        return bool(profile.get("provisioning-fsf"))
+
+    @staticmethod
+    def _frontend_ports_query(session, binding_host, *entities):
+        """
+        Query the entities of ports whose active binding may be a frontend binding, bound to binding_host if set.
+
+        The profile is matched with LIKE only, the result must be checked by _is_frontend_port.
+        """
+        query = (session.query(*entities, ml2_models.PortBinding.profile).
+                 join(ml2_models.PortBinding, ml2_models.PortBinding.port_id == models_v2.Port.id).
+                 filter(ml2_models.PortBinding.status == const.ACTIVE).
+                 filter(sa.or_(ml2_models.PortBinding.profile.like("%frontend%"),
+                               ml2_models.PortBinding.profile.like("%provisioning-fsf%"))))
+
+        if binding_host:
+            query = query.filter(ml2_models.PortBinding.host == binding_host)
+
+        return query
+
+    def _get_frontend_ports(self, session, binding_host=None, port_ids=None):
+        """
+        :return: list of (port_db, port, active binding) of frontend ports
+        """
+        # eager loads stay enabled so that the port relationships, binding
+        # levels included, are fetched with one query per relationship
+        query = self._frontend_ports_query(session, binding_host, models_v2.Port, ml2_models.PortBinding)
+        if port_ids is not None:
+            query = query.filter(models_v2.Port.id.in_(port_ids))
+
+        frontend_ports = []
+        for port_db, binding, profile in query.all():
+            if not self._is_frontend_port(jsonutils.loads(profile) if profile else None):
+                continue
+
+            port = self._make_port_dict(port_db)
+            port.setdefault('revision_number', port_db.revision_number)
+            frontend_ports.append((port_db, port, binding))
+
+        return frontend_ports
+
+    @staticmethod
+    def _get_distributed_port_bindings(session, port_ids, host):
+        if not port_ids:
+            return {}
+
+        query = (session.query(ml2_models.DistributedPortBinding).
+                 filter(ml2_models.DistributedPortBinding.port_id.in_(port_ids)).
+                 filter(ml2_models.DistributedPortBinding.host == host))
+
+        return {binding.port_id: binding for binding in query.all()}
+
+    @utils.transaction_guard
+    @db_api.retry_if_session_inactive(context_var_name='plugin_context')
+    def get_frontend_port_revisions(self, plugin_context, binding_host=None):
+        with db_api.CONTEXT_READER.using(plugin_context) as session:
+            query = (self._frontend_ports_query(session, binding_host,
+                                                models_v2.Port.id,
+                                                standard_attr.StandardAttribute.revision_number).
+                     join(standard_attr.StandardAttribute,
+                          standard_attr.StandardAttribute.id == models_v2.Port.standard_attr_id))
+
+            return {port_id: revision_number
+                    for port_id, revision_number, profile in query.all()
+                    if self._is_frontend_port(jsonutils.loads(profile) if profile else None)}
+
     @utils.transaction_guard
     @db_api.retry_if_session_inactive(context_var_name='plugin_context')
     def get_frontend_bound_port_contexts(self, plugin_context, host=None,
-                                         cached_networks=None):
+                                         cached_networks=None, port_ids=None,
+                                         binding_host=None):
+        """
+        :param host: host of the agent, the distributed bindings of DVR ports are those of this host
+        :param port_ids: only these ports if set
+        :param binding_host: only ports bound to this host if set
+        """
+        if cached_networks is None:
+            cached_networks = {}
+
         port_contexts = []
         with db_api.CONTEXT_READER.using(plugin_context) as session:
-            try:
-                ports_db = (session.query(models_v2.Port).
-                            enable_eagerloads(False).
-                            all())
-            except sa_exc.NoResultFound:
-                LOG.info("No ports found")
-
-            for port_db in ports_db:
-                port = self._make_port_dict(port_db)
-
-                is_frontend_port = True
-                if port.get('binding:profile'):
-                    profile = port["binding:profile"]
-
-                    if profile.get("local_link_information"):
-                        for local_link_information in profile["local_link_information"]:
-                            if not local_link_information.get("switch_info") or \
-                                    "frontend" not in local_link_information["switch_info"]:
-                                is_frontend_port = False
-                                break
-                    elif profile.get("provisioning-fsf"):
-                        is_frontend_port = True
-                    else:
-                        is_frontend_port = False
-                else:
-                    is_frontend_port = False
+            frontend_ports = self._get_frontend_ports(session, binding_host, port_ids)
 
-                if not is_frontend_port:
-                    continue
+            # fill cached networks with all missing networks at once
+            missing_network_ids = {port['network_id'] for _, port, _ in frontend_ports} - set(cached_networks)
+            if missing_network_ids:
+                cached_networks.update(self.get_network_contexts(plugin_context, missing_network_ids))
 
-                network = (cached_networks or {}).get(port['network_id'])
+            distributed_bindings = self._get_distributed_port_bindings(
+                session,
+                [port['id'] for _, port, _ in frontend_ports
+                 if port['device_owner'] == const.DEVICE_OWNER_DVR_INTERFACE],
+                host)
 
+            for port_db, port, binding in frontend_ports:
+                network = cached_networks.get(port['network_id'])
                 if not network:
-                    network = self.get_network(plugin_context, port['network_id'])
+                    LOG.info("Network %(network_id)s of port %(port_id)s was not found, "
+                             "it might have been deleted already.",
+                             {'network_id': port['network_id'], 'port_id': port['id']})
+                    continue
 
                 if port['device_owner'] == const.DEVICE_OWNER_DVR_INTERFACE:
-                    binding = db.get_distributed_port_binding_by_host(
-                        plugin_context, port['id'], host)
+                    binding = distributed_bindings.get(port['id'])
                     if not binding:
                         LOG.error("Binding info for DVR ports %s not found",
                                   port)
                         continue
-                    levels = db.get_binding_level_objs(
-                        plugin_context, port_db.id, host)
-                    port_context = driver_context.PortContext(
-                        self, plugin_context, port, network, binding, levels)
+                    levels_host = host
                 else:
-                    # since eager loads are disabled in port_db query
-                    # related attribute port_binding could disappear in
-                    # concurrent ports deletion.
-                    # It's not an error condition.
-                    binding = p_utils.get_port_binding_by_status_and_host(
-                        port_db.port_bindings, const.ACTIVE)
-                    if not binding:
-                        LOG.info("Binding info for ports %s was not found, "
-                                 "it might have been deleted already.",
-                                 port)
-                        continue
-                    levels = db.get_binding_level_objs(
-                        plugin_context, port_db.id, binding.host)
-                    port_context = driver_context.PortContext(
-                        self, plugin_context, port, network, binding, levels)
+                    levels_host = binding.host
+
+                levels = sorted((level for level in port_db.binding_levels if level.host == levels_host),
+                                key=lambda level: level.level)
+                port_context = driver_context.PortContext(
+                    self, plugin_context, port, network, binding, levels)
 
                 port_contexts.append(self._bind_port_if_needed(port_context))
 
         return port_contexts
 
+    @staticmethod
+    def _distributed_port_status(bindings):
+        # db.generate_distributed_port_status, from bindings already loaded
+        statuses = {binding.status for binding in bindings}
+        for status in (const.PORT_STATUS_ACTIVE, const.PORT_STATUS_DOWN):
+            if status in statuses:
+                return status
+        return const.PORT_STATUS_BUILD
 
-class RpcCallbacks(rpc.RpcCallbacks):
+    @utils.transaction_guard
+    @db_api.retry_if_session_inactive(context_var_name='plugin_context')
+    def update_frontend_port_statuses(self, plugin_context, port_statuses, host=None):
+        """
+        update_port_statuses of the frontend ports, written in a single transaction with a fixed number of queries.
+        The mechanism drivers get the update_port_precommit calls in that transaction, the postcommit calls and the
+        AFTER_UPDATE events are sent once it is committed. BEFORE_UPDATE is not published, its subscribers validate
+        user changes of a port and would query the database again for every port.
 
-    def get_frontend_devices_details_list(self, rpc_context, **kwargs):
-        agent_id = kwargs.get("agent_id")
-        host = kwargs.get("host")
+        :param port_statuses: tuple of (port context, new status), the port contexts of
+            get_frontend_bound_port_contexts. Not a list, the retry decorator deep copies lists.
+        :param host: host of the agent, the distributed bindings of DVR ports are those of this host
+        :return: ids of the updated ports
+        """
+        statuses = {port_context.current['id']: status for port_context, status in port_statuses}
+        networks = {port_context.current['id']: port_context.network for port_context, _ in port_statuses}
 
-        # cached networks used for reducing number of network db calls
-        # for server internal usage only
-        cached_networks = kwargs.get('cached_networks')
-        LOG.info("Frontend devices details list requested by agent "
-                 "%(agent_id)s with host %(host)s",
-                 {'agent_id': agent_id, 'host': host})
+        mech_contexts = []
+        with db_api.CONTEXT_WRITER.using(plugin_context) as session:
+            port_dbs = session.query(models_v2.Port).filter(models_v2.Port.id.in_(list(statuses))).all()
+
+            distributed_bindings = collections.defaultdict(list)
+            dvr_port_ids = [port_db.id for port_db in port_dbs
+                            if port_db.device_owner == const.DEVICE_OWNER_DVR_INTERFACE]
+            if dvr_port_ids:
+                for binding in (session.query(ml2_models.DistributedPortBinding).
+                                filter(ml2_models.DistributedPortBinding.port_id.in_(dvr_port_ids))):
+                    distributed_bindings[binding.port_id].append(binding)
 
+            updates = []
+            # the ports are read before anything is flushed, the single flush below batches the writes
+            with session.no_autoflush:
+                for port_db in port_dbs:
+                    status = statuses[port_db.id]
+                    if port_db.device_owner == const.DEVICE_OWNER_DVR_INTERFACE:
+                        binding = next((binding for binding in distributed_bindings[port_db.id]
+                                         if binding.host == host), None)
+                        if not binding or binding.status == status:
+                            continue
+                        original_port = self._make_port_dict(port_db)
+                        binding.status = status
+                        port_db.status = self._distributed_port_status(distributed_bindings[port_db.id])
+                    else:
+                        binding = p_utils.get_port_binding_by_status_and_host(port_db.port_bindings, const.ACTIVE)
+                        if not binding or port_db.status == status:
+                            continue
+                        original_port = self._make_port_dict(port_db)
+                        port_db.status = status
+
+                    levels = sorted((level for level in port_db.binding_levels if level.host == binding.host),
+                                    key=lambda level: level.level)
+                    updates.append((port_db, original_port, binding, levels))
+
+            # one flush for every port, before the updated ports are made for the mechanism drivers
+            session.flush()
+
+            for port_db, original_port, binding, levels in updates:
+                mech_context = driver_context.PortContext(self, plugin_context, self._make_port_dict(port_db),
+                                                          networks[port_db.id], binding, levels,
+                                                          original_port=original_port)
+                self.mechanism_manager.update_port_precommit(mech_context)
+                mech_contexts.append(mech_context)
+
+                if isinstance(binding, ml2_models.DistributedPortBinding) and \
+                        not binding.router_id and binding.status == const.PORT_STATUS_DOWN:
+                    # db.delete_distributed_port_binding_if_stale
+                    session.delete(binding)
+                    for level in levels:
+                        session.delete(level)
+
+        for mech_context in mech_contexts:
+            self.mechanism_manager.update_port_postcommit(mech_context)
+            registry.publish(resources.PORT, events.AFTER_UPDATE, self,
+                             payload=events.DBEventPayload(
+                                 plugin_context,
+                                 resource_id=mech_context.current['id'],
+                                 states=(mech_context.original, mech_context.current)))
+
+        return [mech_context.current['id'] for mech_context in mech_contexts]
+
+
+class RpcCallbacks(rpc.RpcCallbacks):
+
+    def _get_frontend_devices_details(self, rpc_context, agent_id, host, port_contexts):
         plugin = directory.get_plugin()
-        port_contexts = plugin.get_frontend_bound_port_contexts(rpc_context,
-                                                                host,
-                                                                cached_networks)
 
         results = []
+        new_statuses = []
         for port_context in port_contexts:
             port = port_context.current
             result = self._get_device_details(rpc_context, agent_id=agent_id,
                                               host=host, device=port["mac_address"],
                                               port_context=port_context)
             result["host"] = port_context.current[portbindings.HOST_ID]
+            result["revision_number"] = port.get("revision_number")
 
             if 'network_id' in result:
                 # success so we update status
                 new_status = self._get_new_status(host, port_context)
                 if new_status:
-                    plugin.update_port_status(rpc_context,
-                                              port["id"],
-                                              new_status,
-                                              host,
-                                              port_context.network.current)
+                    new_statuses.append((port_context, new_status))
             results.append(result)
 
+        if new_statuses:
+            plugin.update_frontend_port_statuses(rpc_context, tuple(new_statuses), host)
+
         return results
+
+    def get_frontend_devices_details_list(self, rpc_context, **kwargs):
+        agent_id = kwargs.get("agent_id")
+        host = kwargs.get("host")
+        # only ports bound to binding_host are returned if set
+        binding_host = kwargs.get("binding_host")
+
+        # cached networks used for reducing number of network db calls
+        # for server internal usage only
+        cached_networks = kwargs.get('cached_networks', {})
+        LOG.info("Frontend devices details list requested by agent "
+                 "%(agent_id)s with host %(host)s",
+                 {'agent_id': agent_id, 'host': host})
+
+        plugin = directory.get_plugin()
+        port_contexts = plugin.get_frontend_bound_port_contexts(rpc_context,
+                                                                host,
+                                                                cached_networks,
+                                                                binding_host=binding_host)
+
+        return self._get_frontend_devices_details(rpc_context, agent_id, host, port_contexts)
+
+    def get_frontend_devices_details_list_delta(self, rpc_context, **kwargs):
+        """
+        Frontend devices details changed since the revisions known by the agent.
+
+        :return:
+            {
+                "devices": [...],           # ports whose revision differs from port_revisions
+                "removed_ports": [...]      # known ports which are no longer frontend ports
+            }
+        """
+        agent_id = kwargs.get("agent_id")
+        host = kwargs.get("host")
+        binding_host = kwargs.get("binding_host")
+        port_revisions = kwargs.get("port_revisions") or {}
+        cached_networks = kwargs.get('cached_networks', {})
+        LOG.info("Frontend devices details delta requested by agent "
+                 "%(agent_id)s with host %(host)s for %(count)s known ports",
+                 {'agent_id': agent_id, 'host': host, 'count': len(port_revisions)})
+
+        plugin = directory.get_plugin()
+        current_revisions = plugin.get_frontend_port_revisions(rpc_context, binding_host=binding_host)
+
+        changed_port_ids = [port_id for port_id, revision_number in current_revisions.items()
+                            if port_revisions.get(port_id) != revision_number]
+        removed_ports = [port_id for port_id in port_revisions if port_id not in current_revisions]
+
+        devices = []
+        if changed_port_ids:
+            port_contexts = plugin.get_frontend_bound_port_contexts(rpc_context,
+                                                                    host,
+                                                                    cached_networks,
+                                                                    changed_port_ids,
+                                                                    binding_host=binding_host)
+            devices = self._get_frontend_devices_details(rpc_context, agent_id, host, port_contexts)
+
+        # changed ports which are not bound (anymore) are dropped by the agent as well
+        bound_port_ids = {device["port_id"] for device in devices if "port_id" in device}
+        removed_ports.extend(port_id for port_id in changed_port_ids
+                             if port_id not in bound_port_ids and port_id in port_revisions)
+
+        return {
+            "devices": [device for device in devices if "port_id" in device],
+            "removed_ports": removed_ports
+        }
@@ -0,0 +1,125 @@
+"""
+Compare reading a large interface listing with resp.json() and with the streamed parser.
+
+    python -m test.benchmark.bench_interface_parse --ethernet 512 --vlans 2000
+
+Each parser runs in a forked process, so the peak RSS of one does not hide the other.
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import resource
+import time
+import tracemalloc
+
+import requests
+
+from os10_fe_networking.agent.rest_conf.interface import Interface
+
+
+def synthetic_inventory(ethernet=512, vlans=2000, port_channels=4):
+    """
+    Listing of a switch with 4x breakout ethernet interfaces, in the shape of Interface.path_all.
+    """
+    interfaces = []
+    for index in range(ethernet):
+        interfaces.append({
+            "name": "ethernet1/1/%s:%s" % (index // 4 + 1, index % 4 + 1),
+            "type": Interface.Type.Ethernet,
+            "description": "port %s" % index,
+            "dell-interface:mtu": 9216,
+            "dell-interface:mode": "MODE_L2",
+            "dell-lldp-med:lldp-med-cfg": {"network-policy": [{"id": 1}, {"id": 2}]},
+            "dell-qos:qos-cfg": {"flow-control-rx": False, "flow-control-tx": False, "trust-map": "default"},
+            "dell-lldp:lldp": {"enable": True, "tlv-select": ["port-description", "system-name", "system-capabilities",
+                                                             "management-address"]},
+            "dell-xstp:xstp-cfg": {"edge-port": True, "bpdu-guard": True, "cost": 2000}
+        })
+
+    for index in range(port_channels):
+        interfaces.append({
+            "name": "port-channel%s" % (index + 125),
+            "type": Interface.Type.PortChannel,
+            "dell-interface:lag-mode": "DYNAMIC",
+            "dell-interface:member-ports": [{"name": "ethernet1/1/%s:1" % (index + 1), "lacp-mode": "ACTIVE"}],
+            "dell-vlt:vlt": {"vlt-id": index + 125}
+        })
+
+    for index in range(vlans):
+        interfaces.append({
+            "name": "vlan%s" % (index + 2),
+            "type": Interface.Type.VLan,
+            "description": "Cluster%s" % (index % 50),
+            "dell-interface:tagged-ports": ["port-channel1", "port-channel125"],
+            "dell-interface:untagged-ports": ["ethernet1/1/%s:%s" % (index % 128 + 1, index % 4 + 1)]
+        })
+
+    return json.dumps({"ietf-interfaces:interface": interfaces}).encode()
+
+
+def _response(payload):
+    resp = requests.Response()
+    resp.status_code = 200
+    resp.raw = io.BytesIO(payload)
+    return resp
+
+
+def _rss_kb():
+    with open("/proc/self/status", encoding="utf8") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def _run(parser, payload, results):
+    resp = _response(payload)
+    rss = _rss_kb()
+    tracemalloc.start()
+    start = time.perf_counter()
+    vlan_dict, port_channel_dict, ethernet_dict = parser(resp)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    results.put({
+        "seconds": elapsed,
+        "traced_peak_kb": peak // 1024,
+        "rss_peak_delta_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss,
+        "interfaces": len(vlan_dict) + len(port_channel_dict) + len(ethernet_dict)
+    })
+
+
+PARSERS = {
+    "json": Interface.handle_get_all_by_type,
+    "streamed": lambda resp: Interface.handle_get_all_by_type_streamed(resp, Interface.fields)
+}
+
+
+def measure(name, payload):
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    process = context.Process(target=_run, args=(PARSERS[name], payload, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ethernet", type=int, default=512)
+    parser.add_argument("--vlans", type=int, default=2000)
+    args = parser.parse_args()
+
+    payload = synthetic_inventory(args.ethernet, args.vlans)
+    print("payload: %s KiB" % (len(payload) // 1024))
+    for name in PARSERS:
+        result = measure(name, payload)
+        print("{name:>8}: {seconds:.3f}s, traced peak {traced_peak_kb} KiB, RSS peak +{rss_peak_delta_kb} KiB, "
+              "{interfaces} interfaces".format(name=name, **result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+Benchmarks of the agent hot paths.
+
+    python -m test.benchmark.run                       # compare against test/benchmark/baseline.json
+    python -m test.benchmark.run --save-baseline       # record a new baseline
+    python -m test.benchmark.run --filter loop         # only the benchmarks whose name holds "loop"
+
+Each benchmark reports operations per second, switch round trips and the traced peak memory. Round trips are
+deterministic and must not grow; ops/sec and memory are compared with a tolerance, since they depend on the machine.
+The exit status is 1 if a benchmark regressed.
+"""
+import argparse
+import collections
+import json
+import os
+import sys
+import time
+import tracemalloc
+from unittest import mock
+
+from os10_fe_networking.agent.os10_fe_port_channel_allocator import PortChannelAllocator
+from os10_fe_networking.agent.rest_conf.interface import Interface, VLanInterface, PortChannelInterface, \
+    EthernetInterface
+from test.benchmark.bench_interface_parse import synthetic_inventory, _response
+from test.emulator.os10_restconf import OS10RestConfEmulator
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+LEAF_CONFIG = os.path.join(os.path.dirname(__file__), os.pardir, "unittest", "agent", "leaf1.ini")
+
+# name: (setup, repeat, note), setup returns (run, operations), run returns the switch round trips
+BENCHMARKS = collections.OrderedDict()
+
+
+def benchmark(name, repeat=5, note=None):
+    """
+    :param note: trade-off of the benchmarked path, saved along with its baseline
+    """
+    def register(setup):
+        BENCHMARKS[name] = (setup, repeat, note)
+        return setup
+    return register
+
+
+def _inventory_size(interfaces):
+    # a quarter ethernet, the rest vlans
+    return synthetic_inventory(ethernet=interfaces // 4, vlans=interfaces - interfaces // 4 - 4)
+
+
+def _parse(parser, interfaces):
+    payload = _inventory_size(interfaces)
+
+    def setup():
+        resp = _response(payload)
+        return lambda: parser(resp) and 0, interfaces
+    return setup
+
+
+STREAMED_NOTE = ("Decoded while the response is received: holds one chunk and the interfaces instead of the whole "
+                 "body and its text, at about 1.6 times the time of handle_get_all_by_type. The interfaces returned "
+                 "are most of the peak of both.")
+
+for _size in (100, 1000, 10000):
+    benchmark("handle_get_all_by_type_%s" % _size)(_parse(Interface.handle_get_all_by_type, _size))
+    benchmark("handle_get_all_by_type_streamed_%s" % _size, note=STREAMED_NOTE)(_parse(
+        lambda resp: Interface.handle_get_all_by_type_streamed(resp, Interface.fields), _size))
+
+
+@benchmark("content_models")
+def content_models():
+    models = []
+    for index in range(1000):
+        models.append(VLanInterface(vlan_id=str(2000 + index), desc="Cluster1", enabled=True))
+        models.append(VLanInterface(vlan_id=str(2000 + index), port="port-channel1",
+                                    port_mode=VLanInterface.PortMode.TRUNK))
+        models.append(PortChannelInterface(channel_id="125", enabled=True, mtu=9216, vlt_port_channel_id=125,
+                                           access_vlan_id=str(2000 + index)))
+        models.append(EthernetInterface(eif_id="1/1/%s:1" % (index % 64 + 1), mtu=9216, mode="access",
+                                        flow_control_receive=False, flow_control_transmit=False,
+                                        channel_group="125"))
+
+    def run():
+        for model in models:
+            model.content()
+        return 0
+    return run, len(models)
+
+
+@benchmark("port_channel_allocation")
+def port_channel_allocation():
+    allocator = PortChannelAllocator(1, 1024)
+    servers = [("server-%s" % index, ["ethernet1/1/%s:%s" % (index // 4 + 1, index % 4 + 1)])
+               for index in range(1024)]
+
+    def run():
+        for key, members in servers:
+            allocator.allocate(key, members)
+        for key, _ in servers:
+            allocator.release(key)
+        return 0
+    return run, 2 * len(servers)
+
+
+@benchmark("port_channel_allocation_nearly_full")
+def port_channel_allocation_nearly_full():
+    # the lowest free id is the last one of a large range, find_hole scanned every used id to find it
+    allocator = PortChannelAllocator(1, 4096)
+    allocator.seed({"port-channel%s" % channel_id: {} for channel_id in range(1, 4096)})
+
+    def run():
+        for index in range(1000):
+            allocator.allocate("server", ["ethernet1/1/1:1"])
+            allocator.release("server")
+        return 0
+    return run, 2000
+
+
+def _agent():
+    from neutron.conf import common as common_config
+    from oslo_config import cfg
+
+    from os10_fe_networking.agent import os10_fe_neutron_agent
+
+    if "host" not in cfg.CONF:
+        cfg.CONF.register_opts(common_config.core_opts)
+    cfg.CONF(["--config-file", LEAF_CONFIG])
+
+    with mock.patch.object(os10_fe_neutron_agent.ironic_client, "get_client"):
+        agent = os10_fe_neutron_agent.OS10FENeutronAgent()
+    agent.plugin_rpc = mock.Mock()
+    return agent
+
+
+def _device_details(ports, switch_ip="100.127.0.125"):
+    devices_details = []
+    for index in range(ports):
+        switch_info = {"switch_ip": switch_ip, "cluster": "Cluster1", "preemption": "True", "access_mode": "access"}
+        devices_details.append({
+            "port_id": "port-%s" % index,
+            "network_id": "net-%s" % (index % 100),
+            "segmentation_id": 2000 + index % 100,
+            "revision_number": 1,
+            "profile": {
+                "local_link_information": [
+                    {
+                        "port_id": "ethernet1/1/%s:%s" % (index // 4 + 1, index % 4 + 1),
+                        "switch_info": json.dumps(switch_info).replace("\"", "'")
+                    }
+                ]
+            }
+        })
+    return devices_details
+
+
+def _refresh(ports):
+    def setup():
+        agent = _agent()
+        agent.plugin_rpc.get_frontend_devices_details_list.return_value = _device_details(ports)
+        return lambda: agent.refresh_devices_details_list() and 0, ports
+    return setup
+
+
+def _loop(ports):
+    def setup():
+        agent = _agent()
+        agent.plugin_rpc.get_frontend_devices_details_list.return_value = _device_details(ports)
+
+        interfaces = [{"name": "port-channel1", "type": Interface.Type.PortChannel}]
+        interfaces.extend({"name": "ethernet1/1/%s" % index, "type": Interface.Type.Ethernet}
+                          for index in range(61, 65))
+        interfaces.extend({"name": "ethernet1/1/%s:%s" % (index // 4 + 1, index % 4 + 1),
+                           "type": Interface.Type.Ethernet} for index in range(ports))
+        emulator = OS10RestConfEmulator(agent.fabric_manager.address, interfaces)
+        emulator.mount(agent.fabric_manager.client.session)
+
+        def run():
+            agent.run_iteration()
+            return sum(emulator.requests.values())
+        return run, ports
+    return setup
+
+
+for _ports in (1000, 5000):
+    benchmark("refresh_devices_details_list_%s" % _ports)(_refresh(_ports))
+    benchmark("daemon_loop_iteration_%s" % _ports, repeat=1)(_loop(_ports))
+
+
+def measure(setup, repeat, note=None):
+    seconds = []
+    round_trips = 0
+    for _ in range(repeat):
+        run, operations = setup()
+        start = time.perf_counter()
+        round_trips = run()
+        seconds.append(time.perf_counter() - start)
+
+    run, _ = setup()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        "ops_per_sec": round(operations / min(seconds), 1),
+        "round_trips": round_trips,
+        "peak_kb": peak // 1024
+    }
+    if note:
+        result["note"] = note
+    return result
+
+
+def compare(results, baseline, tolerance):
+    """
+    :return: list of regression messages
+    """
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        if result["round_trips"] > expected["round_trips"]:
+            regressions.append("{name}: {actual} round trips, baseline {expected}".format(
+                name=name, actual=result["round_trips"], expected=expected["round_trips"]))
+        if result["ops_per_sec"] < expected["ops_per_sec"] * (1 - tolerance):
+            regressions.append("{name}: {actual} ops/sec, baseline {expected}".format(
+                name=name, actual=result["ops_per_sec"], expected=expected["ops_per_sec"]))
+        if result["peak_kb"] > expected["peak_kb"] * (1 + tolerance):
+            regressions.append("{name}: {actual} KiB peak, baseline {expected}".format(
+                name=name, actual=result["peak_kb"], expected=expected["peak_kb"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", default="", help="run the benchmarks whose name holds this text")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write the results to the baseline")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="accepted ops/sec and memory deviation from the baseline")
+    args = parser.parse_args()
+
+    results = collections.OrderedDict()
+    for name, (setup, repeat, note) in BENCHMARKS.items():
+        if args.filter not in name:
+            continue
+        results[name] = measure(setup, repeat, note)
+        print("{name:<42} {ops_per_sec:>12.1f} ops/s {round_trips:>6} round trips {peak_kb:>8} KiB".format(
+            name=name, **results[name]))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf8") as output:
+            json.dump(results, output, indent=2)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf8") as baseline_file:
+                baseline = json.load(baseline_file)
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf8") as baseline_file:
+            json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write("\n")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        return 0
+
+    with open(args.baseline, encoding="utf8") as baseline_file:
+        regressions = compare(results, json.load(baseline_file), args.tolerance)
+    for regression in regressions:
+        print("REGRESSION " + regression)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,372 @@
+"""
+In-process emulator of the OS10 RESTCONF endpoints used by OS10FERestConfClient.
+
+The emulator is a requests transport adapter mounted on a session, no socket is opened:
+
+    emulator = OS10RestConfEmulator("100.127.0.125")
+    emulator.mount(client.session)
+
+It keeps the switch configuration in memory and answers like OS10 does for the requests the agent sends, including
+the 404 "require-instance test failed" of a PATCH of a missing object and the 409 of a POST of an existing one.
+"""
+import collections
+import copy
+import http.client
+import io
+import json
+import time
+import urllib.parse
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from os10_fe_networking.agent.rest_conf.border_gateway_protocol import BorderGatewayProtocol
+from os10_fe_networking.agent.rest_conf.common import Copy
+from os10_fe_networking.agent.rest_conf.interface import Interface
+from os10_fe_networking.agent.rest_conf.port_group import PortGroup
+from os10_fe_networking.agent.rest_conf.virtual_route_forwarding import IPVirtualRouteForwarding
+
+INTERFACES = "/restconf/data/ietf-interfaces:interfaces"
+INTERFACE_LIST = INTERFACES + "/interface"
+INTERFACE_BACKPTR = "/restconf/data/dell-cms-internal:cms-interface-backptr/interface-in-candidate="
+
+UNTAGGED_PORTS = "dell-interface:untagged-ports"
+TAGGED_PORTS = "dell-interface:tagged-ports"
+MEMBER_PORTS = "dell-interface:member-ports"
+
+# path: (top level key, list name, list key)
+CONTAINERS = {
+    PortGroup.path: ("dell-port-group:port-groups", "hybrid-group", "id"),
+    IPVirtualRouteForwarding.path["vrf-config"]: ("dell-vrf:vrf-config", "vrf", "vrf-name"),
+    IPVirtualRouteForwarding.path["routing"]: ("dell-routing:routing", "instance", "vrf-name"),
+    IPVirtualRouteForwarding.path["dhcp-relay-vrf-configs"]: ("dell-dhcp:dhcp-relay-vrf-configs", "instance",
+                                                              "vrf-name"),
+    BorderGatewayProtocol.path: ("dell-bgp:bgp-router", "vrf", "vrf-name"),
+}
+
+
+def _error(tag, message):
+    return {
+        "ietf-restconf:errors": {
+            "error": [
+                {
+                    "error-type": "application",
+                    "error-tag": tag,
+                    "error-message": message
+                }
+            ]
+        }
+    }
+
+
+class RestConfError(Exception):
+
+    def __init__(self, status, tag, message):
+        super(RestConfError, self).__init__(message)
+        self.status = status
+        self.body = _error(tag, message)
+
+    @staticmethod
+    def require_instance():
+        return RestConfError(404, "data-missing", "require-instance test failed")
+
+    @staticmethod
+    def not_found(path):
+        return RestConfError(404, "invalid-value", "uri keypath not found: " + path)
+
+    @staticmethod
+    def exists(name):
+        return RestConfError(409, "data-exists", "object {name} already exists".format(name=name))
+
+
+class OS10RestConfEmulator(BaseAdapter):
+    """
+    :param interfaces: interface entries the switch starts with, e.g. the "ietf-interfaces:interface" list of a
+        recorded listing. vlan1 always exists.
+    :param latency: seconds added to every request
+    :param support_fields: answer 400 to the RFC 8040 fields query parameter when False
+    """
+
+    def __init__(self, address, interfaces=None, latency=0, support_fields=True):
+        super(OS10RestConfEmulator, self).__init__()
+        self.address = address
+        self.latency = latency
+        self.support_fields = support_fields
+
+        self.interfaces = collections.OrderedDict()
+        self.interfaces["vlan1"] = {"name": "vlan1", "type": Interface.Type.VLan}
+        for entry in interfaces or []:
+            self.interfaces[entry["name"]] = copy.deepcopy(entry)
+        # {path: {list key: entry}}
+        self.containers = {path: collections.OrderedDict() for path in CONTAINERS}
+        self.saves = 0
+
+        self.requests = collections.Counter()
+        self.request_log = []
+        self._faults = []
+
+    def mount(self, session):
+        session.mount("https://{address}/".format(address=self.address), self)
+        return self
+
+    def inject(self, status=500, exc=None, method=None, path=None, count=1):
+        """
+        Fail the next count requests matching method and path, with status or by raising exc.
+
+        :param path: part of the request path, any path if None
+        """
+        self._faults.append({"status": status, "exc": exc, "method": method, "path": path, "count": count})
+
+    def close(self):
+        pass
+
+    def _take_fault(self, method, path):
+        for fault in self._faults:
+            if (fault["method"] is None or fault["method"] == method) and \
+                    (fault["path"] is None or fault["path"] in path):
+                fault["count"] -= 1
+                if fault["count"] <= 0:
+                    self._faults.remove(fault)
+                return fault
+        return None
+
+    @staticmethod
+    def _response(request, status, body=None):
+        resp = requests.Response()
+        resp.status_code = status
+        resp.reason = http.client.responses.get(status, "")
+        content = json.dumps(body).encode() if body is not None else b""
+        resp.headers = CaseInsensitiveDict({"Content-Type": "application/yang-data+json",
+                                            "Content-Length": str(len(content))})
+        resp.raw = io.BytesIO(content)
+        resp.encoding = "utf-8"
+        resp.url = request.url
+        resp.request = request
+        return resp
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        url = urllib.parse.urlsplit(request.url)
+        path = urllib.parse.unquote(url.path)
+        query = urllib.parse.parse_qs(url.query)
+        method = request.method
+
+        self.requests[method] += 1
+        self.request_log.append((method, path))
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        fault = self._take_fault(method, path)
+        if fault is not None:
+            if fault["exc"] is not None:
+                raise fault["exc"]("injected fault", request=request)
+            return self._response(request, fault["status"], _error("operation-failed", "injected fault"))
+
+        body = json.loads(request.body) if request.body else None
+        try:
+            status, resp_body = self._handle(method, path, query, body)
+        except RestConfError as e:
+            status, resp_body = e.status, e.body
+
+        return self._response(request, status, resp_body)
+
+    def _handle(self, method, path, query, body):
+        if path == INTERFACES and method in ("POST", "PATCH"):
+            self._write_interfaces(body["ietf-interfaces:interfaces"], create=method == "POST")
+            return 201 if method == "POST" else 204, None
+
+        if path == INTERFACE_LIST and method == "GET":
+            return 200, {"ietf-interfaces:interface": self._list_interfaces(query)}
+
+        if path.startswith(INTERFACE_LIST + "/") and method in ("GET", "DELETE"):
+            return self._interface_by_name(method, path[len(INTERFACE_LIST) + 1:])
+
+        if path.startswith(INTERFACE_LIST + "=") and method in ("GET", "DELETE"):
+            return self._interface_by_key(method, path, path[len(INTERFACE_LIST) + 1:])
+
+        if path.startswith(INTERFACE_BACKPTR) and method == "GET":
+            return self._untagged_vlan(path, path[len(INTERFACE_BACKPTR):])
+
+        if path == Copy.path and method == "POST":
+            self.saves += 1
+            return 204, None
+
+        for container_path in CONTAINERS:
+            if path == container_path or path.startswith(container_path + "/"):
+                return self._container(method, container_path, path[len(container_path) + 1:], body)
+
+        raise RestConfError.not_found(path)
+
+    def _list_interfaces(self, query):
+        fields = None
+        if "fields" in query:
+            if not self.support_fields:
+                raise RestConfError(400, "invalid-value", "invalid query parameter fields")
+            fields = set(query["fields"][0].split(";"))
+
+        interfaces = []
+        for entry in self.interfaces.values():
+            # content=config omits defaults
+            entry = {key: value for key, value in entry.items()
+                     if not (key == "enabled" and value is True) and (fields is None or key in fields)}
+            interfaces.append(copy.deepcopy(entry))
+        return interfaces
+
+    def _interface_by_name(self, method, name):
+        if name not in self.interfaces:
+            raise RestConfError.not_found(INTERFACE_LIST + "/" + name)
+
+        if method == "GET":
+            return 200, {"ietf-interfaces:interface": [copy.deepcopy(self.interfaces[name])]}
+
+        self._remove_interface(name)
+        return 204, None
+
+    def _interface_by_key(self, method, path, keys):
+        # interface={name} or interface={name}/{list}={item}
+        name, _, member = keys.partition("/")
+        if name not in self.interfaces:
+            raise RestConfError.not_found(path)
+
+        if not member:
+            return self._interface_by_name(method, name)
+
+        field, _, item = member.partition("=")
+        values = self.interfaces[name].get(field, [])
+        remaining = [value for value in values if (value.get("name") if isinstance(value, dict) else value) != item]
+        if method == "GET" or len(remaining) == len(values):
+            if len(remaining) == len(values):
+                raise RestConfError.not_found(path)
+            return 200, {field: [item]}
+
+        self.interfaces[name][field] = remaining
+        return 204, None
+
+    def _untagged_vlan(self, path, port):
+        for name, entry in self.interfaces.items():
+            if port in entry.get(UNTAGGED_PORTS, []):
+                return 200, {"dell-cms-internal:interface-in-candidate": [{"untagged-vlan": name}]}
+        raise RestConfError.not_found(path)
+
+    @staticmethod
+    def _expand_vlans(vlan_range):
+        names = []
+        for part in str(vlan_range).split(","):
+            begin, _, end = part.partition("-")
+            names.extend("vlan%s" % vlan_id for vlan_id in range(int(begin), int(end or begin) + 1))
+        return names
+
+    @staticmethod
+    def _ports(entry):
+        ports = list(entry.get(UNTAGGED_PORTS, [])) + list(entry.get(TAGGED_PORTS, []))
+        ports.extend(member["name"] for member in entry.get(MEMBER_PORTS, []))
+        return ports
+
+    def _write_interfaces(self, interfaces, create):
+        """
+        Validate the whole request before applying it, a rejected request changes nothing.
+        """
+        entries = interfaces.get("interface", [])
+        ranges = interfaces.get("dell-interface-range:interface-range", [])
+
+        known = set(self.interfaces)
+        for entry in entries:
+            if entry["name"] in self.interfaces:
+                if create:
+                    raise RestConfError.exists(entry["name"])
+            elif not create:
+                raise RestConfError.require_instance()
+            known.add(entry["name"])
+
+        for entry in entries:
+            if any(port not in known for port in self._ports(entry)):
+                raise RestConfError.require_instance()
+        for interface_range in ranges:
+            template = interface_range["config-template"]
+            if any(name not in known for name in self._expand_vlans(interface_range["name"])) or \
+                    any(port not in known for port in template.get(TAGGED_PORTS, [])):
+                raise RestConfError.require_instance()
+
+        for entry in entries:
+            self._merge_interface(entry)
+        for interface_range in ranges:
+            template = interface_range["config-template"]
+            for name in self._expand_vlans(interface_range["name"]):
+                tagged_ports = self.interfaces[name].setdefault(TAGGED_PORTS, [])
+                for port in template.get(TAGGED_PORTS, []):
+                    if "tagged-ports" in template.get("delete-object", []):
+                        if port in tagged_ports:
+                            tagged_ports.remove(port)
+                    elif port not in tagged_ports:
+                        tagged_ports.append(port)
+
+    def _merge_interface(self, entry):
+        name = entry["name"]
+        current = self.interfaces.setdefault(name, {"name": name, "type": entry["type"]})
+
+        for key, value in entry.items():
+            if key in (UNTAGGED_PORTS, TAGGED_PORTS):
+                ports = current.setdefault(key, [])
+                for port in value:
+                    if key == UNTAGGED_PORTS:
+                        # a port has a single access vlan
+                        for other in self.interfaces.values():
+                            if other is not current and port in other.get(UNTAGGED_PORTS, []):
+                                other[UNTAGGED_PORTS].remove(port)
+                    if port not in ports:
+                        ports.append(port)
+            elif key == MEMBER_PORTS:
+                members = current.setdefault(key, [])
+                for member in value:
+                    for other in self.interfaces.values():
+                        if other is not current and MEMBER_PORTS in other:
+                            other[MEMBER_PORTS] = [m for m in other[MEMBER_PORTS] if m["name"] != member["name"]]
+                    members[:] = [m for m in members if m["name"] != member["name"]] + [copy.deepcopy(member)]
+            elif isinstance(value, dict) and isinstance(current.get(key), dict):
+                current[key].update(copy.deepcopy(value))
+            else:
+                current[key] = copy.deepcopy(value)
+
+    def _remove_interface(self, name):
+        del self.interfaces[name]
+        for entry in self.interfaces.values():
+            for key in (UNTAGGED_PORTS, TAGGED_PORTS):
+                if name in entry.get(key, []):
+                    entry[key].remove(name)
+            if MEMBER_PORTS in entry:
+                entry[MEMBER_PORTS] = [member for member in entry[MEMBER_PORTS] if member["name"] != name]
+
+    def _container(self, method, path, sub_path, body):
+        top_key, list_name, list_key = CONTAINERS[path]
+        items = self.containers[path]
+
+        if sub_path:
+            # {list}/{name}
+            name = sub_path.partition("/")[2]
+            if name not in items:
+                raise RestConfError.not_found(path + "/" + sub_path)
+            if method == "GET":
+                return 200, {top_key: {list_name: [copy.deepcopy(items[name])]}}
+            if method == "DELETE":
+                del items[name]
+                return 204, None
+            raise RestConfError.not_found(path + "/" + sub_path)
+
+        if method == "GET":
+            return 200, {top_key: {list_name: copy.deepcopy(list(items.values()))}}
+
+        if method not in ("POST", "PATCH"):
+            raise RestConfError.not_found(path)
+
+        entries = body[top_key][list_name]
+        for entry in entries:
+            if method == "POST" and entry[list_key] in items:
+                raise RestConfError.exists(entry[list_key])
+            if method == "PATCH" and entry[list_key] not in items:
+                raise RestConfError.require_instance()
+
+        for entry in entries:
+            items.setdefault(entry[list_key], {}).update(copy.deepcopy(entry))
+
+        return 201 if method == "POST" else 204, None
@@ -0,0 +1,85 @@
+import json
+import tracemalloc
+from unittest import TestCase
+
+import requests
+import requests_mock
+
+from os10_fe_networking.agent.rest_conf import json_stream
+from os10_fe_networking.agent.rest_conf.interface import Interface
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestJsonStream(TestCase):
+
+    def test_iter_array(self):
+        document = {"other": [1, 2], "ietf-interfaces:interface": [{"name": "vlan1", "mtu": 1500},
+                                                                   {"name": "vlan2", "description": "café"},
+                                                                   17, "text"]}
+        data = json.dumps(document, indent=2).encode()
+
+        for size in (1, 2, 7, len(data)):
+            self.assertEqual(list(json_stream.iter_array(chunked(data, size), "ietf-interfaces:interface")),
+                             document["ietf-interfaces:interface"])
+
+    def test_numbers_across_chunks(self):
+        data = b'{"a": [12, 3456 ,7,\n890]}'
+
+        for size in range(1, len(data) + 1):
+            self.assertEqual(list(json_stream.iter_array(chunked(data, size), "a")), [12, 3456, 7, 890])
+
+    def test_memory_bounded(self):
+        item = json.dumps({"name": "vlan1", "description": "x" * 100}).encode()
+
+        def chunks():
+            # 10 MiB document, produced while it is read
+            yield b'{"a": ['
+            for _ in range(100000):
+                yield item + b","
+            yield item + b"]}"
+
+        tracemalloc.start()
+        try:
+            count = sum(1 for _ in json_stream.iter_array(chunks(), "a"))
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(count, 100001)
+        self.assertLess(peak, 64 * 1024)
+
+    def test_empty_and_invalid(self):
+        self.assertEqual(list(json_stream.iter_array([b'{"a": [ ]}'], "a")), [])
+
+        with self.assertRaises(ValueError):
+            list(json_stream.iter_array([b'{"a": [{"b": 1}'], "a"))
+        with self.assertRaises(ValueError):
+            list(json_stream.iter_array([b'{"b": []}'], "a"))
+
+    def test_handle_get_all_by_type_streamed(self):
+        with open("restconf/all_interfaces_leaf1.json", encoding="utf8") as data_file:
+            all_interfaces = json.load(data_file)
+
+        with requests_mock.Mocker() as m:
+            m.get("https://switch/interfaces", json=all_interfaces)
+            expected = Interface.handle_get_all_by_type(requests.get("https://switch/interfaces"))
+            streamed = Interface.handle_get_all_by_type_streamed(requests.get("https://switch/interfaces",
+                                                                              stream=True))
+
+        self.assertEqual(streamed, expected)
+
+    def test_handle_get_all_by_type_streamed_fields(self):
+        interfaces = {"ietf-interfaces:interface": [
+            {"name": "vlan2", "type": Interface.Type.VLan, "dell-lldp:lldp": {"enable": True}},
+            {"name": "ethernet1/1/1", "type": Interface.Type.Ethernet, "enabled": True}]}
+
+        with requests_mock.Mocker() as m:
+            m.get("https://switch/interfaces", json=interfaces)
+            streamed = Interface.handle_get_all_by_type_streamed(requests.get("https://switch/interfaces",
+                                                                              stream=True), Interface.fields)
+
+        self.assertEqual(streamed, ({"vlan2": {"name": "vlan2", "type": Interface.Type.VLan}}, {},
+                                    {"ethernet1/1/1": interfaces["ietf-interfaces:interface"][1]}))
@@ -0,0 +1,40 @@
+from unittest import TestCase
+
+from os10_fe_networking.agent.os10_fe_apply_engine import SwitchApplyEngine
+
+
+class TestSwitchApplyEngine(TestCase):
+
+    def setUp(self):
+        self.events = []
+
+    def operation(self, name):
+        self.events.append(("run", name))
+
+    def failing_operation(self, name):
+        self.events.append(("fail", name))
+        raise RuntimeError("switch unreachable")
+
+    def test_in_order(self):
+        engine = SwitchApplyEngine("leaf1")
+        engine.submit(self.operation, "op1")
+        engine.submit(self.operation, name="op2")
+        engine.submit(self.operation, "op3")
+        self.assertEqual(len(engine), 3)
+        self.assertIsNone(engine.drain_time)
+
+        self.assertEqual(engine.run(), 0)
+
+        self.assertEqual(self.events, [("run", "op1"), ("run", "op2"), ("run", "op3")])
+        self.assertGreaterEqual(engine.drain_time, 0)
+        self.assertEqual(len(engine), 0)
+
+    def test_failure_does_not_stop_queue(self):
+        engine = SwitchApplyEngine("leaf1")
+        engine.submit(self.failing_operation, "op1")
+        engine.submit(self.operation, "op2")
+
+        self.assertEqual(engine.run(), 1)
+
+        self.assertEqual(self.events, [("fail", "op1"), ("run", "op2")])
+        self.assertEqual(engine.stats, {"operations": 2, "failures": 1})
@@ -0,0 +1,38 @@
+from unittest import TestCase
+
+from os10_fe_networking.agent.os10_fe_circuit_breaker import CircuitBreaker, SwitchUnavailable
+
+
+class TestCircuitBreaker(TestCase):
+
+    def setUp(self):
+        self.switch_up = False
+        self.breaker = CircuitBreaker("100.127.0.125", failure_threshold=2, probe_interval=0,
+                                      probe=lambda: self.switch_up)
+        # probes are run by hand
+        self.breaker._start_prober = lambda: None
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+
+        self.breaker.record_failure()
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(SwitchUnavailable):
+            self.breaker.check()
+        self.assertEqual(self.breaker.stats["rejected"], 1)
+
+    def test_probe_closes(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+
+        self.assertFalse(self.breaker.probe_once())
+        self.assertFalse(self.breaker.allow())
+
+        self.switch_up = True
+        self.assertTrue(self.breaker.probe_once())
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.stats, {"failures": 2, "opened": 1, "probes": 2, "probe_failures": 1})
@@ -0,0 +1,98 @@
+from unittest import TestCase
+
+from os10_fe_networking.agent.os10_fe_devices_details_cache import DevicesDetailsCache, get_switch_links
+
+
+def local_link_device_detail(port_id, network_id, segmentation_id, links):
+    return {
+        "port_id": port_id,
+        "network_id": network_id,
+        "segmentation_id": segmentation_id,
+        "profile": {
+            "local_link_information": [
+                {
+                    "port_id": switch_port,
+                    "switch_info": {
+                        "switch_ip": switch_ip,
+                        "cluster": "Cluster1",
+                        "preemption": False,
+                        "access_mode": "access"
+                    }
+                } for switch_ip, switch_port in links
+            ]
+        }
+    }
+
+
+def provisioning_device_detail(port_id, network_id, segmentation_id, host):
+    return {
+        "port_id": port_id,
+        "network_id": network_id,
+        "segmentation_id": segmentation_id,
+        "host": host,
+        "profile": {
+            "provisioning-fsf": True
+        }
+    }
+
+
+class TestDevicesDetailsCache(TestCase):
+
+    def setUp(self):
+        self.leaf1_ip = "100.127.0.125"
+        self.leaf2_ip = "100.127.0.126"
+        self.devices_details_list = [
+            local_link_device_detail("port-1", "net-1", 2222,
+                                     [(self.leaf1_ip, "ethernet1/1/1:1"), (self.leaf2_ip, "ethernet1/1/1:1")]),
+            local_link_device_detail("port-2", "net-1", 2222, [(self.leaf1_ip, "ethernet1/1/2:1")]),
+            provisioning_device_detail("port-3", "net-2", 3333, "pic-1"),
+            {"device": "fa:16:3e:00:00:01"},
+        ]
+
+    def test_get_switch_links(self):
+        links = list(get_switch_links(self.devices_details_list[0]))
+        self.assertEqual(len(links), 2)
+        self.assertEqual(links[0], ("Cluster1", self.leaf1_ip, "ethernet1/1/1:1", False, "access", True))
+
+        links = list(get_switch_links(self.devices_details_list[2]))
+        self.assertEqual(links, [(None, "pic-1", None, None, None, None)])
+
+        self.assertEqual(list(get_switch_links(self.devices_details_list[3])), [])
+
+    def test_rebuild(self):
+        cache = DevicesDetailsCache(self.devices_details_list)
+
+        # unbound devices have no port_id and are not cached
+        self.assertEqual(len(cache), 3)
+        self.assertIn("port-1", cache)
+        self.assertEqual(cache.get_by_port("port-3")["host"], "pic-1")
+        self.assertIsNone(cache.get_by_port("port-4"))
+
+        self.assertEqual({d["port_id"] for d in cache.get_by_network("net-1")}, {"port-1", "port-2"})
+        self.assertEqual(cache.get_by_network("net-3"), [])
+
+        self.assertEqual({d["port_id"] for d in cache.get_by_switch_segment(self.leaf1_ip, 2222)},
+                         {"port-1", "port-2"})
+        self.assertEqual({d["port_id"] for d in cache.get_by_switch_segment(self.leaf2_ip, 2222)}, {"port-1"})
+        self.assertEqual({d["port_id"] for d in cache.get_by_switch_segment("pic-1", 3333)}, {"port-3"})
+
+        cache.rebuild(self.devices_details_list[2:])
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.get_by_network("net-1"), [])
+        self.assertEqual(cache.get_by_switch_segment(self.leaf1_ip, 2222), [])
+
+    def test_update_and_remove(self):
+        cache = DevicesDetailsCache(self.devices_details_list)
+
+        # port-2 moves to another network and segment
+        cache.update(local_link_device_detail("port-2", "net-2", 3333, [(self.leaf2_ip, "ethernet1/1/2:1")]))
+        self.assertEqual({d["port_id"] for d in cache.get_by_network("net-1")}, {"port-1"})
+        self.assertEqual({d["port_id"] for d in cache.get_by_network("net-2")}, {"port-2", "port-3"})
+        self.assertEqual({d["port_id"] for d in cache.get_by_switch_segment(self.leaf1_ip, 2222)}, {"port-1"})
+        self.assertEqual({d["port_id"] for d in cache.get_by_switch_segment(self.leaf2_ip, 3333)}, {"port-2"})
+
+        self.assertEqual(cache.remove("port-1")["port_id"], "port-1")
+        self.assertIsNone(cache.remove("port-1"))
+        self.assertEqual(cache.get_by_network("net-1"), [])
+        self.assertEqual(cache.get_by_switch_segment(self.leaf2_ip, 2222), [])
+        self.assertEqual(len(cache), 2)
@@ -4,7 +4,7 @@ from unittest import TestCase
 import requests_mock
 from oslo_config import cfg
 
-from os10_fe_networking.agent.os10_fe_fabric_manager import LeafManager, OS10FEFabricManager
+from os10_fe_networking.agent.os10_fe_fabric_manager import OS10FEFabricManager
 from os10_fe_networking.agent.rest_conf.common import Copy
 from os10_fe_networking.agent.rest_conf.interface import Interface
 
@@ -32,11 +32,6 @@ class TestOS10FEFabricManager(TestCase):
         # self.ff_manager_leaf1 = OS10FEFabricManager(CONF)
         # self.ff_manager_leaf2 = OS10FEFabricManager(CONF)
 
-    def test_find_hole(self):
-        self.assertEqual(LeafManager.find_hole({}), 1)
-        self.assertEqual(LeafManager.find_hole({1, 2, 5, 7}), 3)
-        self.assertEqual(LeafManager.find_hole({1, 2, 3, 4}), 5)
-
     def test_leaf_ensure_configuration(self):
         CONF(["--config-file", "./leaf1.ini"])
         self.ff_manager_leaf1 = OS10FEFabricManager.create(CONF)
@@ -48,6 +43,8 @@ class TestOS10FEFabricManager(TestCase):
                   json=all_interfaces_leaf1, status_code=200)
             m.patch(self.ff_manager_leaf1.client.base_url + Interface.path,
                     status_code=204)
+            m.post(self.ff_manager_leaf1.client.base_url + Interface.path,
+                   status_code=201)
             m.post(self.ff_manager_leaf1.client.base_url + Copy.path,
                    status_code=204)
 
@@ -65,6 +62,8 @@ class TestOS10FEFabricManager(TestCase):
                   json=all_interfaces_spine1, status_code=200)
             m.patch(self.ff_manager_spine1.client.base_url + Interface.path,
                     status_code=204)
+            m.post(self.ff_manager_spine1.client.base_url + Interface.path,
+                   status_code=201)
             m.post(self.ff_manager_spine1.client.base_url + Copy.path,
                    status_code=204)
 
@@ -82,7 +81,84 @@ class TestOS10FEFabricManager(TestCase):
                   json=all_interfaces_spine1, status_code=200)
             m.patch(self.ff_manager_spine1.client.base_url + Interface.path,
                     status_code=204)
+            m.post(self.ff_manager_spine1.client.base_url + Interface.path,
+                   status_code=201)
             m.post(self.ff_manager_spine1.client.base_url + Copy.path,
                    status_code=204)
 
             self.ff_manager_spine1.ensure_configuration("pic-1", None, "2222", "", None, None, None)
+
+    def test_leaf_write_memory_coalesced(self):
+        CONF(["--config-file", "./leaf1.ini"])
+        self.ff_manager_leaf1 = OS10FEFabricManager.create(CONF)
+
+        all_interfaces_leaf1 = read_file_data("all_interfaces_leaf1.json", "restconf/")
+
+        with requests_mock.Mocker() as m:
+            m.get(self.ff_manager_leaf1.client.base_url + Interface.path_all,
+                  json=all_interfaces_leaf1, status_code=200)
+            m.patch(self.ff_manager_leaf1.client.base_url + Interface.path,
+                    status_code=204)
+            m.post(self.ff_manager_leaf1.client.base_url + Interface.path,
+                   status_code=201)
+            copy_config = m.post(self.ff_manager_leaf1.client.base_url + Copy.path,
+                                 status_code=204)
+
+            self.ff_manager_leaf1.ensure_configuration("100.127.0.125", "ethernet1/1/1:1", "2222",
+                                                       "FunctionalTestCustomer1", False, "access", True)
+            self.ff_manager_leaf1.ensure_configuration("100.127.0.125", "ethernet1/1/1:2", "2222",
+                                                       "FunctionalTestCustomer1", False, "access", True)
+            self.assertEqual(copy_config.call_count, 0)
+
+            self.assertEqual(self.ff_manager_leaf1.flush(), 2)
+            self.assertEqual(copy_config.call_count, 1)
+
+    def test_leaf_interface_inventory_cached(self):
+        CONF(["--config-file", "./leaf1.ini"])
+        self.ff_manager_leaf1 = OS10FEFabricManager.create(CONF)
+
+        all_interfaces_leaf1 = read_file_data("all_interfaces_leaf1.json", "restconf/")
+
+        with requests_mock.Mocker() as m:
+            get_interfaces = m.get(self.ff_manager_leaf1.client.base_url + Interface.path_all,
+                                   json=all_interfaces_leaf1, status_code=200)
+            m.patch(self.ff_manager_leaf1.client.base_url + Interface.path,
+                    status_code=204)
+            m.post(self.ff_manager_leaf1.client.base_url + Interface.path,
+                   status_code=201)
+
+            for port in ("ethernet1/1/1:1", "ethernet1/1/1:2", "ethernet1/1/1:3"):
+                self.ff_manager_leaf1.ensure_configuration("100.127.0.125", port, "2222",
+                                                           "FunctionalTestCustomer1", False, "access", True)
+            self.assertEqual(get_interfaces.call_count, 1)
+            self.assertIn("vlan2222", self.ff_manager_leaf1._get_all_interfaces_by_type()[Interface.Type.VLan])
+
+            self.ff_manager_leaf1.invalidate_inventory()
+            self.ff_manager_leaf1.ensure_configuration("100.127.0.125", "ethernet1/1/1:1", "2222",
+                                                       "FunctionalTestCustomer1", False, "access", True)
+            self.assertEqual(get_interfaces.call_count, 2)
+
+    def test_leaf_skip_unchanged_writes(self):
+        CONF(["--config-file", "./leaf1.ini"])
+        self.ff_manager_leaf1 = OS10FEFabricManager.create(CONF)
+
+        all_interfaces_leaf1 = read_file_data("all_interfaces_leaf1.json", "restconf/")
+
+        with requests_mock.Mocker() as m:
+            m.get(self.ff_manager_leaf1.client.base_url + Interface.path_all,
+                  json=all_interfaces_leaf1, status_code=200)
+            patch = m.patch(self.ff_manager_leaf1.client.base_url + Interface.path,
+                            status_code=204)
+            m.post(self.ff_manager_leaf1.client.base_url + Interface.path,
+                   status_code=201)
+
+            self.ff_manager_leaf1.ensure_configuration("100.127.0.125", "ethernet1/1/1:1", "2222",
+                                                       "FunctionalTestCustomer1", False, "access", True)
+            writes = patch.call_count
+            self.assertEqual(self.ff_manager_leaf1.stats, {"writes_issued": 2})
+
+            # the switch already holds the configuration
+            self.ff_manager_leaf1.ensure_configuration("100.127.0.125", "ethernet1/1/1:1", "2222",
+                                                       "FunctionalTestCustomer1", False, "access", True)
+            self.assertEqual(patch.call_count, writes)
+            self.assertEqual(self.ff_manager_leaf1.stats, {"writes_issued": 2, "writes_skipped": 2})
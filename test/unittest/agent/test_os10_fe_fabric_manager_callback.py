@@ -0,0 +1,76 @@
+from unittest import TestCase
+from unittest import mock
+
+from os10_fe_networking.agent import os10_fe_fabric_manager_callback
+from os10_fe_networking.agent.os10_fe_fabric_manager_callback import WriteMemoryCallback
+
+
+class TestWriteMemoryCallback(TestCase):
+
+    def setUp(self):
+        self.client = mock.Mock(mgmt_ip="100.127.0.125")
+        self.client.write_memory.return_value = mock.Mock(ok=True)
+
+        self.now = 1000.0
+        patcher = mock.patch.object(os10_fe_fabric_manager_callback.time, "monotonic", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_flush_coalesces_operations(self):
+        callback = WriteMemoryCallback(self.client)
+
+        self.assertEqual(callback.flush(), 0)
+
+        callback.post_ensure_configuration()
+        callback.post_detach_port_from_vlan()
+        callback.post_delete_vlan()
+        self.client.write_memory.assert_not_called()
+
+        self.assertEqual(callback.flush(), 3)
+        self.assertEqual(callback.flush(), 0)
+        self.client.write_memory.assert_called_once_with()
+
+    def test_flush_after_quiet_period(self):
+        callback = WriteMemoryCallback(self.client, quiet_period=5)
+
+        callback.post_ensure_configuration()
+        self.now += 3
+        callback.post_ensure_configuration()
+        self.now += 3
+        self.assertEqual(callback.flush(), 0)
+
+        self.now += 2
+        self.assertEqual(callback.flush(), 2)
+
+    def test_flush_after_max_delay(self):
+        callback = WriteMemoryCallback(self.client, quiet_period=5, max_delay=10)
+
+        for _ in range(3):
+            callback.post_ensure_configuration()
+            self.now += 3
+        self.assertEqual(callback.flush(), 0)
+        self.client.write_memory.assert_not_called()
+
+        # the operation reaching max delay triggers the flush by itself
+        self.now += 1
+        callback.post_ensure_configuration()
+        self.client.write_memory.assert_called_once_with()
+        self.assertEqual(callback.pending_operations, 0)
+
+    def test_force_flush(self):
+        callback = WriteMemoryCallback(self.client, quiet_period=5)
+
+        callback.post_delete_vlan()
+        self.assertEqual(callback.flush(), 0)
+        self.assertEqual(callback.flush(force=True), 1)
+
+    def test_failed_flush_keeps_operations(self):
+        callback = WriteMemoryCallback(self.client)
+        self.client.write_memory.return_value = mock.Mock(ok=False, status_code=500)
+
+        callback.post_ensure_configuration()
+        self.assertEqual(callback.flush(), 0)
+        self.assertEqual(callback.pending_operations, 1)
+
+        self.client.write_memory.return_value = mock.Mock(ok=True)
+        self.assertEqual(callback.flush(), 1)
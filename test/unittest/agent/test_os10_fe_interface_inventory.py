@@ -0,0 +1,99 @@
+from unittest import TestCase
+from unittest import mock
+
+from os10_fe_networking.agent import os10_fe_interface_inventory
+from os10_fe_networking.agent.os10_fe_interface_inventory import InterfaceInventory
+from os10_fe_networking.agent.rest_conf.interface import Interface, VLanInterface, PortChannelInterface
+
+
+def switch_interfaces():
+    return (
+        {
+            "vlan1": {"name": "vlan1", "type": Interface.Type.VLan,
+                      "dell-interface:untagged-ports": ["ethernet1/1/1:1", "ethernet1/1/2:1"]},
+            "vlan2222": {"name": "vlan2222", "type": Interface.Type.VLan,
+                         "dell-interface:tagged-ports": ["port-channel1"]},
+        },
+        {
+            "port-channel1": {"name": "port-channel1", "type": Interface.Type.PortChannel,
+                              "dell-interface:member-ports": [{"name": "ethernet1/1/61"}]},
+        },
+        {
+            "ethernet1/1/1:1": {"name": "ethernet1/1/1:1", "type": Interface.Type.Ethernet},
+        }
+    )
+
+
+class TestInterfaceInventory(TestCase):
+
+    def setUp(self):
+        self.loader = mock.Mock(side_effect=switch_interfaces)
+
+        self.now = 1000.0
+        patcher = mock.patch.object(os10_fe_interface_inventory.time, "monotonic", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_ttl_and_force_refresh(self):
+        inventory = InterfaceInventory(self.loader, ttl=10)
+
+        inventory.get()
+        self.now += 5
+        inventory.get()
+        self.assertEqual(self.loader.call_count, 1)
+
+        inventory.get(force_refresh=True)
+        self.now += 10
+        inventory.get()
+        self.assertEqual(self.loader.call_count, 3)
+        self.assertEqual(inventory.stats, {"hits": 1, "misses": 3})
+
+        inventory.invalidate()
+        inventory.get()
+        self.assertEqual(self.loader.call_count, 4)
+
+    def test_failed_read_is_not_cached(self):
+        self.loader.side_effect = [None, switch_interfaces()]
+        inventory = InterfaceInventory(self.loader)
+
+        self.assertEqual(inventory.get()[Interface.Type.VLan], {})
+        self.assertFalse(inventory.loaded)
+        self.assertIn("vlan1", inventory.get()[Interface.Type.VLan])
+        self.assertEqual(self.loader.call_count, 2)
+
+    def test_write_through(self):
+        inventory = InterfaceInventory(self.loader)
+        interfaces = inventory.get()
+
+        # new vlan, access port moves out of vlan1
+        inventory.apply_content(VLanInterface(vlan_id="3333", desc="Cluster1", enabled=True).content())
+        inventory.apply_content(VLanInterface(vlan_id="3333", port="ethernet1/1/1:1",
+                                              port_mode=VLanInterface.PortMode.ACCESS).content())
+        self.assertEqual(interfaces[Interface.Type.VLan]["vlan3333"]["description"], "Cluster1")
+        self.assertEqual(interfaces[Interface.Type.VLan]["vlan3333"]["dell-interface:untagged-ports"],
+                         ["ethernet1/1/1:1"])
+        self.assertEqual(interfaces[Interface.Type.VLan]["vlan1"]["dell-interface:untagged-ports"],
+                         ["ethernet1/1/2:1"])
+
+        # trunk attach and detach through interface-range
+        inventory.apply_content(VLanInterface(vlan_id="2222,3333", port="port-channel125",
+                                              port_mode=VLanInterface.PortMode.TRUNK).content())
+        self.assertEqual(interfaces[Interface.Type.VLan]["vlan2222"]["dell-interface:tagged-ports"],
+                         ["port-channel1", "port-channel125"])
+        self.assertEqual(interfaces[Interface.Type.VLan]["vlan3333"]["dell-interface:tagged-ports"],
+                         ["port-channel125"])
+        inventory.apply_content(VLanInterface(vlan_id="2222", port="port-channel1", port_detach=True,
+                                              port_mode=VLanInterface.PortMode.TRUNK).content())
+        self.assertEqual(interfaces[Interface.Type.VLan]["vlan2222"]["dell-interface:tagged-ports"],
+                         ["port-channel125"])
+
+        # member port moves to another port channel
+        inventory.apply_content(PortChannelInterface(channel_id="125", ethernet_if="1/1/61").content())
+        self.assertEqual(interfaces[Interface.Type.PortChannel]["port-channel1"]["dell-interface:member-ports"], [])
+        self.assertEqual(inventory.find("port-channel125")["dell-interface:member-ports"][0]["name"],
+                         "ethernet1/1/61")
+
+        inventory.remove("port-channel125")
+        self.assertIsNone(inventory.find("port-channel125"))
+        self.assertEqual(interfaces[Interface.Type.VLan]["vlan2222"]["dell-interface:tagged-ports"], [])
+        self.assertEqual(self.loader.call_count, 1)
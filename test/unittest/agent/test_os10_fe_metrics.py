@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import TestCase
+
+from neutron.conf import common as common_config
+from oslo_config import cfg
+
+from os10_fe_networking.agent.os10_fe_metrics import AgentMetrics, prometheus_client
+from os10_fe_networking.agent.os10_fe_port_channel_allocator import PortChannelAllocator
+from os10_fe_networking.agent.os10_fe_request_budget import RequestBudget
+from os10_fe_networking.agent.rest_conf.interface import Interface
+from test.unittest.agent.test_os10_fe_neutron_agent import create_agent
+
+CONF = cfg.CONF
+if "host" not in CONF:
+    CONF.register_opts(common_config.core_opts)
+
+
+class TestAgentMetrics(TestCase):
+
+    def setUp(self):
+        CONF(["--config-file", "./leaf1.ini"])
+        self.agent = create_agent()
+        self.directory = tempfile.mkdtemp()
+        self.textfile = os.path.join(self.directory, "os10fe.prom")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_disabled_by_default(self):
+        metrics = AgentMetrics(self.agent)
+
+        self.assertFalse(metrics.enabled)
+        metrics.observe_loop(1)
+        metrics.observe_rpc("get_frontend_devices_details_list", 1)
+        metrics.export()
+        self.assertEqual(b"", metrics.render())
+
+    @unittest.skipUnless(prometheus_client, "prometheus_client is not installed")
+    def test_export_textfile(self):
+        self.agent.updated_ports.update(["port-1", "port-2"])
+        self.agent.deleted_networks.add("net-1")
+        metrics = AgentMetrics(self.agent, textfile=self.textfile)
+
+        metrics.observe_loop(0.3)
+        metrics.observe_rpc("get_frontend_devices_details_list", 0.02)
+        metrics.export()
+
+        with open(self.textfile, encoding="utf8") as textfile:
+            text = textfile.read()
+        self.assertIn('os10fe_queue_depth{queue="updated_ports"} 2.0', text)
+        self.assertIn('os10fe_queue_depth{queue="deleted_networks"} 1.0', text)
+        self.assertIn("os10fe_loop_duration_seconds_count 1.0", text)
+        self.assertIn('os10fe_rpc_duration_seconds_count{method="get_frontend_devices_details_list"} 1.0', text)
+
+    @unittest.skipUnless(prometheus_client, "prometheus_client is not installed")
+    def test_switch_counters(self):
+        fabric_manager = self.agent.fabric_manager
+        fabric_manager.address = "100.127.0.125"
+        fabric_manager.available.return_value = True
+        fabric_manager.callbacks = []
+        client = fabric_manager.client
+        client.budget = RequestBudget()
+        with client.budget.operation("reconcile"):
+            client.budget.record("GET", "https://switch" + Interface.path_all, 200, 0, 20, 0.02)
+            for status, seconds in ((200, 0.08), (400, 0.2), (200, 0.2)):
+                client.budget.record("PATCH", "https://switch" + Interface.path, status, 10, 0, seconds)
+        client.inventory.stats = {"hits": 3, "misses": 1}
+        client.connection_stats.return_value = {"new_connections": 2, "reused_connections": 8}
+        fabric_manager.stats = {"writes_issued": 2, "writes_skipped": 5}
+        fabric_manager.pg_alloc = PortChannelAllocator(125, 128)
+        fabric_manager.pg_alloc.allocate("server1", ["ethernet1/1/1:1"])
+
+        text = AgentMetrics(self.agent, textfile=self.textfile).render().decode()
+
+        self.assertIn('os10fe_restconf_requests_total{operation="reconcile",switch="100.127.0.125"} 4.0', text)
+        self.assertIn('os10fe_restconf_errors_total{operation="reconcile",switch="100.127.0.125"} 1.0', text)
+        self.assertIn('os10fe_switch_available{switch="100.127.0.125"} 1.0', text)
+        self.assertIn('os10fe_restconf_request_duration_seconds_bucket{le="0.1",method="PATCH",'
+                      'path="/restconf/data/ietf-interfaces:interfaces",switch="100.127.0.125"} 1.0', text)
+        self.assertIn('os10fe_restconf_request_duration_seconds_bucket{le="+Inf",method="PATCH",'
+                      'path="/restconf/data/ietf-interfaces:interfaces",switch="100.127.0.125"} 3.0', text)
+        self.assertIn('os10fe_restconf_request_duration_seconds_count{method="GET",'
+                      'path="/restconf/data/ietf-interfaces:interfaces/interface",switch="100.127.0.125"} 1.0', text)
+        self.assertIn('os10fe_restconf_connections_total{switch="100.127.0.125"} 2.0', text)
+        self.assertIn('os10fe_restconf_connection_reuses_total{switch="100.127.0.125"} 8.0', text)
+        self.assertIn('os10fe_interface_cache_hit_ratio{switch="100.127.0.125"} 0.75', text)
+        self.assertIn('os10fe_interface_writes_total{result="skipped",switch="100.127.0.125"} 5.0', text)
+        self.assertIn('os10fe_port_channels_used{switch="100.127.0.125"} 1.0', text)
+        self.assertIn('os10fe_port_channels_capacity{switch="100.127.0.125"} 4.0', text)
+        self.assertIn('os10fe_port_channel_exhausted_total{switch="100.127.0.125"} 0.0', text)
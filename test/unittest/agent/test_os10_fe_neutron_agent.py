@@ -0,0 +1,424 @@
+import json
+import tempfile
+import time
+from unittest import TestCase
+from unittest import mock
+
+import eventlet
+from neutron.conf import common as common_config
+from oslo_config import cfg
+import oslo_messaging
+
+from os10_fe_networking.agent import os10_fe_neutron_agent
+from os10_fe_networking.agent.os10_fe_neutron_agent import OS10FENeutronAgent, OS10FERpcCallbacks
+from os10_fe_networking.agent.os10_fe_work_plan import WorkPlan
+
+CONF = cfg.CONF
+CONF.register_opts(common_config.core_opts)
+
+
+def device_detail(port_id, network_id="net-1", segmentation_id=2222, revision_number=1,
+                  switch_ip="100.127.0.125", switch_port="ethernet1/1/1:1"):
+    switch_info = {
+        "switch_ip": switch_ip,
+        "cluster": "Cluster1",
+        "preemption": "True",
+        "access_mode": "access"
+    }
+    return {
+        "port_id": port_id,
+        "network_id": network_id,
+        "segmentation_id": segmentation_id,
+        "revision_number": revision_number,
+        "profile": {
+            "local_link_information": [
+                {
+                    "port_id": switch_port,
+                    # switch_info is delivered as a python literal string
+                    "switch_info": json.dumps(switch_info).replace("\"", "'")
+                }
+            ]
+        }
+    }
+
+
+def create_agent():
+    with mock.patch.object(os10_fe_neutron_agent.ironic_client, "get_client"), \
+            mock.patch.object(os10_fe_neutron_agent.OS10FEFabricManager, "create") as create:
+        create.return_value.address = "100.127.0.125"
+        create.return_value.fingerprint = None
+        create.return_value.failed_intents = {}
+        agent = OS10FENeutronAgent()
+
+    agent.plugin_rpc = mock.Mock()
+    return agent
+
+
+class TestOS10FENeutronAgent(TestCase):
+
+    def setUp(self):
+        CONF(["--config-file", "./leaf1.ini"])
+        self.agent = create_agent()
+        self.rpc = self.agent.plugin_rpc
+
+    def test_refresh_full(self):
+        self.rpc.get_frontend_devices_details_list.return_value = [device_detail("port-1"),
+                                                                   device_detail("port-2")]
+
+        self.assertFalse(self.agent.refresh_devices_details_list())
+
+        self.assertEqual(len(self.agent.devices_details_cache), 2)
+        switch_info = self.agent.devices_details_cache.get_by_port("port-1")["profile"][
+            "local_link_information"][0]["switch_info"]
+        self.assertEqual(switch_info["switch_ip"], "100.127.0.125")
+        self.rpc.get_frontend_devices_details_list_delta.assert_not_called()
+
+    def test_refresh_delta(self):
+        self.rpc.get_frontend_devices_details_list.return_value = [device_detail("port-1"),
+                                                                   device_detail("port-2")]
+        self.agent.refresh_devices_details_list()
+
+        self.rpc.get_frontend_devices_details_list_delta.return_value = {
+            "devices": [device_detail("port-2", network_id="net-2", revision_number=2),
+                        device_detail("port-3")],
+            "removed_ports": ["port-1"]
+        }
+
+        self.assertFalse(self.agent.refresh_devices_details_list(full=False))
+
+        self.rpc.get_frontend_devices_details_list_delta.assert_called_once_with(
+            self.agent.context, self.agent.agent_id, {"port-1": 1, "port-2": 1}, host=CONF.host,
+            binding_host=None)
+        self.assertEqual(self.agent.devices_details_cache.revisions(), {"port-2": 2, "port-3": 1})
+        self.assertEqual([d["port_id"] for d in self.agent.devices_details_cache.get_by_network("net-2")],
+                         ["port-2"])
+
+    def test_refresh_delta_unsupported(self):
+        self.rpc.get_frontend_devices_details_list_delta.side_effect = oslo_messaging.RemoteError("NoSuchMethod")
+        self.rpc.get_frontend_devices_details_list.return_value = [device_detail("port-1")]
+
+        self.assertFalse(self.agent.refresh_devices_details_list(full=False))
+        self.assertFalse(self.agent.delta_rpc_supported)
+        self.assertIn("port-1", self.agent.devices_details_cache)
+
+        self.agent.refresh_devices_details_list(full=False)
+        self.rpc.get_frontend_devices_details_list_delta.assert_called_once()
+
+    def test_refresh_failure(self):
+        self.rpc.get_frontend_devices_details_list_delta.side_effect = oslo_messaging.MessagingTimeout()
+
+        self.assertTrue(self.agent.refresh_devices_details_list(full=False))
+
+    def test_operations_queued_for_managed_switch(self):
+        devices_details = [device_detail("port-1"), device_detail("port-2", switch_ip="100.127.0.126")]
+        self.agent._parse_switch_info(devices_details)
+        self.agent.devices_details_cache.rebuild(devices_details)
+        self.agent.fabric_manager.address = "100.127.0.125"
+
+        plan = WorkPlan(self.agent.fabric_manager.address)
+        self.agent._detach_device(plan, devices_details[1])
+        self.agent._submit_plan(plan)
+        self.agent._reconcile_devices(prune=True)
+        self.agent.fabric_manager.reconcile.assert_not_called()
+        self.assertEqual(len(self.agent.apply_engine), 2)
+
+        self.assertEqual(self.agent.apply_engine.run(), 0)
+
+        self.agent.fabric_manager.detach_port_from_vlan.assert_called_once_with(
+            "100.127.0.126", "ethernet1/1/1:1", 2222, "access", False)
+        intents = self.agent.fabric_manager.reconcile.call_args[0][0]
+        self.assertEqual([(intent.switch_ip, intent.vlan) for intent in intents],
+                         [("100.127.0.125", 2222), ("100.127.0.126", 2222)])
+        # one queue, the links of a spine share its client and inventory
+        self.assertEqual(len(self.agent.apply_engine), 0)
+        self.assertIsNotNone(self.agent.apply_engine.drain_time)
+
+    def test_iteration_skipped_while_switch_unavailable(self):
+        self.agent.fabric_manager.available.return_value = False
+        self.agent.updated_ports.add("port-1")
+
+        self.agent.run_iteration()
+
+        self.assertEqual(self.agent.updated_ports, {"port-1"})
+        self.rpc.get_frontend_devices_details_list.assert_not_called()
+
+    def test_deleted_network_vlan_deleted_once(self):
+        devices_details = [device_detail("port-%s" % index, switch_port="ethernet1/1/%s:1" % index)
+                           for index in range(1, 17)]
+        devices_details.append(device_detail("port-17", network_id="net-2", segmentation_id=2223))
+        self.agent._parse_switch_info(devices_details)
+        self.agent.devices_details_cache.rebuild(devices_details)
+        self.agent.deleted_networks.add("net-1")
+        self.agent.deleted_ports.add("port-17")
+        self.agent.start_up = False
+
+        self.agent.run_iteration()
+
+        self.agent.fabric_manager.delete_vlan.assert_called_once_with(
+            "100.127.0.125", mock.ANY, 2222, False)
+        self.agent.fabric_manager.detach_port_from_vlan.assert_called_once_with(
+            "100.127.0.125", "ethernet1/1/1:1", 2223, "access", False)
+        self.assertEqual(len(self.agent.devices_details_cache), 0)
+
+    def test_deleted_network_vlan_deleted_once_on_spine(self):
+        # the spine is reached by the links of both leaves
+        self.agent.fabric_manager.address = "100.127.0.1"
+        devices_details = [device_detail("port-1"), device_detail("port-2", switch_ip="100.127.0.126")]
+        self.agent._parse_switch_info(devices_details)
+        self.agent.devices_details_cache.rebuild(devices_details)
+        self.agent.deleted_networks.add("net-1")
+        self.agent.start_up = False
+
+        self.agent.run_iteration()
+
+        self.agent.fabric_manager.delete_vlan.assert_called_once_with(mock.ANY, "ethernet1/1/1:1", 2222, False)
+        self.assertIsNotNone(self.agent.apply_engine.drain_time)
+
+    def test_deleted_network_vlan_shared(self):
+        # net-2 has the segment of net-1 on the same switch
+        devices_details = [device_detail("port-1"),
+                           device_detail("port-2", network_id="net-2", switch_port="ethernet1/1/2:1")]
+        self.agent._parse_switch_info(devices_details)
+        self.agent.devices_details_cache.rebuild(devices_details)
+        self.agent.deleted_networks.add("net-1")
+        self.agent.start_up = False
+
+        self.agent.run_iteration()
+
+        self.agent.fabric_manager.delete_vlan.assert_not_called()
+        self.agent.fabric_manager.detach_port_from_vlan.assert_called_once_with(
+            "100.127.0.125", "ethernet1/1/1:1", 2222, "access", False)
+        self.assertEqual(list(self.agent.devices_details_cache), [devices_details[1]])
+
+        self.agent.deleted_networks.add("net-2")
+        self.agent.run_iteration()
+
+        self.agent.fabric_manager.delete_vlan.assert_called_once_with("100.127.0.125", "ethernet1/1/2:1", 2222, False)
+
+    def test_resync_retried_per_port(self):
+        self.agent.start_up = False
+        self.agent.updated_ports.add("port-1")
+        self.rpc.get_frontend_devices_details_list_delta.side_effect = oslo_messaging.MessagingTimeout()
+
+        self.agent.run_iteration()
+
+        self.assertIn(("port", "port-1"), self.agent.retry_queue)
+        self.assertGreater(self.agent.retry_queue.next_due(), 0)
+        # not due yet, the next iteration leaves neutron alone
+        self.agent.run_iteration()
+        self.assertEqual(self.rpc.get_frontend_devices_details_list_delta.call_count, 1)
+
+    def test_failed_detach_retried_alone(self):
+        devices_details = [device_detail("port-1"), device_detail("port-2", switch_port="ethernet1/1/2:1")]
+        self.agent._parse_switch_info(devices_details)
+        self.agent.devices_details_cache.rebuild(devices_details)
+        self.agent.start_up = False
+        self.agent.retry_queue.backoff = 0
+
+        def detach(switch_ip, switch_port, vlan, access_mode, enable_port_channel):
+            if switch_port == "ethernet1/1/1:1":
+                raise RuntimeError("rejected")
+        self.agent.fabric_manager.detach_port_from_vlan.side_effect = detach
+        self.agent.deleted_ports.update(["port-1", "port-2"])
+
+        self.agent.run_iteration()
+        self.assertEqual(self.agent.fabric_manager.detach_port_from_vlan.call_count, 2)
+        self.assertEqual(len(self.agent.retry_queue), 1)
+
+        self.agent.run_iteration()
+        self.agent.fabric_manager.detach_port_from_vlan.assert_called_with(
+            "100.127.0.125", "ethernet1/1/1:1", 2222, "access", False)
+        self.assertEqual(self.agent.fabric_manager.detach_port_from_vlan.call_count, 3)
+
+        self.agent.fabric_manager.detach_port_from_vlan.side_effect = None
+        self.agent.run_iteration()
+        self.assertEqual(len(self.agent.retry_queue), 0)
+        self.assertEqual(self.agent.retry_queue.dead_letters, {})
+
+    def test_failed_port_retried_alone(self):
+        devices_details = [device_detail("port-1"), device_detail("port-2", switch_port="ethernet1/1/2:1")]
+        self.rpc.get_frontend_devices_details_list_delta.return_value = {"devices": devices_details,
+                                                                        "removed_ports": []}
+        self.agent.start_up = False
+        self.agent.updated_ports.update(["port-1", "port-2", "port-3"])
+
+        def reconcile(intents, prune):
+            # the switch rejected a write of port-1
+            self.agent.fabric_manager.failed_intents = {intent: RuntimeError("rejected") for intent in intents
+                                                        if intent.switch_port == "ethernet1/1/1:1"}
+        self.agent.fabric_manager.reconcile.side_effect = reconcile
+
+        self.agent.run_iteration()
+
+        self.assertIn(("port", "port-1"), self.agent.retry_queue)
+        self.assertNotIn(("port", "port-2"), self.agent.retry_queue)
+        self.assertNotIn(("port", "port-3"), self.agent.retry_queue)
+        self.assertNotIn(("port", "port-2"), self.agent.journal)
+
+    def _restart_agent(self):
+        self.agent.journal.close()
+        self.agent = create_agent()
+        self.agent.fabric_manager.available.return_value = True
+        self.rpc = self.agent.plugin_rpc
+
+    def _use_state_dir(self):
+        state_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(state_dir.cleanup)
+        CONF.set_override("state_dir", state_dir.name, group="FRONTEND_SWITCH_FABRIC")
+        self.addCleanup(CONF.clear_override, "state_dir", group="FRONTEND_SWITCH_FABRIC")
+        self._restart_agent()
+
+    def test_journal_replays_deletion_after_restart(self):
+        self._use_state_dir()
+        devices_details = [device_detail("port-1"), device_detail("port-2", switch_port="ethernet1/1/2:1")]
+        self.agent._parse_switch_info(devices_details)
+        self.agent.devices_details_cache.rebuild(devices_details)
+        callbacks = OS10FERpcCallbacks(self.agent.context, self.agent, mock.Mock())
+        callbacks.port_delete(None, port_id="port-1")
+
+        # killed before the loop handled the event
+        self._restart_agent()
+        self.assertTrue(self.agent.warm_start)
+        self.rpc.get_frontend_devices_details_list.return_value = [device_detail("port-2",
+                                                                                 switch_port="ethernet1/1/2:1")]
+
+        self.agent.run_iteration()
+
+        self.agent.fabric_manager.detach_port_from_vlan.assert_called_once_with(
+            "100.127.0.125", "ethernet1/1/1:1", 2222, "access", False)
+        # nothing else was pending, the switch is not reconciled
+        self.agent.fabric_manager.reconcile.assert_not_called()
+        self.assertEqual(len(self.agent.journal), 0)
+
+    def test_journal_replays_failed_operation(self):
+        self._use_state_dir()
+        self.agent.start_up = False
+        self.agent.fabric_manager.delete_vlan.side_effect = RuntimeError("rejected")
+        devices_details = [device_detail("port-1")]
+        self.agent._parse_switch_info(devices_details)
+        self.agent.devices_details_cache.rebuild(devices_details)
+        self.agent.network_deleted("net-1")
+        self.agent.run_iteration()
+        self.assertEqual(list(self.agent.journal.pending), [("delete_vlan", "100.127.0.125", 2222)])
+
+        self._restart_agent()
+        self.agent.fabric_manager.delete_vlan.side_effect = None
+        self.assertTrue(self.agent.resume)
+        self.rpc.get_frontend_devices_details_list_delta.return_value = {"devices": [], "removed_ports": []}
+        self.agent.run_iteration()
+
+        self.agent.fabric_manager.delete_vlan.assert_called_once_with("100.127.0.125", "ethernet1/1/1:1", 2222, False)
+        self.assertEqual(len(self.agent.journal), 0)
+
+    def test_cold_start_reconciles(self):
+        self._use_state_dir()
+        self.assertFalse(self.agent.warm_start)
+        self.rpc.get_frontend_devices_details_list.return_value = []
+
+        self.agent.run_iteration()
+
+        self.agent.fabric_manager.reconcile.assert_called_once_with([], prune=True)
+
+    def test_snapshot_resume(self):
+        self._use_state_dir()
+        devices_details = [device_detail("port-1"), device_detail("port-2", switch_port="ethernet1/1/2:1",
+                                                                  revision_number=3)]
+        self.rpc.get_frontend_devices_details_list.return_value = devices_details
+        self.agent.fabric_manager.fingerprint = ("desired", "observed")
+        self.agent.run_iteration()
+
+        self._restart_agent()
+        self.assertTrue(self.agent.resume)
+        self.assertEqual(self.agent.fabric_manager.fingerprint, ("desired", "observed"))
+        self.assertEqual(self.agent.devices_details_cache.revisions(), {"port-1": 1, "port-2": 3})
+        # port-2 was deleted while the agent was down
+        self.rpc.get_frontend_devices_details_list_delta.return_value = {"devices": [], "removed_ports": ["port-2"]}
+
+        self.agent.run_iteration()
+
+        self.rpc.get_frontend_devices_details_list.assert_not_called()
+        self.agent.fabric_manager.detach_port_from_vlan.assert_called_once_with(
+            "100.127.0.125", "ethernet1/1/2:1", 2222, "access", False)
+        self.agent.fabric_manager.reconcile.assert_called_once_with(mock.ANY, prune=False)
+        self.assertFalse(self.agent.resume)
+
+    def _wait_for_work(self):
+        start = time.monotonic()
+        self.agent._wait_for_work(time.time())
+        return time.monotonic() - start
+
+    def test_wait_woken_by_event(self):
+        self.agent.polling_interval = 10
+        self.agent.coalesce_window = 0.05
+        callbacks = OS10FERpcCallbacks(self.agent.context, self.agent, mock.Mock())
+
+        eventlet.spawn_after(0.05, callbacks.port_update, None, port={"id": "port-1"}, network_type="vlan",
+                             segmentation_id=2222, physical_network="physnet1")
+
+        self.assertLess(self._wait_for_work(), 1)
+        self.assertEqual(self.agent.updated_ports, {"port-1"})
+        self.assertFalse(self.agent.work_event.is_set())
+
+    def test_wait_coalesces_burst(self):
+        self.agent.polling_interval = 10
+        self.agent.coalesce_window = 0.1
+        callbacks = OS10FERpcCallbacks(self.agent.context, self.agent, mock.Mock())
+
+        callbacks.port_delete(None, port_id="port-1")
+        for index in range(2, 5):
+            eventlet.spawn_after(0.03 * index, callbacks.port_delete, None, port_id="port-%s" % index)
+
+        self._wait_for_work()
+        self.assertEqual(self.agent.deleted_ports, {"port-1", "port-2", "port-3", "port-4"})
+
+    def test_wait_bounded_by_max_latency(self):
+        self.agent.polling_interval = 10
+        self.agent.coalesce_window = 0.1
+        self.agent.max_latency = 0.3
+
+        def notify():
+            for _ in range(100):
+                self.agent.notify_work()
+                eventlet.sleep(0.02)
+
+        thread = eventlet.spawn(notify)
+        try:
+            self.assertLess(self._wait_for_work(), 1)
+        finally:
+            thread.kill()
+
+    def test_wait_resync_interval_without_event(self):
+        self.agent.polling_interval = 0.1
+        self.agent.resync_interval = 0.3
+
+        self.assertGreaterEqual(self._wait_for_work(), 0.29)
+        self.assertTrue(self.agent.resync)
+
+    def test_wait_polling_interval_while_switch_unavailable(self):
+        self.agent.fabric_manager.available.return_value = False
+        self.agent.polling_interval = 0.1
+
+        self.assertLess(self._wait_for_work(), 1)
+        self.assertFalse(self.agent.resync)
+
+    def test_wait_retry_due(self):
+        self.agent.retry_queue.backoff = 0.1
+        self.agent.retry_queue.fail(("port", "port-1"), error="switch unreachable")
+
+        self.assertLess(self._wait_for_work(), 1)
+        self.assertFalse(self.agent.resync)
+
+    def test_resync_fetches_changed_ports(self):
+        self.rpc.get_frontend_devices_details_list.return_value = []
+        self.agent.run_iteration()
+        self.rpc.get_frontend_devices_details_list_delta.return_value = {"devices": [device_detail("port-1")],
+                                                                         "removed_ports": []}
+
+        self.agent.run_iteration()
+        self.rpc.get_frontend_devices_details_list_delta.assert_not_called()
+
+        self.agent.resync = True
+        self.agent.run_iteration()
+        self.rpc.get_frontend_devices_details_list_delta.assert_called_once()
+        self.assertIn("port-1", self.agent.devices_details_cache)
+        self.assertFalse(self.agent.resync)
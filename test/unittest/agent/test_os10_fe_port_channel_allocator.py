@@ -0,0 +1,100 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from os10_fe_networking.agent.os10_fe_port_channel_allocator import PortChannelAllocator
+
+
+class TestPortChannelAllocator(TestCase):
+
+    def setUp(self):
+        self.port_channels = {
+            "port-channel1": {"dell-interface:member-ports": [{"name": "ethernet1/1/61"}, {"name": "ethernet1/1/62"}]},
+            "port-channel126": {"dell-interface:member-ports": [{"name": "ethernet1/1/1:2"}]},
+            "port-channel127": {},
+        }
+
+    def test_allocate_and_release(self):
+        allocator = PortChannelAllocator(125, 128)
+        allocator.seed(self.port_channels)
+
+        # the server takes over the port channel its link is in
+        self.assertEqual(allocator.allocate("server1", ["ethernet1/1/1:2"]), 126)
+        self.assertEqual(allocator.stats["adoptions"], 1)
+
+        # the lowest free id, whatever the breakout sub-port
+        self.assertEqual(allocator.allocate("server2", ["ethernet1/1/5:1"]), 125)
+        self.assertEqual(allocator.allocate("server3", ["ethernet1/1/6:1"]), 128)
+        # the links of a server share their port channel
+        self.assertEqual(allocator.allocate("server2", ["ethernet1/1/5:1", "ethernet1/1/7:1"]), 125)
+        self.assertEqual(allocator.lookup_member("ethernet1/1/7:1"), 125)
+        self.assertEqual(allocator.used, 4)
+
+        # port-channel127 is on the switch, nobody owns it
+        with self.assertRaises(RuntimeError):
+            allocator.allocate("server4", ["ethernet1/1/8:1"])
+        self.assertEqual(allocator.stats["exhausted"], 1)
+
+        # releasing a server leaves the port channels of the others alone
+        self.assertEqual(allocator.release("server2"), 125)
+        self.assertIsNone(allocator.release("server2"))
+        self.assertIsNone(allocator.lookup_member("ethernet1/1/5:1"))
+        self.assertEqual(allocator.lookup("server3"), 128)
+        self.assertEqual(allocator.allocate("server4", ["ethernet1/1/8:1"]), 125)
+
+        allocator.release_id(127)
+        self.assertEqual(allocator.allocate("server5", ["ethernet1/1/9:1"]), 127)
+        allocator.release_id(126)
+        self.assertIsNone(allocator.lookup("server1"))
+        self.assertIsNone(allocator.lookup_member("ethernet1/1/1:2"))
+        self.assertEqual(allocator.lookup("server3"), 128)
+        self.assertEqual(allocator.used, 3)
+        self.assertEqual(allocator.stats, {"allocations": 5, "adoptions": 1, "releases": 2, "exhausted": 1})
+
+    def test_journal(self):
+        with tempfile.TemporaryDirectory() as state_dir:
+            journal_path = os.path.join(state_dir, "port_channels.json")
+
+            allocator = PortChannelAllocator(125, 128, journal_path)
+            self.assertEqual(allocator.allocate("server1", ["ethernet1/1/2:1"]), 125)
+            self.assertEqual(allocator.allocate("server2", ["ethernet1/1/1:2"]), 126)
+            self.assertEqual(allocator.allocate("server3", ["ethernet1/1/3:1"]), 127)
+            allocator.release("server1")
+
+            allocator = PortChannelAllocator(125, 128, journal_path)
+            self.assertIsNone(allocator.lookup("server1"))
+            self.assertEqual(allocator.lookup("server2"), 126)
+            self.assertEqual(allocator.lookup_member("ethernet1/1/3:1"), 127)
+            # the ids are kept, new servers get the free ones
+            self.assertEqual(allocator.allocate("server4", ["ethernet1/1/4:1"]), 125)
+
+            allocator.seed(self.port_channels)
+            self.assertEqual(allocator.lookup("server2"), 126)
+            self.assertEqual(allocator.lookup("server3"), 127)
+            self.assertEqual(allocator.allocate("server5", ["ethernet1/1/5:1"]), 128)
+
+    def test_seed_over_journal(self):
+        with tempfile.TemporaryDirectory() as state_dir:
+            journal_path = os.path.join(state_dir, "port_channels.json")
+
+            allocator = PortChannelAllocator(125, 128, journal_path)
+            self.assertEqual(allocator.allocate("server1", ["ethernet1/1/1:2"]), 125)
+
+            # the switch holds the member in another port channel
+            allocator = PortChannelAllocator(125, 128, journal_path)
+            allocator.seed(self.port_channels)
+            self.assertIsNone(allocator.lookup("server1"))
+            self.assertEqual(allocator.allocate("server1", ["ethernet1/1/1:2"]), 126)
+            self.assertEqual(allocator.allocate("server2", ["ethernet1/1/2:2"]), 125)
+
+    def test_journal_created_and_unwritable(self):
+        with tempfile.TemporaryDirectory() as state_dir:
+            journal_path = os.path.join(state_dir, "state", "port_channels.json")
+            allocator = PortChannelAllocator(125, 128, journal_path)
+            self.assertEqual(allocator.allocate("server1", ["ethernet1/1/1:2"]), 125)
+            self.assertEqual(PortChannelAllocator(125, 128, journal_path).lookup("server1"), 125)
+
+            # a directory can not be replaced by the journal
+            allocator = PortChannelAllocator(125, 128, state_dir)
+            self.assertEqual(allocator.allocate("server1", ["ethernet1/1/1:2"]), 125)
+            self.assertEqual(allocator.stats["journal_errors"], 1)
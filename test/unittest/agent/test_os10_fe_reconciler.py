@@ -0,0 +1,147 @@
+import json
+from unittest import TestCase
+
+import requests_mock
+from oslo_config import cfg
+
+from os10_fe_networking.agent import os10_fe_reconciler
+from os10_fe_networking.agent.os10_fe_fabric_manager import OS10FEFabricManager
+from os10_fe_networking.agent.os10_fe_reconciler import DesiredState, Operation, PortIntent
+from os10_fe_networking.agent.rest_conf.common import Copy
+from os10_fe_networking.agent.rest_conf.interface import Interface, VLanInterface, PortChannelInterface
+
+CONF = cfg.CONF
+CONF.import_group("FRONTEND_SWITCH_FABRIC", "os10_fe_networking.agent.config")
+
+
+def read_file_data(filename, path):
+    with open(path + filename, encoding="utf8") as data_file:
+        json_data = json.load(data_file)
+    return json_data
+
+
+def observed(*interfaces):
+    all_interfaces = {Interface.Type.VLan: {}, Interface.Type.PortChannel: {}, Interface.Type.Ethernet: {}}
+    for interface in interfaces:
+        all_interfaces[interface["type"]][interface["name"]] = interface
+    return all_interfaces
+
+
+class TestDiff(TestCase):
+
+    def test_defaults_and_subsets(self):
+        desired = DesiredState()
+        desired.add(PortChannelInterface(channel_id="125", enabled=True, mtu=9216, vlt_port_channel_id=125))
+
+        port_channel = {"name": "port-channel125", "type": Interface.Type.PortChannel, "dell-interface:mtu": 9216,
+                        "dell-vlt:vlt": {"vlt-id": 125}, "dell-interface:lag-mode": "DYNAMIC"}
+        self.assertEqual(os10_fe_reconciler.diff(desired, observed(port_channel)), [])
+
+        port_channel["dell-interface:mtu"] = 1500
+        self.assertEqual(os10_fe_reconciler.diff(desired, observed(port_channel)),
+                         [Operation.write_interface({"name": "port-channel125",
+                                                     "type": Interface.Type.PortChannel,
+                                                     "dell-interface:mtu": 9216})])
+
+    def test_create_only_and_memberships(self):
+        desired = DesiredState()
+        desired.add(VLanInterface(vlan_id="2222", desc="Cluster1", enabled=True), create_only=True)
+        desired.add(VLanInterface(vlan_id="2222", port="port-channel125", port_mode=VLanInterface.PortMode.ACCESS))
+        desired.add(VLanInterface(vlan_id="2222", port="port-channel1", port_mode=VLanInterface.PortMode.TRUNK))
+
+        # a missing vlan is created with its description
+        operations = os10_fe_reconciler.diff(desired, observed())
+        self.assertEqual([operation.name for operation in operations], ["vlan2222"] * 3)
+        self.assertEqual(operations[0].body["ietf-interfaces:interfaces"]["interface"][0]["description"], "Cluster1")
+
+        # the description of an existing vlan is kept, only the missing member is written
+        vlan = {"name": "vlan2222", "type": Interface.Type.VLan, "description": "Other",
+                "dell-interface:untagged-ports": ["port-channel125"]}
+        self.assertEqual(os10_fe_reconciler.diff(desired, observed(vlan)),
+                         [Operation.write_interface_range(2222, ["port-channel1"])])
+
+    def test_prune(self):
+        port_channels = [{"name": "port-channel%s" % channel_id, "type": Interface.Type.PortChannel}
+                         for channel_id in (1, 125)]
+
+        operations = os10_fe_reconciler.diff(DesiredState(), observed(*port_channels),
+                                             lambda name: name != "port-channel1")
+        self.assertEqual(operations, [Operation.delete_interface("port-channel125")])
+
+
+class TestReconcile(TestCase):
+
+    def setUp(self):
+        CONF(["--config-file", "./leaf1.ini"])
+        self.intents = [
+            PortIntent("100.127.0.125", "ethernet1/1/1:1", 2222, "Cluster1", False, "access", True),
+            PortIntent("100.127.0.125", "ethernet1/1/1:2", 2000, "Cluster1", False, "trunk", True),
+            PortIntent("100.127.0.125", "ethernet1/1/2", 3001, "Cluster1", False, "access", False),
+            # other leaf
+            PortIntent("100.127.0.126", "ethernet1/1/1:1", 2222, "Cluster1", False, "access", True),
+        ]
+
+    def test_leaf_steady_state(self):
+        ff_manager_leaf1 = OS10FEFabricManager.create(CONF)
+        all_interfaces_leaf1 = read_file_data("all_interfaces_leaf1.json", "restconf/")
+
+        with requests_mock.Mocker() as m:
+            m.get(ff_manager_leaf1.client.base_url + Interface.path_all,
+                  json=all_interfaces_leaf1, status_code=200)
+            patch = m.patch(ff_manager_leaf1.client.base_url + Interface.path,
+                            status_code=204)
+            m.post(ff_manager_leaf1.client.base_url + Interface.path,
+                   status_code=201)
+            m.post(ff_manager_leaf1.client.base_url + Copy.path,
+                   status_code=204)
+
+            operations = ff_manager_leaf1.reconcile(self.intents)
+            self.assertGreater(operations, 0)
+            writes = patch.call_count
+
+            # nothing drifted
+            self.assertEqual(ff_manager_leaf1.reconcile(self.intents), 0)
+            self.assertEqual(patch.call_count, writes)
+            self.assertEqual(ff_manager_leaf1.flush(), 1)
+
+    def test_leaf_rejected_write(self):
+        ff_manager_leaf1 = OS10FEFabricManager.create(CONF)
+        all_interfaces_leaf1 = read_file_data("all_interfaces_leaf1.json", "restconf/")
+
+        def write(request, context):
+            names = [entry["name"] for entry in request.json()["ietf-interfaces:interfaces"].get("interface", [])]
+            context.status_code = 400 if "ethernet1/1/2" in names else 204
+            return ""
+
+        with requests_mock.Mocker() as m:
+            m.get(ff_manager_leaf1.client.base_url + Interface.path_all,
+                  json=all_interfaces_leaf1, status_code=200)
+            m.patch(ff_manager_leaf1.client.base_url + Interface.path, text=write)
+            m.post(ff_manager_leaf1.client.base_url + Interface.path, text=write)
+
+            ff_manager_leaf1.reconcile(self.intents)
+
+            # only the port whose write was rejected is left unconfigured
+            self.assertEqual(list(ff_manager_leaf1.failed_intents), [self.intents[2]])
+            self.assertIsNone(ff_manager_leaf1.fingerprint)
+
+    def test_leaf_prune(self):
+        CONF.set_override("prune_port_channels", True, group="FRONTEND_SWITCH_FABRIC")
+        self.addCleanup(CONF.clear_override, "prune_port_channels", group="FRONTEND_SWITCH_FABRIC")
+        ff_manager_leaf1 = OS10FEFabricManager.create(CONF)
+        all_interfaces_leaf1 = read_file_data("all_interfaces_leaf1.json", "restconf/")
+
+        with requests_mock.Mocker() as m:
+            m.get(ff_manager_leaf1.client.base_url + Interface.path_all,
+                  json=all_interfaces_leaf1, status_code=200)
+            m.patch(ff_manager_leaf1.client.base_url + Interface.path,
+                    status_code=204)
+            m.post(ff_manager_leaf1.client.base_url + Interface.path,
+                   status_code=201)
+            delete = m.delete(requests_mock.ANY, status_code=204)
+
+            ff_manager_leaf1.reconcile(self.intents[:1], prune=True)
+
+            # port-channel125 is still needed, port-channel1 and 102 are not managed by the agent
+            self.assertEqual(sorted(request.url.rsplit("/", 1)[-1] for request in delete.request_history),
+                             ["port-channel126", "port-channel127", "port-channel128"])
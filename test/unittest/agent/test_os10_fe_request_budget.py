@@ -0,0 +1,80 @@
+import json
+from unittest import TestCase
+
+from oslo_config import cfg
+
+from os10_fe_networking.agent.os10_fe_fabric_manager import OS10FEFabricManager
+from os10_fe_networking.agent.os10_fe_request_budget import RequestBudget, path_template
+from os10_fe_networking.agent.rest_conf.interface import Interface
+from test.emulator.os10_restconf import OS10RestConfEmulator
+
+CONF = cfg.CONF
+CONF.import_group("FRONTEND_SWITCH_FABRIC", "os10_fe_networking.agent.config")
+
+
+def read_file_data(filename, path):
+    with open(path + filename, encoding="utf8") as data_file:
+        json_data = json.load(data_file)
+    return json_data
+
+
+class TestRequestBudget(TestCase):
+
+    def test_path_template(self):
+        self.assertEqual(path_template("https://100.127.0.125" + Interface.path_by_name.format(name="vlan2222")),
+                         Interface.path_by_name)
+        self.assertEqual(path_template("https://100.127.0.125" + Interface.path_all),
+                         "/restconf/data/ietf-interfaces:interfaces/interface")
+
+    def test_operation(self):
+        budget = RequestBudget()
+        with budget.operation("ensure_configuration", "ethernet1/1/1:1"):
+            with budget.operation("inner"):
+                budget.record("PATCH", "https://switch/restconf/data/ietf-interfaces:interfaces", 404, 10, 20, 0.5)
+        budget.record("GET", "https://switch/restconf/data/ietf-interfaces:interfaces", 200, 0, 20, 0.5)
+
+        self.assertEqual(budget.totals["ensure_configuration"],
+                         {"requests": 1, "PATCH": 1, "errors": 1, "bytes_sent": 10, "bytes_received": 20,
+                          "seconds": 0.5})
+        self.assertEqual(budget.requests(RequestBudget.OTHER), 1)
+        self.assertEqual(budget.history[0].port, "ethernet1/1/1:1")
+
+    def test_latency(self):
+        budget = RequestBudget()
+        url = "https://switch" + Interface.path_by_name.format(name="vlan2222")
+        for seconds in (0.005, 0.01, 0.3, 120):
+            budget.record("GET", url, 200, 0, 20, seconds)
+
+        self.assertEqual(budget.latency["GET", Interface.path_by_name], [2, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 1])
+        self.assertEqual(budget.latency_seconds["GET", Interface.path_by_name], 120.315)
+
+
+class TestLeafRequestBudget(TestCase):
+
+    def setUp(self):
+        CONF(["--config-file", "./leaf1.ini"])
+        self.ff_manager_leaf1 = OS10FEFabricManager.create(CONF)
+        interfaces = read_file_data("all_interfaces_leaf1.json", "restconf/")["ietf-interfaces:interface"]
+        self.emulator = OS10RestConfEmulator(self.ff_manager_leaf1.address, interfaces)
+        self.emulator.mount(self.ff_manager_leaf1.client.session)
+        self.addCleanup(self.ff_manager_leaf1.client.session.adapters.pop,
+                        "https://{address}/".format(address=self.ff_manager_leaf1.address))
+        self.budget = self.ff_manager_leaf1.client.budget
+
+    def test_provision_access_port(self):
+        self.ff_manager_leaf1.ensure_configuration("100.127.0.125", "ethernet1/1/1:1", 2222, "Cluster1", False,
+                                                   "access", False)
+
+        # interface listing, vlan creation, then the ethernet and its vlan membership
+        self.assertLessEqual(self.budget.requests("ensure_configuration"), 4)
+        self.assertEqual(self.budget.totals["ensure_configuration"]["errors"], 0)
+        self.assertGreater(self.budget.totals["ensure_configuration"]["bytes_received"], 0)
+
+    def test_provision_port_channel(self):
+        self.ff_manager_leaf1.ensure_configuration("100.127.0.125", "ethernet1/1/1:1", 2222, "Cluster1", False,
+                                                   "trunk", True)
+        self.assertLessEqual(self.budget.requests("ensure_configuration"), 4)
+
+        self.ff_manager_leaf1.flush(force=True)
+        self.assertEqual(self.budget.totals["flush"]["POST"], 1)
+        self.assertEqual({request.operation for request in self.budget.history}, {"ensure_configuration", "flush"})
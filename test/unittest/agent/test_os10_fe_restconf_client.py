@@ -0,0 +1,292 @@
+from unittest import mock
+from unittest import TestCase
+
+import requests
+import requests_mock
+
+from os10_fe_networking.agent.os10_fe_circuit_breaker import SwitchUnavailable
+from os10_fe_networking.agent.os10_fe_restconf_client import OS10FERestConfClient
+from os10_fe_networking.agent.rest_conf.interface import Interface, VLanInterface, PortChannelInterface, \
+    EthernetInterface
+
+REQUIRE_INSTANCE_FAILED = {
+    "ietf-restconf:errors": {
+        "error": [
+            {
+                "error-type": "application",
+                "error-tag": "data-missing",
+                "error-message": "require-instance test failed"
+            }
+        ]
+    }
+}
+
+
+class TestOS10FERestConfClientBatch(TestCase):
+
+    def setUp(self):
+        self.client = OS10FERestConfClient("100.127.0.125")
+        self.url = self.client.base_url + Interface.path
+
+    def test_batch_combines_writes(self):
+        with requests_mock.Mocker() as m:
+            patch = m.patch(self.url, status_code=204)
+
+            with self.client.batch() as batch:
+                self.client.configure_vlan(VLanInterface(vlan_id="2222", desc="Cluster1", enabled=True))
+                self.client.configure_port_channel(PortChannelInterface(channel_id="125", mtu=9216,
+                                                                        access_vlan_id="2222"))
+                self.client.configure_ethernet_interface(EthernetInterface(eif_id="1/1/1:1", mtu=1554,
+                                                                           channel_group="125"))
+                self.assertEqual(patch.call_count, 0)
+
+            self.assertTrue(batch.ok)
+            # vlan2222 is written twice, the untagged port goes into a second request
+            self.assertEqual(patch.call_count, 2)
+            names = [[entry["name"] for entry in request.json()["ietf-interfaces:interfaces"]["interface"]]
+                     for request in patch.request_history]
+            self.assertEqual(names, [["vlan2222", "port-channel125"],
+                                     ["vlan2222", "ethernet1/1/1:1", "port-channel125"]])
+
+    def test_batch_fallback(self):
+        with requests_mock.Mocker() as m:
+            patch = m.patch(self.url, [{"status_code": 404, "json": REQUIRE_INSTANCE_FAILED},
+                                       {"status_code": 404, "json": REQUIRE_INSTANCE_FAILED},
+                                       {"status_code": 204}])
+            post = m.post(self.url, status_code=201)
+
+            batch = self.client.configure_port_channel(PortChannelInterface(channel_id="125", mtu=9216,
+                                                                            trunk_allowed_vlan_ids="2222"))
+
+            self.assertTrue(batch.ok)
+            self.assertEqual(patch.call_count, 3)
+            self.assertEqual(post.call_count, 1)
+            self.assertEqual(self.client.stats["batch_fallbacks"], 1)
+
+    def test_batch_rejected_entries(self):
+        with requests_mock.Mocker() as m:
+            def patch(request, context):
+                names = [entry["name"] for entry in request.json()["ietf-interfaces:interfaces"]["interface"]]
+                context.status_code = 400 if "port-channel125" in names else 204
+                return ""
+            m.patch(self.url, text=patch)
+
+            with self.client.batch() as batch:
+                self.client.configure_vlan(VLanInterface(vlan_id="2222", desc="Cluster1", enabled=True))
+                self.client.configure_port_channel(PortChannelInterface(channel_id="125", mtu=9216))
+
+            self.assertFalse(batch.ok)
+            self.assertEqual(batch.rejected, {("interface", "port-channel125")})
+            self.assertTrue(batch.rejects(PortChannelInterface(channel_id="125", mtu=9216).content()))
+            self.assertFalse(batch.rejects(VLanInterface(vlan_id="2222", desc="Cluster1", enabled=True).content()))
+
+    def test_delete_keeps_order(self):
+        with requests_mock.Mocker() as m:
+            m.patch(self.url, status_code=204)
+            m.delete(requests_mock.ANY, status_code=204)
+
+            with self.client.batch():
+                self.client.configure_vlan(VLanInterface(vlan_id="2222", desc="Cluster1", enabled=True))
+                self.client.delete_interface("port-channel125")
+                self.client.configure_vlan(VLanInterface(vlan_id="3333", desc="Cluster1", enabled=True))
+
+            self.assertEqual([request.method for request in m.request_history], ["PATCH", "DELETE", "PATCH"])
+
+    def test_no_write_on_error(self):
+        with requests_mock.Mocker() as m:
+            patch = m.patch(self.url, status_code=204)
+
+            with self.assertRaises(RuntimeError):
+                with self.client.batch():
+                    self.client.configure_vlan(VLanInterface(vlan_id="2222", desc="Cluster1", enabled=True))
+                    raise RuntimeError("abort")
+
+            self.assertEqual(patch.call_count, 0)
+
+
+class TestOS10FERestConfClientUpsert(TestCase):
+
+    def setUp(self):
+        self.client = OS10FERestConfClient("100.127.0.125")
+        self.url = self.client.base_url + Interface.path
+        self.interfaces = {
+            "ietf-interfaces:interface": [
+                {"name": "vlan1", "type": Interface.Type.VLan},
+                {"name": "port-channel125", "type": Interface.Type.PortChannel}
+            ]
+        }
+
+    def test_unknown_existence_patches_first(self):
+        with requests_mock.Mocker() as m:
+            patch = m.patch(self.url, status_code=404, json=REQUIRE_INSTANCE_FAILED)
+            post = m.post(self.url, status_code=201)
+
+            self.assertIsNone(self.client.interface_exists("vlan2222"))
+            self.client.configure_vlan(VLanInterface(vlan_id="2222", desc="Cluster1", enabled=True))
+
+            self.assertEqual((patch.call_count, post.call_count), (1, 1))
+            self.assertEqual(self.client.fallbacks, {Interface.Type.VLan: 1})
+
+    def test_choose_post_or_patch(self):
+        with requests_mock.Mocker() as m:
+            m.get(self.client.base_url + Interface.path_all, json=self.interfaces)
+            patch = m.patch(self.url, status_code=204)
+            post = m.post(self.url, status_code=201)
+            m.delete(requests_mock.ANY, status_code=204)
+
+            self.client.inventory.get()
+            self.assertTrue(self.client.interface_exists("port-channel125"))
+
+            self.client.configure_vlan(VLanInterface(vlan_id="2222", desc="Cluster1", enabled=True))
+            self.assertEqual((patch.call_count, post.call_count), (0, 1))
+            self.assertTrue(self.client.interface_exists("vlan2222"))
+
+            self.client.configure_vlan(VLanInterface(vlan_id="2222", desc="Cluster2"))
+            self.assertEqual((patch.call_count, post.call_count), (1, 1))
+
+            self.client.delete_interface("vlan2222")
+            self.assertFalse(self.client.interface_exists("vlan2222"))
+            self.assertEqual(self.client.fallbacks, {})
+
+    def test_stale_index_falls_back_to_patch(self):
+        with requests_mock.Mocker() as m:
+            m.get(self.client.base_url + Interface.path_all, json=self.interfaces)
+            patch = m.patch(self.url, status_code=204)
+            post = m.post(self.url, status_code=409)
+
+            self.client.inventory.get()
+            self.client.configure_vlan(VLanInterface(vlan_id="2222", desc="Cluster1", enabled=True))
+
+            self.assertEqual((patch.call_count, post.call_count), (1, 1))
+            self.assertEqual(self.client.fallbacks, {Interface.Type.VLan: 1})
+
+    def test_invalidate_forgets_existence(self):
+        with requests_mock.Mocker() as m:
+            m.get(self.client.base_url + Interface.path_all, json=self.interfaces)
+
+            self.client.inventory.get()
+            self.assertFalse(self.client.interface_exists("vlan2222"))
+
+            # e.g. vlan2222 created on the switch meanwhile
+            self.client.inventory.invalidate()
+            self.assertIsNone(self.client.interface_exists("vlan2222"))
+
+            # a failed write invalidates the inventory too
+            self.client.inventory.get()
+            m.delete(requests_mock.ANY, status_code=500)
+            self.client.delete_interface("port-channel125")
+            self.assertIsNone(self.client.interface_exists("port-channel125"))
+
+    def test_batch_creates_new_objects_first(self):
+        with requests_mock.Mocker() as m:
+            m.get(self.client.base_url + Interface.path_all, json=self.interfaces)
+            patch = m.patch(self.url, status_code=204)
+            post = m.post(self.url, status_code=201)
+
+            self.client.inventory.get()
+            self.client.configure_port_channel(PortChannelInterface(channel_id="126", mtu=9216,
+                                                                    access_vlan_id="1"))
+
+            self.assertEqual(post.last_request.json()["ietf-interfaces:interfaces"]["interface"][0]["name"],
+                             "port-channel126")
+            self.assertEqual(patch.last_request.json()["ietf-interfaces:interfaces"]["interface"][0]["name"],
+                             "vlan1")
+            self.assertEqual(self.client.stats["batch_fallbacks"], 0)
+
+
+class TestOS10FERestConfClientRetry(TestCase):
+
+    def setUp(self):
+        self.client = OS10FERestConfClient("100.127.0.125", retries=2, retry_backoff=0, failure_threshold=2)
+        self.client.breaker._start_prober = lambda: None
+        self.url = self.client.base_url + Interface.path_all
+
+    def test_retry_idempotent(self):
+        with requests_mock.Mocker() as m:
+            get = m.get(self.url, [{"status_code": 503}, {"exc": requests.ConnectTimeout}, {"status_code": 200}])
+
+            self.assertEqual(self.client._get(self.url, None).status_code, 200)
+            self.assertEqual(get.call_count, 3)
+            self.assertEqual(self.client.stats["retries"], 2)
+            self.assertTrue(self.client.breaker.allow())
+
+    def test_no_retry_post(self):
+        with requests_mock.Mocker() as m:
+            post = m.post(self.url, status_code=503)
+
+            self.assertEqual(self.client._post(self.url, None, {}).status_code, 503)
+            self.assertEqual(post.call_count, 1)
+
+    def test_fail_fast(self):
+        with requests_mock.Mocker() as m:
+            get = m.get(self.url, exc=requests.ConnectionError)
+
+            for _ in range(2):
+                with self.assertRaises(requests.ConnectionError):
+                    self.client._get(self.url, None)
+            self.assertEqual(get.call_count, 6)
+            self.assertFalse(self.client.breaker.allow())
+
+            with self.assertRaises(SwitchUnavailable):
+                self.client._get(self.url, None)
+            self.assertEqual(get.call_count, 6)
+
+            m.get(self.client.base_url + Interface.path_by_name.format(name="vlan1"), status_code=200)
+            self.assertTrue(self.client.breaker.probe_once())
+            self.assertTrue(self.client.breaker.allow())
+
+
+class TestOS10FERestConfClientSession(TestCase):
+
+    def test_session_shared_per_switch(self):
+        client = OS10FERestConfClient("100.127.0.200", pool_maxsize=8)
+        self.assertIs(OS10FERestConfClient("100.127.0.200", pool_maxsize=8).session, client.session)
+        self.assertIsNot(OS10FERestConfClient("100.127.0.201", pool_maxsize=8).session, client.session)
+
+        self.assertEqual(client.session.get_adapter(client.base_url)._pool_maxsize, 8)
+
+    def test_session_per_pool_settings(self):
+        client = OS10FERestConfClient("100.127.0.203", pool_maxsize=8)
+        other = OS10FERestConfClient("100.127.0.203", pool_maxsize=2, pool_block=True)
+
+        self.assertIsNot(other.session, client.session)
+        adapter = other.session.get_adapter(other.base_url)
+        self.assertEqual((adapter._pool_maxsize, adapter._pool_block), (2, True))
+        self.assertEqual(client.session.get_adapter(client.base_url)._pool_maxsize, 8)
+
+    def test_connection_stats(self):
+        client = OS10FERestConfClient("100.127.0.202")
+        pool = client.session.get_adapter(client.base_url).poolmanager.connection_from_url(client.base_url)
+        pool.num_connections = 2
+        pool.num_requests = 10
+
+        self.assertEqual(client.connection_stats(), {"new_connections": 2, "reused_connections": 8})
+
+
+class TestOS10FERestConfClientFields(TestCase):
+
+    def setUp(self):
+        self.client = OS10FERestConfClient("100.127.0.125")
+        self.interfaces = {
+            "ietf-interfaces:interface": [
+                {"name": "vlan1", "type": Interface.Type.VLan}
+            ]
+        }
+
+    def test_fields_read(self):
+        with requests_mock.Mocker() as m:
+            get = m.get(self.client.base_url + Interface.path_all, json=self.interfaces)
+
+            self.assertIn("vlan1", self.client.inventory.get()[Interface.Type.VLan])
+            self.assertIn("dell-interface:member-ports", get.last_request.qs["fields"][0].split(";"))
+
+    def test_fallback_to_full_read(self):
+        with requests_mock.Mocker() as m:
+            get = m.get(self.client.base_url + Interface.path_all, [{"status_code": 400},
+                                                                    {"json": self.interfaces},
+                                                                    {"json": self.interfaces}])
+
+            self.assertIn("vlan1", self.client.inventory.get()[Interface.Type.VLan])
+            self.assertIn("vlan1", self.client.get_all_interfaces_by_type()[0])
+            self.assertEqual([request.qs.get("fields") for request in get.request_history], [mock.ANY, None, None])
+            self.assertEqual(self.client.stats["fields_fallbacks"], 1)
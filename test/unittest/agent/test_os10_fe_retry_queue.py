@@ -0,0 +1,69 @@
+from unittest import TestCase
+from unittest import mock
+
+from os10_fe_networking.agent import os10_fe_retry_queue
+from os10_fe_networking.agent.os10_fe_retry_queue import RetryQueue
+
+
+class TestRetryQueue(TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch.object(os10_fe_retry_queue.time, "monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.queue = RetryQueue(backoff=2, max_backoff=5, max_attempts=4)
+
+    def test_exponential_backoff(self):
+        self.queue.fail(("port", "port-1"))
+        self.assertEqual(self.queue.next_due(), 2)
+        self.assertEqual(self.queue.due(), [])
+
+        self.now += 2
+        self.assertEqual(self.queue.due(), [(("port", "port-1"), None)])
+        self.queue.fail(("port", "port-1"))
+        self.assertEqual(self.queue.next_due(), 4)
+
+        self.now += 4
+        self.queue.due()
+        self.queue.fail(("port", "port-1"))
+        # capped by max_backoff
+        self.assertEqual(self.queue.next_due(), 5)
+
+    def test_items_independent(self):
+        self.queue.fail(("port", "port-1"))
+        self.now += 1
+        self.queue.fail(("delete_vlan", "leaf1", 2222), ("leaf1", "ethernet1/1/1:1", 2222, False))
+
+        self.now += 1
+        self.assertEqual(self.queue.due(), [(("port", "port-1"), None)])
+        self.queue.succeed(("port", "port-1"))
+
+        self.now += 1
+        self.assertEqual(self.queue.due(),
+                         [(("delete_vlan", "leaf1", 2222), ("leaf1", "ethernet1/1/1:1", 2222, False))])
+        self.assertEqual(self.queue.next_due(), None)
+
+    def test_dead_letter(self):
+        for _ in range(4):
+            self.now += 10
+            self.queue.due()
+            self.queue.fail(("port", "port-1"), error="boom")
+
+        self.assertNotIn(("port", "port-1"), self.queue)
+        self.assertEqual(self.queue.dead_letters[("port", "port-1")].attempts, 4)
+        self.now += 10
+        self.assertEqual(self.queue.due(), [])
+
+        self.queue.discard(("port", "port-1"))
+        self.assertEqual(self.queue.dead_letters, {})
+        self.assertEqual(self.queue.stats, {"failures": 4, "retries": 3, "dead_letters": 1})
+
+    def test_unresolved_items_dropped(self):
+        self.queue.fail(("port", "port-1"))
+        self.now += 2
+        self.queue.due()
+        self.assertIn(("port", "port-1"), self.queue)
+
+        self.queue.due()
+        self.assertEqual(len(self.queue), 0)
@@ -0,0 +1,44 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from os10_fe_networking.agent.os10_fe_snapshot import WarmStartSnapshot
+
+
+class TestWarmStartSnapshot(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "snapshot.json")
+        self.snapshot = WarmStartSnapshot(self.path)
+
+    def test_round_trip(self):
+        device_detail = {"port_id": "port-1", "network_id": "net-1", "segmentation_id": 2222, "revision_number": 4,
+                         "profile": {"local_link_information": []}, "device": "ignored", "mac_address": "ignored"}
+
+        self.snapshot.save([device_detail], {"100.127.0.125": ("desired", "observed"), "100.127.0.126": None})
+
+        devices_details, fingerprints = self.snapshot.load()
+        self.assertEqual(devices_details, [{"port_id": "port-1", "network_id": "net-1", "segmentation_id": 2222,
+                                            "revision_number": 4, "profile": {"local_link_information": []}}])
+        self.assertEqual(fingerprints, {"100.127.0.125": ("desired", "observed"), "100.127.0.126": None})
+
+    def test_state_dir_created(self):
+        snapshot = WarmStartSnapshot(os.path.join(self.directory.name, "state", "snapshot.json"))
+        snapshot.save([{"port_id": "port-1"}], {})
+
+        self.assertEqual(snapshot.load(), ([{"port_id": "port-1"}], {}))
+
+    def test_missing_or_unusable(self):
+        self.assertIsNone(self.snapshot.load())
+        self.assertIsNone(WarmStartSnapshot().load())
+
+        with open(self.path, "w", encoding="utf8") as snapshot_file:
+            snapshot_file.write('{"version": 1, "devi')
+        self.assertIsNone(self.snapshot.load())
+
+        with open(self.path, "w", encoding="utf8") as snapshot_file:
+            json.dump({"version": 0, "devices": [], "fingerprints": {}}, snapshot_file)
+        self.assertIsNone(self.snapshot.load())
@@ -0,0 +1,94 @@
+import errno
+import os
+import tempfile
+from unittest import TestCase
+from unittest import mock
+
+from os10_fe_networking.agent.os10_fe_work_journal import WorkJournal
+
+
+class TestWorkJournal(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "work_journal.jsonl")
+
+    def test_replay_unfinished(self):
+        journal = WorkJournal(self.path)
+        self.assertFalse(journal.recovered)
+        journal.add(("port", "port-1"))
+        journal.add(("deleted_port", "port-2"), {"port_id": "port-2", "segmentation_id": 2222})
+        journal.add(("delete_vlan", "leaf1", 2222), ("leaf1", "ethernet1/1/1:1", 2222, False))
+        journal.done(("port", "port-1"))
+        journal.close()
+
+        journal = WorkJournal(self.path)
+
+        self.assertTrue(journal.recovered)
+        self.assertEqual(list(journal.pending.items()),
+                         [(("deleted_port", "port-2"), {"port_id": "port-2", "segmentation_id": 2222}),
+                          (("delete_vlan", "leaf1", 2222), ["leaf1", "ethernet1/1/1:1", 2222, False])])
+        self.assertEqual(journal.stats["replayed"], 2)
+
+    def test_cut_record_skipped(self):
+        journal = WorkJournal(self.path)
+        journal.add(("port", "port-1"))
+        journal.close()
+        with open(self.path, "a", encoding="utf8") as journal_file:
+            journal_file.write('{"add": ["port", "po')
+
+        journal = WorkJournal(self.path)
+
+        self.assertEqual(list(journal.pending), [("port", "port-1")])
+
+    def test_compaction(self):
+        journal = WorkJournal(self.path, compact_records=10)
+        journal.add(("port", "port-0"))
+        for index in range(1, 6):
+            journal.add(("port", "port-%s" % index))
+            journal.done(("port", "port-%s" % index))
+
+        self.assertEqual(journal.stats["compactions"], 1)
+        journal.close()
+        with open(self.path, encoding="utf8") as journal_file:
+            self.assertLess(len(journal_file.readlines()), 10)
+        self.assertEqual(list(WorkJournal(self.path).pending), [("port", "port-0")])
+
+    def test_in_memory(self):
+        journal = WorkJournal()
+        journal.add(("port", "port-1"))
+        journal.compact()
+
+        self.assertIn(("port", "port-1"), journal)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_state_dir_created(self):
+        path = os.path.join(self.directory.name, "state", "work_journal.jsonl")
+        journal = WorkJournal(path)
+        journal.add(("port", "port-1"))
+        journal.close()
+
+        self.assertEqual(list(WorkJournal(path).pending), [("port", "port-1")])
+
+    def test_unwritable_in_memory(self):
+        # a directory can not be opened as the journal
+        journal = WorkJournal(self.directory.name)
+        journal.add(("port", "port-1"))
+        journal.compact()
+
+        self.assertIn(("port", "port-1"), journal)
+        self.assertEqual(journal.stats["errors"], 1)
+
+    def test_write_error_in_memory(self):
+        journal = WorkJournal(self.path)
+        journal.add(("port", "port-1"))
+        journal.close()
+        journal._file = mock.Mock(write=mock.Mock(side_effect=OSError(errno.ENOSPC, "No space left on device")))
+
+        journal.add(("port", "port-2"))
+
+        self.assertEqual(list(journal.pending), [("port", "port-1"), ("port", "port-2")])
+        self.assertEqual(journal.stats["errors"], 1)
+        # a restart does not trust the journal missing port-2
+        self.assertFalse(os.path.exists(self.path))
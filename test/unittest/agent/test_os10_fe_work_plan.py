@@ -0,0 +1,51 @@
+from unittest import TestCase
+
+from os10_fe_networking.agent.os10_fe_work_plan import WorkPlan
+
+
+class TestWorkPlan(TestCase):
+
+    def setUp(self):
+        self.plan = WorkPlan("leaf1")
+
+    def test_vlan_deleted_once_per_switch(self):
+        for index in range(1, 17):
+            self.plan.delete_vlan("leaf1", "ethernet1/1/%s:1" % index, 2222, False)
+        self.plan.delete_vlan("leaf1", "ethernet1/1/1:1", 2223, False)
+
+        self.assertEqual(len(self.plan), 2)
+        self.assertEqual(self.plan.stats["duplicates"], 15)
+        self.assertEqual(self.plan.operations(),
+                         [(("delete_vlan", "leaf1", 2222), "delete_vlan", ("leaf1", "ethernet1/1/1:1", 2222, False)),
+                          (("delete_vlan", "leaf1", 2223), "delete_vlan", ("leaf1", "ethernet1/1/1:1", 2223, False))])
+
+    def test_vlan_deleted_once_on_spine(self):
+        plan = WorkPlan("spine1")
+        plan.delete_vlan("leaf1", "ethernet1/1/1:1", 2222, False)
+        plan.delete_vlan("leaf2", "ethernet1/1/1:1", 2222, False)
+        plan.detach_port_from_vlan("leaf1", "ethernet1/1/1:1", 2222, "access", False)
+        plan.detach_port_from_vlan("leaf2", "ethernet1/1/1:1", 2222, "access", False)
+
+        operations = plan.operations()
+
+        self.assertEqual(len(plan), 1)
+        self.assertEqual(plan.stats["duplicates"], 1)
+        self.assertEqual([key for key, method, args in operations],
+                         [("detach_port_from_vlan", "leaf1", "ethernet1/1/1:1", 2222),
+                          ("detach_port_from_vlan", "leaf2", "ethernet1/1/1:1", 2222),
+                          ("delete_vlan", "spine1", 2222)])
+
+    def test_ports_detached_before_vlan_delete(self):
+        self.plan.delete_vlan("leaf1", "ethernet1/1/1:1", 2222, True)
+        self.plan.detach_port_from_vlan("leaf1", "ethernet1/1/1:1", 2222, "access", True)
+        self.plan.detach_port_from_vlan("leaf1", "ethernet1/1/2:1", 2222, "access", True)
+        self.plan.detach_port_from_vlan("leaf1", "ethernet1/1/2:1", 2222, "access", True)
+
+        operations = self.plan.operations()
+
+        self.assertEqual([(method, args) for key, method, args in operations],
+                         [("detach_port_from_vlan", ("leaf1", "ethernet1/1/1:1", 2222, "access", True)),
+                          ("detach_port_from_vlan", ("leaf1", "ethernet1/1/2:1", 2222, "access", True)),
+                          ("delete_vlan", ("leaf1", "ethernet1/1/1:1", 2222, True))])
+        self.assertEqual(len({key for key, method, args in operations}), 3)
+        self.assertEqual(self.plan.stats["duplicates"], 1)
@@ -0,0 +1,221 @@
+import json
+from unittest import TestCase
+
+import requests
+from oslo_config import cfg
+
+from os10_fe_networking.agent.os10_fe_fabric_manager import OS10FEFabricManager
+from os10_fe_networking.agent.os10_fe_reconciler import PortIntent
+from os10_fe_networking.agent.os10_fe_restconf_client import OS10FERestConfClient
+from os10_fe_networking.agent.rest_conf.interface import Interface, VLanInterface, PortChannelInterface
+from test.emulator.os10_restconf import OS10RestConfEmulator
+
+CONF = cfg.CONF
+CONF.import_group("FRONTEND_SWITCH_FABRIC", "os10_fe_networking.agent.config")
+
+
+def read_file_data(filename, path):
+    with open(path + filename, encoding="utf8") as data_file:
+        json_data = json.load(data_file)
+    return json_data
+
+
+class TestOS10RestConfEmulator(TestCase):
+
+    def setUp(self):
+        self.client = OS10FERestConfClient("100.127.0.210", retries=1, retry_backoff=0, failure_threshold=2)
+        self.client.breaker._start_prober = lambda: None
+        self.emulator = OS10RestConfEmulator(self.client.mgmt_ip).mount(self.client.session)
+        # the session is shared by every client of the address
+        self.addCleanup(self.client.session.adapters.pop, "https://{address}/".format(address=self.client.mgmt_ip))
+
+    def test_require_instance(self):
+        # existence unknown, the PATCH fails like on OS10 and the client falls back to POST
+        self.client.configure_vlan(VLanInterface(vlan_id="2222", desc="Cluster1", enabled=True))
+        self.assertEqual(self.emulator.requests, {"PATCH": 1, "POST": 1})
+        self.assertEqual(self.client.fallbacks, {Interface.Type.VLan: 1})
+
+        # the port channel the vlan refers to does not exist yet
+        resp = self.client._patch(self.client.base_url + Interface.path, None,
+                                  VLanInterface(vlan_id="2222", port="port-channel125",
+                                                port_mode=VLanInterface.PortMode.ACCESS).content())
+        self.assertEqual(resp.status_code, 404)
+        self.assertEqual(self.client._get_error_message(resp.json()), "require-instance test failed")
+
+        self.client.configure_port_channel(PortChannelInterface(channel_id="125", mtu=9216, access_vlan_id="2222"))
+        self.assertEqual(self.emulator.interfaces["vlan2222"]["dell-interface:untagged-ports"], ["port-channel125"])
+        self.assertEqual(self.client.get_interface("vlan2222")["ietf-interfaces:interface"][0]["description"],
+                         "Cluster1")
+
+        self.assertTrue(self.client.delete_interface("port-channel125"))
+        self.assertEqual(self.emulator.interfaces["vlan2222"]["dell-interface:untagged-ports"], [])
+
+    def test_fields_unsupported(self):
+        self.emulator.support_fields = False
+        self.assertIn("vlan1", self.client.inventory.get()[Interface.Type.VLan])
+        self.assertEqual(self.client.stats["fields_fallbacks"], 1)
+
+    def test_injected_faults(self):
+        self.emulator.inject(status=503, method="GET")
+        self.assertIn("vlan1", self.client.inventory.get(force_refresh=True)[Interface.Type.VLan])
+        self.assertEqual(self.client.stats["retries"], 1)
+
+        self.emulator.inject(exc=requests.ConnectionError, count=4)
+        for _ in range(2):
+            with self.assertRaises(requests.ConnectionError):
+                self.client.get_interface("vlan1")
+        self.assertFalse(self.client.breaker.allow())
+        self.assertTrue(self.client.breaker.probe_once())
+
+
+class TestEmulatedFabric(TestCase):
+
+    def test_leaf_reconcile(self):
+        CONF(["--config-file", "./leaf1.ini"])
+        ff_manager_leaf1 = OS10FEFabricManager.create(CONF)
+        interfaces = read_file_data("all_interfaces_leaf1.json", "restconf/")["ietf-interfaces:interface"]
+        emulator = OS10RestConfEmulator(ff_manager_leaf1.address, interfaces).mount(ff_manager_leaf1.client.session)
+        self.addCleanup(ff_manager_leaf1.client.session.adapters.pop,
+                        "https://{address}/".format(address=ff_manager_leaf1.address))
+
+        intents = [PortIntent("100.127.0.125", "ethernet1/1/1:1", 2222, "Cluster1", False, "access", True),
+                   PortIntent("100.127.0.125", "ethernet1/1/1:2", 2000, "Cluster1", False, "trunk", True)]
+        self.assertGreater(ff_manager_leaf1.reconcile(intents), 0)
+        self.assertIn("port-channel1", emulator.interfaces["vlan2000"]["dell-interface:tagged-ports"])
+        requests_sent = sum(emulator.requests.values())
+
+        # the switch holds the desired state, read it again and compare
+        ff_manager_leaf1.invalidate_inventory()
+        self.assertEqual(ff_manager_leaf1.reconcile(intents), 0)
+        self.assertEqual(emulator.requests["PATCH"] + emulator.requests["POST"],
+                         sum(emulator.requests.values()) - emulator.requests["GET"])
+        self.assertEqual(sum(emulator.requests.values()), requests_sent + 1)
+        self.assertEqual(ff_manager_leaf1.stats["reconcile_unchanged"], 1)
+
+    def test_leaf_restart_read_only(self):
+        CONF(["--config-file", "./leaf1.ini"])
+        ff_manager_leaf1 = OS10FEFabricManager.create(CONF)
+        interfaces = read_file_data("all_interfaces_leaf1.json", "restconf/")["ietf-interfaces:interface"]
+        emulator = OS10RestConfEmulator(ff_manager_leaf1.address, interfaces).mount(ff_manager_leaf1.client.session)
+        self.addCleanup(ff_manager_leaf1.client.session.adapters.pop,
+                        "https://{address}/".format(address=ff_manager_leaf1.address))
+        intents = [PortIntent("100.127.0.125", "ethernet1/1/1:1", 2222, "Cluster1", False, "access", True),
+                   PortIntent("100.127.0.125", "ethernet1/1/1:2", 2000, "Cluster1", False, "trunk", True),
+                   PortIntent("100.127.0.125", "ethernet1/1/9:2", 2300, "Cluster1", False, "access", False)]
+        ff_manager_leaf1.reconcile(intents)
+        self.assertGreater(ff_manager_leaf1.stats["writes_issued"], 0)
+        emulator.requests.clear()
+
+        # restarted without any state, the unchanged cluster is only read
+        restarted = OS10FEFabricManager.create(CONF)
+        self.assertEqual(restarted.reconcile(intents), 0)
+        self.assertEqual(emulator.requests, {"GET": 1})
+        self.assertEqual(restarted.stats["writes_issued"], 0)
+        self.assertEqual(restarted.stats["writes_skipped"], len(restarted.desired_state(intents)))
+
+    def test_vlt_peers_port_channel(self):
+        CONF(["--config-file", "./leaf1.ini"])
+        emulators = {}
+        ff_managers = {}
+        for leaf, switch_ip in (("leaf1", "100.127.0.125"), ("leaf2", "100.127.0.126")):
+            CONF.set_override("switch_ip", switch_ip, group="FRONTEND_SWITCH_FABRIC")
+            self.addCleanup(CONF.clear_override, "switch_ip", group="FRONTEND_SWITCH_FABRIC")
+            ff_managers[leaf] = OS10FEFabricManager.create(CONF)
+            interfaces = [interface for interface in read_file_data("all_interfaces_%s.json" % leaf,
+                                                                    "restconf/")["ietf-interfaces:interface"]
+                          if leaf == "leaf1" or interface["name"] != "port-channel125"]
+            emulators[leaf] = OS10RestConfEmulator(switch_ip, interfaces).mount(ff_managers[leaf].client.session)
+            self.addCleanup(ff_managers[leaf].client.session.adapters.pop,
+                            "https://{address}/".format(address=switch_ip))
+
+        # a server with two links on each leaf
+        links = tuple((switch_ip, switch_port) for switch_ip in ("100.127.0.125", "100.127.0.126")
+                      for switch_port in ("ethernet1/1/1:1", "ethernet1/1/2:1"))
+        intents = [PortIntent(switch_ip, switch_port, 2222, "Cluster1", False, "access", True, links)
+                   for switch_ip, switch_port in links]
+        for leaf in ("leaf1", "leaf2"):
+            ff_managers[leaf].reconcile(intents)
+            self.assertEqual(ff_managers[leaf].failed_intents, {})
+
+            # one port channel, with the same id on both peers
+            members = emulators[leaf].interfaces["port-channel125"]["dell-interface:member-ports"]
+            self.assertEqual(sorted(member["name"] for member in members), ["ethernet1/1/1:1", "ethernet1/1/2:1"])
+            self.assertEqual(emulators[leaf].interfaces["vlan2222"]["dell-interface:untagged-ports"],
+                             ["port-channel125"])
+
+    def test_leaf_port_channel_per_server(self):
+        CONF(["--config-file", "./leaf1.ini"])
+        ff_manager_leaf1 = OS10FEFabricManager.create(CONF)
+        interfaces = [interface for interface in read_file_data("all_interfaces_leaf1.json",
+                                                                "restconf/")["ietf-interfaces:interface"]
+                      if interface["name"] not in ("port-channel127", "port-channel128")]
+        emulator = OS10RestConfEmulator(ff_manager_leaf1.address, interfaces).mount(ff_manager_leaf1.client.session)
+        self.addCleanup(ff_manager_leaf1.client.session.adapters.pop,
+                        "https://{address}/".format(address=ff_manager_leaf1.address))
+
+        # two servers on the same breakout sub-port of different front panel ports, VLT with leaf2
+        intents = []
+        for switch_port in ("ethernet1/1/5:1", "ethernet1/1/6:1"):
+            links = (("100.127.0.125", switch_port), ("100.127.0.126", switch_port))
+            intents.append(PortIntent("100.127.0.125", switch_port, 2222, "Cluster1", False, "access", True, links))
+        ff_manager_leaf1.reconcile(intents)
+        self.assertEqual(ff_manager_leaf1.failed_intents, {})
+
+        members = {name: [member["name"] for member in emulator.interfaces[name]["dell-interface:member-ports"]]
+                   for name in ("port-channel127", "port-channel128")}
+        self.assertEqual(members, {"port-channel127": ["ethernet1/1/5:1"], "port-channel128": ["ethernet1/1/6:1"]})
+        self.assertEqual(ff_manager_leaf1.pg_alloc.used, 4)
+
+        # detaching one server leaves the port channel of the other alone
+        ff_manager_leaf1.detach_port_from_vlan("100.127.0.125", "ethernet1/1/5:1", 2222, "access", True)
+        self.assertNotIn("port-channel127", emulator.interfaces)
+        self.assertIn("port-channel128", emulator.interfaces)
+        self.assertEqual(ff_manager_leaf1._find_port_channel_id("ethernet1/1/6:1"), "128")
+        self.assertEqual(ff_manager_leaf1.reconcile(intents[1:]), 0)
+
+    def test_leaf_reconcile_failed_intent(self):
+        CONF(["--config-file", "./leaf1.ini"])
+        ff_manager_leaf1 = OS10FEFabricManager.create(CONF)
+        interfaces = read_file_data("all_interfaces_leaf1.json", "restconf/")["ietf-interfaces:interface"]
+        emulator = OS10RestConfEmulator(ff_manager_leaf1.address, interfaces).mount(ff_manager_leaf1.client.session)
+        self.addCleanup(ff_manager_leaf1.client.session.adapters.pop,
+                        "https://{address}/".format(address=ff_manager_leaf1.address))
+
+        # no port channel id is left for the first port, the unrelated access port is still configured
+        failing = PortIntent("100.127.0.125", "ethernet1/1/2:5", 2222, "Cluster1", False, "access", True)
+        intents = [failing,
+                   PortIntent("100.127.0.125", "ethernet1/1/9:2", 2300, "Cluster1", False, "access", False)]
+        self.assertGreater(ff_manager_leaf1.reconcile(intents, prune=True), 0)
+
+        self.assertEqual(list(ff_manager_leaf1.failed_intents), [failing])
+        self.assertIsInstance(ff_manager_leaf1.failed_intents[failing], RuntimeError)
+        self.assertIn("ethernet1/1/9:2", emulator.interfaces["vlan2300"]["dell-interface:untagged-ports"])
+        self.assertIn("port-channel125", emulator.interfaces)
+        # tried again on the next reconcile
+        self.assertIsNone(ff_manager_leaf1.fingerprint)
+
+    def test_leaf_restart_fingerprint(self):
+        CONF(["--config-file", "./leaf1.ini"])
+        ff_manager_leaf1 = OS10FEFabricManager.create(CONF)
+        interfaces = read_file_data("all_interfaces_leaf1.json", "restconf/")["ietf-interfaces:interface"]
+        emulator = OS10RestConfEmulator(ff_manager_leaf1.address, interfaces).mount(ff_manager_leaf1.client.session)
+        self.addCleanup(ff_manager_leaf1.client.session.adapters.pop,
+                        "https://{address}/".format(address=ff_manager_leaf1.address))
+        intents = [PortIntent("100.127.0.125", "ethernet1/1/1:1", 2222, "Cluster1", False, "access", True),
+                   PortIntent("100.127.0.125", "ethernet1/1/1:2", 2000, "Cluster1", False, "trunk", True)]
+        ff_manager_leaf1.reconcile(intents)
+        emulator.requests.clear()
+
+        # restarted with the fingerprint of the previous run, a single read shows nothing changed
+        restarted = OS10FEFabricManager.create(CONF)
+        restarted.fingerprint = ff_manager_leaf1.fingerprint
+        self.assertEqual(restarted.reconcile(intents), 0)
+        self.assertEqual(restarted.stats["reconcile_unchanged"], 1)
+        self.assertEqual(emulator.requests, {"GET": 1})
+
+        # changed on the switch meanwhile
+        emulator.interfaces["vlan2000"]["dell-interface:tagged-ports"] = []
+        restarted = OS10FEFabricManager.create(CONF)
+        restarted.fingerprint = ff_manager_leaf1.fingerprint
+        self.assertEqual(restarted.reconcile(intents), 1)
+        self.assertIn("port-channel1", emulator.interfaces["vlan2000"]["dell-interface:tagged-ports"])
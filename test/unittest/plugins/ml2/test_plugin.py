@@ -0,0 +1,250 @@
+import functools
+from unittest import mock
+
+import netaddr
+
+from neutron.db import segments_db
+from neutron.plugins.ml2 import models as ml2_models
+from neutron.tests.unit.plugins.ml2 import test_plugin
+from neutron_lib import constants as const
+from neutron_lib import context
+from neutron_lib.api.definitions import portbindings
+from neutron_lib.db import api as db_api
+from neutron_lib.plugins import directory
+from sqlalchemy import engine
+from sqlalchemy import event
+
+from os10_fe_networking.plugins.ml2.plugin import OS10Ml2Plugin, RpcCallbacks
+
+PLUGIN = "os10_fe_networking.plugins.ml2.plugin.OS10Ml2Plugin"
+# hosts bound by the test mechanism driver
+HOST = "host-ovs-no_filter"
+OTHER_HOST = "host-bridge-filter"
+AGENT_HOST = "agent-host"
+
+
+def link(switch_port="ethernet1/1/1:1", frontend=True):
+    switch_info = "{'switch_ip': '100.127.0.125', 'frontend': 'True'}" if frontend else \
+        "{'switch_ip': '100.127.0.125'}"
+    return {"port_id": switch_port, "switch_info": switch_info}
+
+
+class OS10Ml2PluginTestCase(test_plugin.Ml2PluginV2TestCase):
+
+    def setup_parent(self):
+        parent_setup = functools.partial(
+            super(test_plugin.Ml2PluginV2TestCase, self).setUp,
+            plugin=PLUGIN,
+            service_plugins={'l3_plugin_name': self.l3_plugin,
+                             'revision_plugin_name': 'revisions'})
+        self.useFixture(test_plugin.Ml2ConfFixture(parent_setup))
+        self.port_create_status = 'DOWN'
+
+    def setUp(self):
+        super(OS10Ml2PluginTestCase, self).setUp()
+        self.plugin = directory.get_plugin()
+        self.network_id = self._create_frontend_network("net1", "10.0.0.0/24")
+
+    def _create_frontend_network(self, name, cidr):
+        network = self._make_network(self.fmt, name, True)
+        self._make_subnet(self.fmt, network, str(netaddr.IPNetwork(cidr)[1]), cidr)
+        return network["network"]["id"]
+
+    def _create_frontend_port(self, profile, host=HOST, network_id=None):
+        res = self._create_port(self.fmt, network_id or self.network_id,
+                                arg_list=(portbindings.HOST_ID, portbindings.PROFILE),
+                                is_service=True,
+                                **{portbindings.HOST_ID: host, portbindings.PROFILE: profile})
+        return self.deserialize(self.fmt, res)["port"]
+
+    def _create_distributed_port(self, host=AGENT_HOST):
+        res = self._create_port(self.fmt, self.network_id,
+                                arg_list=(portbindings.PROFILE, "device_owner"),
+                                is_service=True,
+                                **{portbindings.PROFILE: {"local_link_information": [link()]},
+                                   "device_owner": const.DEVICE_OWNER_DVR_INTERFACE})
+        port = self.deserialize(self.fmt, res)["port"]
+        segment_id = segments_db.get_network_segments(self.context, self.network_id)[0]["id"]
+        with db_api.CONTEXT_WRITER.using(self.context) as session:
+            session.add(ml2_models.DistributedPortBinding(port_id=port["id"], host=host, router_id="router1",
+                                                          vif_type=portbindings.VIF_TYPE_OVS,
+                                                          vnic_type=portbindings.VNIC_NORMAL,
+                                                          status=const.ACTIVE, profile="{}", vif_details=""))
+            session.add(ml2_models.PortBindingLevel(port_id=port["id"], host=host, level=0, driver="test",
+                                                    segment_id=segment_id))
+        # as if the test mechanism driver had bound it
+        self.plugin.mechanism_manager.mech_drivers["test"].obj.bound_ports.add((port["id"], host))
+        return port
+
+    def _rpc_callbacks(self):
+        return RpcCallbacks(mock.Mock(), self.plugin.type_manager)
+
+
+class TestFrontendPorts(OS10Ml2PluginTestCase):
+
+    def test_frontend_filter(self):
+        profiles = [
+            {"local_link_information": [link()]},
+            {"local_link_information": [link("ethernet1/1/1:1"), link("ethernet1/1/1:2")]},
+            {"provisioning-fsf": True},
+            # matched by LIKE only
+            {"local_link_information": [link("ethernet1/1/1:1"), link("ethernet1/1/1:2", frontend=False)]},
+            {"local_link_information": [link("frontend", frontend=False)]},
+            {"provisioning-fsf": False},
+            {"local_link_information": [link(frontend=False)]},
+            {},
+        ]
+        ports = [self._create_frontend_port(profile) for profile in profiles]
+
+        revisions = self.plugin.get_frontend_port_revisions(self.context)
+        port_contexts = self.plugin.get_frontend_bound_port_contexts(self.context)
+
+        expected = {port["id"] for port, profile in zip(ports, profiles) if OS10Ml2Plugin._is_frontend_port(profile)}
+        self.assertEqual(len(expected), 3)
+        self.assertEqual(set(revisions), expected)
+        self.assertEqual({port_context.current["id"] for port_context in port_contexts}, expected)
+
+    def test_binding_host_filter(self):
+        port = self._create_frontend_port({"local_link_information": [link()]})
+        self._create_frontend_port({"local_link_information": [link()]}, host=OTHER_HOST)
+
+        revisions = self.plugin.get_frontend_port_revisions(self.context, binding_host=HOST)
+        port_contexts = self.plugin.get_frontend_bound_port_contexts(self.context, binding_host=HOST)
+
+        self.assertEqual(list(revisions), [port["id"]])
+        self.assertEqual([port_context.current["id"] for port_context in port_contexts], [port["id"]])
+
+    def test_distributed_binding_of_agent_host(self):
+        port = self._create_distributed_port()
+
+        port_contexts = self.plugin.get_frontend_bound_port_contexts(self.context, host=AGENT_HOST)
+        self.assertEqual([port_context.current["id"] for port_context in port_contexts], [port["id"]])
+        self.assertEqual(self.plugin.get_frontend_bound_port_contexts(self.context), [])
+
+    def test_rpc_uses_agent_host_for_distributed_bindings(self):
+        port = self._create_distributed_port()
+
+        devices = self._rpc_callbacks().get_frontend_devices_details_list(self.context, agent_id="agent1",
+                                                                          host=AGENT_HOST)
+
+        self.assertEqual([device["device"] for device in devices], [port["mac_address"]])
+
+
+class TestFrontendDevicesDetailsListDelta(OS10Ml2PluginTestCase):
+
+    def _delta(self, port_revisions, **kwargs):
+        return self._rpc_callbacks().get_frontend_devices_details_list_delta(self.context, agent_id="agent1",
+                                                                             host=HOST,
+                                                                             port_revisions=port_revisions,
+                                                                             **kwargs)
+
+    def test_changed_revisions(self):
+        port1 = self._create_frontend_port({"local_link_information": [link("ethernet1/1/1:1")]})
+        port2 = self._create_frontend_port({"local_link_information": [link("ethernet1/1/1:2")]})
+
+        delta = self._delta({})
+        self.assertEqual({device["port_id"] for device in delta["devices"]}, {port1["id"], port2["id"]})
+        self.assertEqual(delta["removed_ports"], [])
+
+        port_revisions = self.plugin.get_frontend_port_revisions(self.context)
+        self.assertEqual(self._delta(port_revisions), {"devices": [], "removed_ports": []})
+
+        self._update("ports", port1["id"], {"port": {"name": "renamed"}})
+        delta = self._delta(port_revisions)
+        self.assertEqual([device["port_id"] for device in delta["devices"]], [port1["id"]])
+        self.assertEqual(delta["removed_ports"], [])
+
+    def test_removed_ports(self):
+        port1 = self._create_frontend_port({"local_link_information": [link("ethernet1/1/1:1")]})
+        port2 = self._create_frontend_port({"local_link_information": [link("ethernet1/1/1:2")]})
+        port3 = self._create_frontend_port({"local_link_information": [link("ethernet1/1/1:3")]})
+        port_revisions = self.plugin.get_frontend_port_revisions(self.context)
+
+        self._delete("ports", port1["id"])
+        profile = {"local_link_information": [link("ethernet1/1/1:2", frontend=False)]}
+        self._update("ports", port2["id"], {"port": {portbindings.PROFILE: profile}}, as_service=True)
+        delta = self._delta(port_revisions)
+
+        self.assertEqual(delta["devices"], [])
+        self.assertEqual(set(delta["removed_ports"]), {port1["id"], port2["id"]})
+        self.assertNotIn(port3["id"], delta["removed_ports"])
+
+    def test_binding_host_filter(self):
+        port = self._create_frontend_port({"local_link_information": [link("ethernet1/1/1:1")]})
+        other_port = self._create_frontend_port({"local_link_information": [link("ethernet1/1/1:2")]},
+                                                host=OTHER_HOST)
+
+        delta = self._delta({}, binding_host=HOST)
+        self.assertEqual([device["port_id"] for device in delta["devices"]], [port["id"]])
+        self.assertEqual(delta["removed_ports"], [])
+
+        port_revisions = self.plugin.get_frontend_port_revisions(self.context)
+        self.assertEqual(self._delta(port_revisions, binding_host=HOST),
+                         {"devices": [], "removed_ports": [other_port["id"]]})
+
+
+class TestFrontendBoundPortContextsQueries(OS10Ml2PluginTestCase):
+
+    def _queries(self, func, *args, **kwargs):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine.Engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            # a new context, so nothing is loaded by the session already
+            result = func(context.get_admin_context(), *args, **kwargs)
+        finally:
+            event.remove(engine.Engine, "before_cursor_execute", before_cursor_execute)
+
+        return result, statements
+
+    def _create_ports(self, first, last):
+        network_id = self._create_frontend_network("net%s" % first, "10.0.%s.0/24" % first)
+        for i in range(first, last + 1):
+            self._create_frontend_port({"local_link_information": [link("ethernet1/1/%s:1" % i)]},
+                                       network_id=network_id if i % 2 else None)
+            self._create_distributed_port()
+
+    def test_query_count_independent_of_port_count(self):
+        self._create_frontend_port({"local_link_information": [link("ethernet1/1/1:1")]})
+        self._create_distributed_port()
+
+        port_contexts, queries = self._queries(self.plugin.get_frontend_bound_port_contexts, host=AGENT_HOST)
+        self.assertEqual(len(port_contexts), 2)
+        self.assertTrue(all(port_context.binding_levels for port_context in port_contexts))
+
+        self._create_ports(2, 5)
+
+        port_contexts, more_queries = self._queries(self.plugin.get_frontend_bound_port_contexts, host=AGENT_HOST)
+        self.assertEqual(len(port_contexts), 10)
+        self.assertTrue(all(port_context.binding_levels for port_context in port_contexts))
+        self.assertEqual(len(more_queries), len(queries))
+
+    def _rpc_queries(self, host, device_owner):
+        devices, statements = self._queries(self._rpc_callbacks().get_frontend_devices_details_list,
+                                            agent_id="agent", host=host)
+        statuses = {port["status"] for port in self._list("ports")["ports"] if port["device_owner"] == device_owner}
+        # the revisions plugin bumps the revision of each updated port with a version checked UPDATE, which
+        # SQLAlchemy runs row by row
+        revision_bumps = [statement for statement in statements if statement.startswith("UPDATE standardattributes")]
+        return devices, statuses, len(statements) - len(revision_bumps), len(revision_bumps)
+
+    def test_rpc_query_count_independent_of_port_count(self):
+        self._create_ports(1, 1)
+        queries = {}
+        # the status of the bound ports, then of the distributed bindings of the agent host, is updated
+        for host, device_owner in ((None, ""), (AGENT_HOST, const.DEVICE_OWNER_DVR_INTERFACE)):
+            devices, statuses, queries[host], revision_bumps = self._rpc_queries(host, device_owner)
+            self.assertEqual(len(devices), 1 if host is None else 2)
+            self.assertEqual(statuses, {const.PORT_STATUS_BUILD})
+            self.assertEqual(revision_bumps, 1)
+
+        self._create_ports(2, 5)
+        for host, device_owner in ((None, ""), (AGENT_HOST, const.DEVICE_OWNER_DVR_INTERFACE)):
+            devices, statuses, more_queries, revision_bumps = self._rpc_queries(host, device_owner)
+            self.assertEqual(len(devices), 5 if host is None else 10)
+            self.assertEqual(statuses, {const.PORT_STATUS_BUILD})
+            self.assertEqual(revision_bumps, 4)
+            self.assertEqual(more_queries, queries[host])